@@ -36,171 +36,367 @@ void setup() {
   yoffset = a.acceleration.y;
 }
 
-void loop() 
+// ---------- emergency stop ----------
+// The Pi writes a single '!' the moment someone hits STOP, whatever we're
+// doing. The motion loops and every wait for input look for it, so the
+// motors are off within one loop pass instead of at the end of the step.
+// (Not opcode 9: a 9 landing while we wait for a step's parameter would
+// be read as "drive 9 ft".)
+
+#define ESTOP_BYTE '!'
+
+void stopMotors()
+{
+  analogWrite(5, 0);
+  analogWrite(6, 0);
+}
+
+// set while runPlan steps through a frame; a '9' then is the Pi's cancel
+bool inPlan = false;
+bool planCancel = false;
+
+// called from the motion loops: skips the param's trailing newline. In plan
+// mode a '9' is taken off the line into planCancel for runPlan to act on
+// between steps, so a '!' sent behind it is still seen mid-step; outside
+// it the '9' is the next opcode and stays put.
+bool estopRequested()
+{
+  while (Serial.available() > 0)
+  {
+    int c = Serial.peek();
+    if (c == ESTOP_BYTE)
+    {
+      Serial.read();
+      return true;
+    }
+    if (c == '9')
+    {
+      if (!inPlan)
+      {
+        return false;
+      }
+      planCancel = true;
+    }
+    Serial.read();
+  }
+  return false;
+}
+
+// blocks until there's input; false (and motors off, "EStop") if it's '!'
+bool waitForInput()
+{
+  while (Serial.available() == 0)
+  {}
+  if (Serial.peek() == ESTOP_BYTE)
+  {
+    Serial.read();
+    stopMotors();
+    Serial.println("EStop");
+    return false;
+  }
+  return true;
+}
+
+// ---------- idle telemetry ----------
+// While we wait for the next opcode, one IMU sample goes out every
+// TELEMETRY_MS for the Pi's /api/telemetry (backend/telemetry.py), each
+// followed by "Ready" again so Ready stays the last line before the
+// opcode read. Only in the opcode wait: the echo / Done handshakes after
+// it are never interleaved with samples.
+
+#define TELEMETRY_MS 100
+
+void printSample()
 {
   sensors_event_t a, g, temp;
   mpu.getEvent(&a, &g, &temp);
-  float angleZ = 0.0f;
-  float position = 0.0f;
-  int counter = 0;
-  /*
   Serial.print("Acceleration: " );
   Serial.println(a.acceleration.x - xoffset);
   Serial.println(a.acceleration.y - yoffset);
   Serial.print("Turn rate: ");
   Serial.println(g.gyro.z - zoffset);
-  */
-  delay(200);
-  clearInputBuffer();
+}
+
+// waitForInput() for the opcode, streaming samples meanwhile
+bool waitForOpcode()
+{
+  unsigned long lastSample = millis();
   while (Serial.available() == 0)
-  {}
-  iput = Serial.parseInt();
-  Serial.println(iput);
-  if (iput == 1)
   {
-    clearInputBuffer();
-    while (Serial.available() == 0){}
-    float distance = Serial.parseFloat();
-    s1.write(180);
-    //Serial.println(position);
-    motorSpeed = 120;
-    analogWrite(5, motorSpeed);
-    analogWrite(6, motorSpeed);
-    while (position < distance)
-    {
-      sensors_event_t a, g, temp;
-      mpu.getEvent(&a, &g, &temp);
-      unsigned long now = micros();
-      if (counter == 0)
-      {
-        counter++;
-        lastTime = now;
-      }
-      float dt = (now - lastTime) / 1000000.0f; 
+    if (millis() - lastSample >= TELEMETRY_MS)
+    {
+      lastSample += TELEMETRY_MS;
+      printSample();
+      Serial.println("Ready");
+    }
+  }
+  return waitForInput();
+}
+
+// ---------- motion primitives (shared by single opcodes and plan mode) ----------
+// Both return false if an emergency stop cut them short.
+
+bool driveForward(int speed, float distance)
+{
+  float position = 0.0f;
+  int counter = 0;
+  s1.write(180);
+  motorSpeed = speed;
+  analogWrite(5, motorSpeed);
+  analogWrite(6, motorSpeed);
+  while (position < distance)
+  {
+    sensors_event_t a, g, temp;
+    mpu.getEvent(&a, &g, &temp);
+    unsigned long now = micros();
+    if (counter == 0)
+    {
+      counter++;
       lastTime = now;
-      //Serial.println(dt);
-      float accelX_rate = sqrt(pow((a.acceleration.x - xoffset), 2) + pow((a.acceleration.y - yoffset), 2));
-      position += abs(accelX_rate * (dt*dt));
-      //Serial.println(position);
     }
-    analogWrite(5, 0);
-    analogWrite(6, 0);
-    Serial.println("Done1");
+    float dt = (now - lastTime) / 1000000.0f; 
+    lastTime = now;
+    //Serial.println(dt);
+    float accelX_rate = sqrt(pow((a.acceleration.x - xoffset), 2) + pow((a.acceleration.y - yoffset), 2));
+    position += abs(accelX_rate * (dt*dt));
+    //Serial.println(position);
+    if (estopRequested())
+    {
+      stopMotors();
+      return false;
+    }
   }
-  else if (iput == 2)
+  analogWrite(5, 0);
+  analogWrite(6, 0);
+  return true;
+}
+
+// pin = the motor that drives the turn (5 = right turn, 6 = left turn)
+bool turnBy(int pin, float degrees)
+{
+  float angleZ = 0.0f;
+  int other = (pin == 5) ? 6 : 5;
+  analogWrite(pin, 240);
+  analogWrite(other, 0);
+  s1.write(115);
+  // start the gyro clock now; in plan mode the previous step just ended
+  lastTime = micros();
+  while (angleZ <= degrees)
   {
-    clearInputBuffer();
-    while (Serial.available() == 0){}
-    float distance = Serial.parseFloat();
-    s1.write(180);
-    motorSpeed = 180;
-    analogWrite(5, motorSpeed);
-    analogWrite(6, motorSpeed);
-    while (position < distance)
-    {
-      sensors_event_t a, g, temp;
-      mpu.getEvent(&a, &g, &temp);
-      unsigned long now = micros();
-      if (counter == 0)
+    sensors_event_t a, g, temp;
+    mpu.getEvent(&a, &g, &temp);
+    unsigned long now = micros();
+    float dt = (now - lastTime) / 1000000.0f; 
+    lastTime = now;
+    float gyroZ_rate = ((g.gyro.z - zoffset) * (180/M_PI));  // deg/s
+    angleZ += abs(gyroZ_rate * dt);
+    if (estopRequested())
+    {
+      stopMotors();
+      return false;
+    }
+  }
+  s1.write(180);
+  analogWrite(5, 0);
+  analogWrite(6, 0);
+  return true;
+}
+
+// ---------- plan mode (opcode 7) ----------
+// Frame, little endian:
+//   'P' 'L' | count (uint8) | count x [op (uint8), param (float32)] | crc16 (uint16)
+// crc16 is CRC-16/CCITT-FALSE over everything before it.
+
+#define MAX_PLAN_STEPS 48
+
+uint8_t planOps[MAX_PLAN_STEPS];
+float planParams[MAX_PLAN_STEPS];
+
+uint16_t crc16Update(uint16_t crc, uint8_t b)
+{
+  crc ^= (uint16_t)b << 8;
+  for (int i = 0; i < 8; i++)
+  {
+    crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+  }
+  return crc;
+}
+
+bool readFrameBytes(uint8_t *buf, int n, uint16_t *crc)
+{
+  if (Serial.readBytes(buf, n) != (size_t)n)
+  {
+    return false;
+  }
+  for (int i = 0; i < n; i++)
+  {
+    *crc = crc16Update(*crc, buf[i]);
+  }
+  return true;
+}
+
+void runPlanSteps(int count);
+
+void runPlan()
+{
+  uint16_t crc = 0xFFFF;
+  uint8_t header[3];
+  if (!readFrameBytes(header, 3, &crc) || header[0] != 'P' || header[1] != 'L')
+  {
+    Serial.println("PlanErr header");
+    return;
+  }
+  int count = header[2];
+  if (count > MAX_PLAN_STEPS)
+  {
+    Serial.println("PlanErr size");
+    return;
+  }
+  for (int i = 0; i < count; i++)
+  {
+    uint8_t rec[5];
+    if (!readFrameBytes(rec, 5, &crc))
+    {
+      Serial.println("PlanErr short");
+      return;
+    }
+    planOps[i] = rec[0];
+    memcpy(&planParams[i], &rec[1], 4);
+  }
+  uint8_t tail[2];
+  if (Serial.readBytes(tail, 2) != 2 || (tail[0] | (tail[1] << 8)) != crc)
+  {
+    Serial.println("PlanErr crc");
+    return;
+  }
+
+  Serial.print("PlanOk ");
+  Serial.println(count);
+
+  inPlan = true;
+  planCancel = false;
+  runPlanSteps(count);
+  inPlan = false;
+}
+
+void runPlanSteps(int count)
+{
+  for (int i = 0; i < count; i++)
+  {
+    // a '9' from the Pi between steps aborts the rest of the plan
+    // (so does '!', which the motion loops also react to mid-step)
+    if (planCancel)
+    {
+      stopMotors();
+      Serial.println("PlanAbort");
+      return;
+    }
+    if (Serial.available() > 0)
+    {
+      int c = Serial.read();
+      if (c == '9' || c == ESTOP_BYTE)
       {
-        counter++;
-        lastTime = now;
+        stopMotors();
+        if (c == ESTOP_BYTE) Serial.println("EStop");
+        Serial.println("PlanAbort");
+        return;
       }
-      float dt = (now - lastTime) / 1000000.0f; 
-      lastTime = now;
-      //Serial.println(dt);
-      float accelX_rate = sqrt(pow((a.acceleration.x - xoffset), 2) + pow((a.acceleration.y - yoffset), 2));
-      position += abs(accelX_rate * (dt*dt));
-      //Serial.println(position);
     }
-    analogWrite(5, 0);
-    analogWrite(6, 0);
-    Serial.println("Done2");
+    uint8_t op = planOps[i];
+    bool finished = true;
+    if (op == 1) finished = driveForward(120, planParams[i]);
+    else if (op == 2) finished = driveForward(180, planParams[i]);
+    else if (op == 3) finished = driveForward(240, planParams[i]);
+    else if (op == 4) finished = turnBy(5, planParams[i]);
+    else if (op == 5) finished = turnBy(6, planParams[i]);
+    else stopMotors();
+    if (!finished)
+    {
+      Serial.println("EStop");
+      Serial.println("PlanAbort");
+      return;
+    }
+    Serial.print("Step ");
+    Serial.print(i);
+    Serial.print(" Done");
+    Serial.println(op);
   }
-  else if (iput == 3)
+  Serial.println("PlanDone");
+}
+
+void loop() 
+{
+  printSample();
+  delay(200);
+  clearInputBuffer();
+  // tell the Pi we're listening again; it waits for this instead of sleeping
+  Serial.println("Ready");
+  if (!waitForOpcode())
+  {
+    return;
+  }
+  iput = Serial.parseInt();
+  Serial.println(iput);
+  if (iput == 1 || iput == 2 || iput == 3)
   {
     clearInputBuffer();
-    while (Serial.available() == 0){}
+    if (!waitForInput())
+    {
+      return;
+    }
     float distance = Serial.parseFloat();
-    s1.write(180);
-    motorSpeed = 240;
-    analogWrite(5, motorSpeed);
-    analogWrite(6, motorSpeed);
-    while (position < distance)
-    {
-      sensors_event_t a, g, temp;
-      mpu.getEvent(&a, &g, &temp);
-      unsigned long now = micros();
-      if (counter == 0)
-      {
-        counter++;
-        lastTime = now;
-      }
-      float dt = (now - lastTime) / 1000000.0f; 
-      lastTime = now;
-      //Serial.println(dt);
-      float accelX_rate = sqrt(pow((a.acceleration.x - xoffset), 2) + pow((a.acceleration.y - yoffset), 2));
-      position += abs(accelX_rate * (dt*dt));
-      //Serial.println(position);
+    //Serial.println(position);
+    if (!driveForward(iput == 1 ? 120 : (iput == 2 ? 180 : 240), distance))
+    {
+      Serial.println("EStop");
+      return;
     }
-    analogWrite(5, 0);
-    analogWrite(6, 0);
-    Serial.println("Done3");
+    Serial.print("Done");
+    Serial.println(iput);
   }
   else if (iput == 4)
   {
     clearInputBuffer();
-    while (Serial.available() == 0){}
+    if (!waitForInput())
+    {
+      return;
+    }
     float turnAngleR = Serial.parseInt();
-    //Serial.println(angleZ);
     //Serial.println(turnAngleR);
-    analogWrite(5, 240);
-    analogWrite(6, 0);
-    s1.write(115);
-    while (angleZ <= turnAngleR)
-    {
-      sensors_event_t a, g, temp;
-      mpu.getEvent(&a, &g, &temp);
-      unsigned long now = micros();
-      float dt = (now - lastTime) / 1000000.0f; 
-      lastTime = now;
-      float gyroZ_rate = ((g.gyro.z - zoffset) * (180/M_PI));  // deg/s
-      angleZ += abs(gyroZ_rate * dt);
+    if (!turnBy(5, turnAngleR))
+    {
+      Serial.println("EStop");
+      return;
     }
-    s1.write(180);
-    analogWrite(5, 0);
-    analogWrite(6, 0);
     Serial.println("Done4");
   }
   else if (iput == 5)
   {
     clearInputBuffer();
-    while (Serial.available() == 0){}
+    if (!waitForInput())
+    {
+      return;
+    }
     float turnAngleL = Serial.parseInt();
     //Serial.println(turnAngleL);
-    analogWrite(6, 240);
-    analogWrite(5, 0);
-    s1.write(115);
-    while (angleZ <= turnAngleL)
-    {
-      sensors_event_t a, g, temp;
-      mpu.getEvent(&a, &g, &temp);
-      unsigned long now = micros();
-      float dt = (now - lastTime) / 1000000.0f;  
-      lastTime = now;
-      float gyroZ_rate = ((g.gyro.z - zoffset) * (180/M_PI));  // deg/s
-      angleZ += abs(gyroZ_rate * dt);
+    if (!turnBy(6, turnAngleL))
+    {
+      Serial.println("EStop");
+      return;
     }
-    s1.write(180);
-    analogWrite(6, 0);
-    analogWrite(5, 0);
     Serial.println("Done5");
   }
+  else if (iput == 7)
+  {
+    clearInputBuffer();
+    // RX is clean, host can send the binary frame now
+    Serial.println("Frame");
+    runPlan();
+  }
   else if (iput == 9)
   {
     clearInputBuffer();
-    analogWrite(5, 0);
-    analogWrite(6, 0);
+    stopMotors();
     Serial.println("Done9");
   }
 }
@@ -211,4 +407,3 @@ void clearInputBuffer() {
     Serial.read(); 
   }
 }
-
@@ -0,0 +1,634 @@
+"""
+Who gets to drive which robot: owners, waiting line, liveness and run slots.
+
+All the claim / release / status / heartbeat / queue rules live in
+AccessControl and every one of them runs as a single atomic transition,
+so two requests can never both become owner or both start a run.
+
+Every robot (see fleet) has its own owner and its own run slot; there is
+one waiting line for all of them. Whenever a robot comes free the client
+at the head of the line gets it, and a new client gets the first free
+robot in registration order, so with one robot this is exactly the old
+single owner + queue.
+
+Where the state actually lives is up to the backend:
+
+  InProcessAccessControl   dicts + WaitQueue + DeadlineHeap behind one
+                           RLock. Fastest; fine for Flask's threaded server.
+                           open_journal() makes owners + line survive a
+                           restart (see state_journal).
+
+  SQLiteAccessControl      tables in a WAL-mode SQLite file, each transition
+                           one BEGIN IMMEDIATE transaction. Lets several
+                           worker processes (gunicorn -w N) share one queue.
+
+Only the access state is shared across processes. The serial port can
+only be held by one process, so with several workers the drive endpoints
+(/api/manualdrive, /api/runpath, /api/jobs/...) should be routed to a
+single worker; the shared run slots still guarantee that only one plan
+runs on each robot at a time.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from reaper import DeadlineHeap
+from state_feed import StateFeed
+from wait_queue import WaitQueue
+
+
+class AccessControl:
+    """
+    The state machine. Subclasses provide storage primitives (the _q_*,
+    _owner, _seen, ... methods below) plus _transaction(); everything
+    public here is built from those inside one transaction.
+    """
+
+    def __init__(self, owner_timeout, queue_timeout, robots=("robot",)):
+        self.owner_timeout = owner_timeout    # owner silent this long -> dropped
+        self.queue_timeout = queue_timeout    # waiting client silent this long -> loses spot
+        self.robots = list(robots)            # scheduling order: first free one gets the next client
+        # optional callable(event, client_id) for metrics: "queued",
+        # "left_queue", "skipped" (dropped when their turn came), "owner"
+        # and "owner_end". Called inside the transaction, so keep it cheap.
+        self.listener = None
+
+    # ---------- transitions ----------
+
+    def add_robot(self, robot):
+        """Register another robot; whoever is first in line gets it right away."""
+        with self._transaction():
+            if robot not in self.robots:
+                self.robots.append(robot)
+            self._schedule()
+
+    def claim(self, client_id):
+        """
+        Become owner of the first free robot, otherwise join the line.
+        Returns {"granted": bool, "position": int, "robot": name or None}.
+        """
+        with self._transaction():
+            self._touch(client_id)
+            self._expire_due(time.time())
+
+            robot = self._robot_of(client_id)
+            if robot is None:
+                robot = self._free_robot()
+                if robot is not None:
+                    self._set_owner(robot, client_id)
+                    self._touch(client_id)  # owners get the shorter timeout
+                    self._emit("owner", client_id)
+            if robot is not None:
+                return {"granted": True, "position": 0, "robot": robot}
+
+            self._enqueue(client_id)
+            return {"granted": False, "position": self._q_position(client_id), "robot": None}
+
+    def release(self, client_id):
+        """
+        Owner hands their robot to the next live client in line. A queued
+        client calling this just leaves the line.
+        """
+        with self._transaction():
+            robot = self._robot_of(client_id)
+            if robot is None:
+                left_queue = self._q_remove(client_id)
+                if left_queue:
+                    self._emit("left_queue", client_id)
+                    self._changed()
+                return {
+                    "released": False,
+                    "left_queue": left_queue,
+                    "owners": self._owners()
+                }
+
+            self._free(robot)
+            self._schedule()
+            return {
+                "released": True,
+                "robot": robot,
+                "owner": self._get_owner(robot),
+                "queue": self._q_list()
+            }
+
+    def status(self, client_id):
+        """Mark alive, expire anyone overdue, report is_owner + position + robot."""
+        with self._transaction():
+            self._touch(client_id)
+            self._expire_due(time.time())
+            return self._view(client_id)
+
+    def heartbeat(self, client_id):
+        """Mark alive, expire anyone overdue, return {robot: owner}."""
+        with self._transaction():
+            self._touch(client_id)
+            self._expire_due(time.time())
+            return self._owners()
+
+    def view(self, client_id):
+        """Read-only is_owner + position + robot, for the SSE stream."""
+        with self._transaction(write=False):
+            return self._view(client_id)
+
+    def check_driver(self, client_id):
+        """
+        Which robot may this client send drive commands to? The one they
+        own, or the first one nobody owns. Otherwise they're put in line
+        and we say None.
+        """
+        with self._transaction():
+            robot = self._robot_of(client_id) or self._free_robot()
+            if robot is not None:
+                return robot
+            self._touch(client_id)
+            self._enqueue(client_id)
+            return None
+
+    def start_run(self, client_id):
+        """
+        Owner check + busy check + claim that robot's run slot, atomically.
+        Returns (verdict, robot): verdict "ok", "queued" (owns no robot and
+        none is free; robot is None) or "busy" (a plan is running on it).
+        """
+        with self._transaction():
+            robot = self._robot_of(client_id) or self._free_robot()
+            if robot is None:
+                self._touch(client_id)
+                self._enqueue(client_id)
+                return "queued", None
+            if self._run_is_held(robot):
+                return "busy", robot
+            self._set_run(robot, client_id)
+            return "ok", robot
+
+    def finish_run(self, robot):
+        with self._transaction():
+            self._set_run(robot, None)
+
+    def expire_due(self):
+        """Drop everyone whose deadline passed. Called by the ReaperThread."""
+        now = time.time()
+        next_deadline = self.next_deadline()
+        if next_deadline is None or next_deadline > now:
+            return []
+        with self._transaction():
+            return self._expire_due(now)
+
+    def queue_list(self):
+        with self._transaction(write=False):
+            return self._q_list()
+
+    def snapshot(self):
+        """Everything /api/admin/state wants to show."""
+        with self._transaction(write=False):
+            return {
+                "robots": {
+                    robot: {"owner": self._get_owner(robot), "run_holder": self._get_run(robot)}
+                    for robot in self.robots
+                },
+                "queue": self._q_list(),
+                "tracked_clients": self._seen_count()
+            }
+
+    # ---------- shared helpers (call inside a transaction) ----------
+
+    def _owners(self):
+        return {robot: self._get_owner(robot) for robot in self.robots}
+
+    def _robot_of(self, client_id):
+        """The robot this client owns, or None. A client owns at most one."""
+        for robot in self.robots:
+            if self._get_owner(robot) == client_id:
+                return robot
+        return None
+
+    def _free_robot(self):
+        for robot in self.robots:
+            if self._get_owner(robot) is None:
+                return robot
+        return None
+
+    def _timeout_for(self, client_id):
+        if self._robot_of(client_id) is not None:
+            return self.owner_timeout
+        return self.queue_timeout
+
+    def _touch(self, client_id):
+        now = time.time()
+        self._set_seen(client_id, now, now + self._timeout_for(client_id))
+
+    def _emit(self, event, client_id):
+        if self.listener is not None:
+            self.listener(event, client_id)
+
+    def _enqueue(self, client_id):
+        if self._q_append(client_id):
+            self._emit("queued", client_id)
+            self._changed()
+
+    def _view(self, client_id):
+        robot = self._robot_of(client_id)
+        if robot is not None:
+            return {"is_owner": True, "position": 0, "robot": robot}
+        return {"is_owner": False, "position": self._q_position(client_id), "robot": None}
+
+    def _is_alive(self, client_id, timeout):
+        last = self._get_seen(client_id)
+        return last is not None and (time.time() - last) <= timeout
+
+    def _free(self, robot):
+        previous = self._get_owner(robot)
+        if previous is not None:
+            self._emit("owner_end", previous)
+        self._set_owner(robot, None)
+
+    def _schedule(self):
+        """
+        Hand free robots to the clients at the head of the line, first
+        free robot first. Anyone in line we haven't heard from within
+        queue_timeout is skipped instead of being promoted and then
+        timing out as owner.
+        """
+        robot = self._free_robot()
+        while robot is not None:
+            next_id = self._q_popleft()
+            if next_id is None:
+                break
+            if self._is_alive(next_id, self.queue_timeout):
+                self._set_owner(robot, next_id)
+                # fresh owner_timeout so they don't get insta-dropped while
+                # their browser moves from waiting.html to the draw page
+                self._touch(next_id)
+                self._emit("owner", next_id)
+                robot = self._free_robot()
+            else:
+                self._emit("skipped", next_id)
+        self._changed()
+
+    def _expire_due(self, now):
+        expired = self._pop_due(now)
+        for client_id in expired:
+            robot = self._robot_of(client_id)
+            if robot is not None:
+                self._free(robot)
+                self._schedule()
+            elif self._q_remove(client_id):
+                self._emit("left_queue", client_id)
+                self._changed()
+        return expired
+
+    def _run_is_held(self, robot):
+        return self._get_run(robot) is not None
+
+
+class InProcessAccessControl(AccessControl):
+    """
+    All state in this process, guarded by one re-entrant lock. With a
+    StateJournal open, owner and queue changes are also appended to it.
+    """
+
+    def __init__(self, owner_timeout, queue_timeout, robots=("robot",)):
+        super().__init__(owner_timeout, queue_timeout, robots)
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._feed = StateFeed()
+        self._owner = {}         # robot -> client_id, free robots absent
+        self._queue = WaitQueue()
+        self._last_seen = {}
+        self._deadlines = DeadlineHeap()
+        self._run_holder = {}    # robot -> client_id
+        self._journal = None
+
+    def open_journal(self, journal):
+        """
+        Put owners + waiting line back the way the journal left them, then
+        log every change to it from here on. Call once at startup, before
+        taking requests. Restored clients get queue_timeout to show up
+        again; owners of robots that are no longer configured are dropped.
+        """
+        state, records = journal.load()
+        with self._transaction():
+            if state is not None:
+                for robot, client_id in state["owners"].items():
+                    self._set_owner(robot, client_id)
+                for client_id in state["queue"]:
+                    self._q_append(client_id)
+            for record in records:
+                op, args = record[1], record[2:]
+                if op == "owner":
+                    self._set_owner(*args)
+                elif op == "in":
+                    self._q_append(*args)
+                elif op == "out":
+                    self._q_remove(*args)
+            for robot in set(self._owner) - set(self.robots):
+                del self._owner[robot]
+
+            now = time.time()
+            for client_id in list(self._owner.values()) + self._q_list():
+                self._set_seen(client_id, now, now + self.queue_timeout)
+
+            journal.start()
+            self._journal = journal
+            # robots added since (or freed by the drop above) go to the line
+            self._schedule()
+
+    @contextmanager
+    def _transaction(self, write=True):
+        with self._lock:
+            depth = getattr(self._local, "depth", 0)
+            if depth == 0:
+                self._dirty = False
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+                if depth == 0:
+                    if self._journal is not None and self._journal.snapshot_due:
+                        self._journal.snapshot({"owners": dict(self._owner), "queue": self._q_list()})
+                    if self._dirty:
+                        self._feed.publish()
+
+    def _changed(self):
+        self._dirty = True
+
+    @property
+    def version(self):
+        return self._feed.version
+
+    def wait_for_change(self, seen_version, timeout):
+        return self._feed.wait(seen_version, timeout)
+
+    def next_deadline(self):
+        return self._deadlines.next_deadline()
+
+    def _get_owner(self, robot):
+        return self._owner.get(robot)
+
+    def _set_owner(self, robot, client_id):
+        if client_id is None:
+            self._owner.pop(robot, None)
+        else:
+            self._owner[robot] = client_id
+        if self._journal is not None:
+            self._journal.append("owner", robot, client_id)
+
+    def _q_append(self, client_id):
+        added = self._queue.append(client_id)
+        if added and self._journal is not None:
+            self._journal.append("in", client_id)
+        return added
+
+    def _q_remove(self, client_id):
+        removed = self._queue.remove(client_id)
+        if removed and self._journal is not None:
+            self._journal.append("out", client_id)
+        return removed
+
+    def _q_popleft(self):
+        client_id = self._queue.popleft() if self._queue else None
+        if client_id is not None and self._journal is not None:
+            self._journal.append("out", client_id)
+        return client_id
+
+    def _q_position(self, client_id):
+        return self._queue.position(client_id)
+
+    def _q_list(self):
+        return self._queue.to_list()
+
+    def _get_seen(self, client_id):
+        return self._last_seen.get(client_id)
+
+    def _set_seen(self, client_id, last_seen, deadline):
+        self._last_seen[client_id] = last_seen
+        self._deadlines.set(client_id, deadline)
+
+    def _seen_count(self):
+        return len(self._last_seen)
+
+    def _pop_due(self, now):
+        expired = self._deadlines.pop_due(now)
+        for client_id in expired:
+            self._last_seen.pop(client_id, None)
+        return expired
+
+    def _get_run(self, robot):
+        return self._run_holder.get(robot)
+
+    def _set_run(self, robot, client_id):
+        if client_id is None:
+            self._run_holder.pop(robot, None)
+        else:
+            self._run_holder[robot] = client_id
+
+
+class SQLiteAccessControl(AccessControl):
+    """
+    State in a WAL-mode SQLite file shared by every worker process.
+
+    Each thread gets its own connection. Writers take BEGIN IMMEDIATE so
+    transitions serialise across processes. A small watcher thread per
+    process notices version bumps made by other processes and wakes the
+    local /api/stream listeners.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS kv (
+            k TEXT PRIMARY KEY,
+            v TEXT
+        );
+        CREATE TABLE IF NOT EXISTS queue (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS clients (
+            client_id TEXT PRIMARY KEY,
+            last_seen REAL NOT NULL,
+            deadline REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS clients_deadline ON clients(deadline);
+        INSERT OR IGNORE INTO kv (k, v) VALUES ('version', '0');
+    """
+
+    def __init__(self, owner_timeout, queue_timeout, path, robots=("robot",), watch_every=0.2):
+        super().__init__(owner_timeout, queue_timeout, robots)
+        self.path = path
+        self.watch_every = watch_every
+        self._local = threading.local()
+        self._feed = StateFeed()
+        self._watcher = None
+        self._watcher_lock = threading.Lock()
+
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def _transaction(self, write=True):
+        conn = self._conn()
+        depth = self._local.depth
+        if depth == 0:
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            self._local.dirty = False
+        self._local.depth = depth + 1
+        try:
+            yield
+        except BaseException:
+            self._local.depth = depth
+            if depth == 0:
+                conn.execute("ROLLBACK")
+            raise
+        self._local.depth = depth
+        if depth == 0:
+            dirty = self._local.dirty
+            if dirty:
+                conn.execute("UPDATE kv SET v = CAST(v AS INTEGER) + 1 WHERE k = 'version'")
+            conn.execute("COMMIT")
+            if dirty:
+                self._feed.publish()
+
+    def _changed(self):
+        self._local.dirty = True
+
+    # ---------- change notification across processes ----------
+
+    @property
+    def version(self):
+        return self._feed.version
+
+    def wait_for_change(self, seen_version, timeout):
+        self._start_watcher()
+        return self._feed.wait(seen_version, timeout)
+
+    def _start_watcher(self):
+        with self._watcher_lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="access-watch", daemon=True)
+                self._watcher.start()
+
+    def _watch(self):
+        conn = self._conn()
+        last = None
+        while True:
+            row = conn.execute("SELECT v FROM kv WHERE k = 'version'").fetchone()
+            if last is not None and row[0] != last:
+                self._feed.publish()
+            last = row[0]
+            time.sleep(self.watch_every)
+
+    # ---------- primitives ----------
+
+    def next_deadline(self):
+        row = self._conn().execute("SELECT MIN(deadline) FROM clients").fetchone()
+        return row[0]
+
+    def _kv_get(self, key):
+        row = self._conn().execute("SELECT v FROM kv WHERE k = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _kv_set(self, key, value):
+        if value is None:
+            self._conn().execute("DELETE FROM kv WHERE k = ?", (key,))
+        else:
+            self._conn().execute("INSERT OR REPLACE INTO kv (k, v) VALUES (?, ?)", (key, value))
+
+    def _get_owner(self, robot):
+        return self._kv_get(f"owner:{robot}")
+
+    def _set_owner(self, robot, client_id):
+        self._kv_set(f"owner:{robot}", client_id)
+
+    def _q_append(self, client_id):
+        cur = self._conn().execute("INSERT OR IGNORE INTO queue (client_id) VALUES (?)", (client_id,))
+        return cur.rowcount == 1
+
+    def _q_remove(self, client_id):
+        cur = self._conn().execute("DELETE FROM queue WHERE client_id = ?", (client_id,))
+        return cur.rowcount == 1
+
+    def _q_popleft(self):
+        conn = self._conn()
+        row = conn.execute("SELECT seq, client_id FROM queue ORDER BY seq LIMIT 1").fetchone()
+        if row is None:
+            return None
+        conn.execute("DELETE FROM queue WHERE seq = ?", (row[0],))
+        return row[1]
+
+    def _q_position(self, client_id):
+        # range count over the rowid key: O(position), fine for event-sized lines
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM queue WHERE seq <= (SELECT seq FROM queue WHERE client_id = ?)",
+            (client_id,)
+        ).fetchone()
+        return row[0] or None
+
+    def _q_list(self):
+        rows = self._conn().execute("SELECT client_id FROM queue ORDER BY seq").fetchall()
+        return [r[0] for r in rows]
+
+    def _get_seen(self, client_id):
+        row = self._conn().execute(
+            "SELECT last_seen FROM clients WHERE client_id = ?", (client_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_seen(self, client_id, last_seen, deadline):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO clients (client_id, last_seen, deadline) VALUES (?, ?, ?)",
+            (client_id, last_seen, deadline)
+        )
+
+    def _seen_count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+
+    def _pop_due(self, now):
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT client_id FROM clients WHERE deadline <= ? ORDER BY deadline", (now,)
+        ).fetchall()
+        conn.execute("DELETE FROM clients WHERE deadline <= ?", (now,))
+        return [r[0] for r in rows]
+
+    def _get_run(self, robot):
+        return self._kv_get(f"run:{robot}")
+
+    def _set_run(self, robot, client_id):
+        # remember which process holds the slot so a crashed worker can't
+        # leave the robot "busy" forever
+        self._kv_set(f"run:{robot}", None if client_id is None else f"{os.getpid()}:{client_id}")
+
+    def _run_is_held(self, robot):
+        holder = self._get_run(robot)
+        if holder is None:
+            return False
+        pid = int(holder.split(":", 1)[0])
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+
+def make_access_control(backend, owner_timeout, queue_timeout, db_path=None, robots=("robot",)):
+    if backend == "memory":
+        return InProcessAccessControl(owner_timeout, queue_timeout, robots)
+    if backend == "sqlite":
+        return SQLiteAccessControl(owner_timeout, queue_timeout, db_path, robots)
+    raise ValueError(f"unknown access backend {backend!r}")
@@ -0,0 +1,328 @@
+"""
+Long-lived serial connection to the Arduino.
+
+Opening the port toggles DTR, which reboots the Uno, so we only want to do
+that once. ArduinoLink owns the one serial.Serial for the whole server:
+
+  - it opens + boot-syncs when the server starts
+  - a small watchdog thread reopens it if the USB device drops
+  - every endpoint goes through session(), which hands the port out
+    to one caller at a time
+
+The sketch prints READY_MARKER each time it's back at
+while(Serial.available()==0) with a cleared RX buffer, so instead of
+sleeping a fixed amount between commands we wait for that line.
+
+Reading goes through a serial_reader.LineReader thread per open port, so
+read_line() / wait_for_line() return as soon as the line arrives instead
+of polling readline().
+
+emergency_stop() is the one write that doesn't go through session(): it
+puts ESTOP_BYTE on the wire straight away, even while a plan holds the
+link, and the sketch cuts the current motion short and prints
+ESTOP_MARKER.
+"""
+
+import errno
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import serial
+
+from serial_reader import LineReader
+
+READY_MARKER = "Ready"
+ESTOP_BYTE = b"!"
+ESTOP_MARKER = "EStop"
+
+class ArduinoLink:
+    def __init__(self, port, baud, read_timeout=0.2, boot_timeout=4.5,
+                 ready_timeout=1.0, reconnect_every=2.0, on_line=None):
+        self.port = port
+        self.baud = baud
+        self.read_timeout = read_timeout
+        self.boot_timeout = boot_timeout    # Arduino reboots on open; max wait for first Ready
+        self.ready_timeout = ready_timeout  # max wait for Ready between commands (old firmware)
+        self.reconnect_every = reconnect_every
+        self.on_line = on_line  # sees every line on the reader thread
+
+        self._ser = None
+        self._reader = None
+        # another process has the board (a sibling WSGI worker won the
+        # exclusive open); session() would only be SIM MODE here
+        self.held_elsewhere = False
+        # the newest line is READY_MARKER and nothing was sent since. Newest,
+        # not just seen: the sketch repeats Ready after each idle IMU sample,
+        # so one can go out just before it reads our opcode; the echo that
+        # follows makes it stale
+        self._ready = False
+        self.last_sent_at = 0.0   # perf_counter() after the last write, for round-trip metrics
+
+        # hardware sessions so far and the seconds spent in them (utilisation)
+        self.sessions = 0
+        self.busy_seconds = 0.0
+        self._busy_since = None
+
+        # does the sketch on the other end do plan mode (opcode 7)?
+        # None until we've tried; reset whenever we reconnect
+        self.plan_mode_ok = None
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()  # writes vs emergency_stop()
+        self._estop = threading.Event()      # stop requested; set until the next session
+        self._estop_ack = threading.Event()
+        self._stop = threading.Event()
+        self._watchdog = None
+
+        # last few connect/disconnect messages, for /api/admin/state
+        self.connect_log = deque(maxlen=50)
+
+    # ---------- lifecycle ----------
+
+    @property
+    def connected(self):
+        return self._ser is not None
+
+    def start(self):
+        """Open the port now and keep it open in the background."""
+        if self._watchdog is not None:
+            return
+        with self._lock:
+            self._connect()
+        self._watchdog = threading.Thread(
+            target=self._watchdog_loop, name="arduino-link", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            self._close("[info] closed serial")
+
+    def _watchdog_loop(self):
+        while not self._stop.wait(self.reconnect_every):
+            if self._ser is not None:
+                # pyserial won't notice an unplugged board until the next
+                # read/write, so check the device node while we're idle
+                if self.port.startswith("/dev/") and not os.path.exists(self.port):
+                    with self._lock:
+                        self._close(f"[warn] {self.port} disappeared")
+                elif self._reader is not None and self._reader.error is not None:
+                    with self._lock:
+                        self._close(f"[warn] lost {self.port}: {self._reader.error}")
+                continue
+            with self._lock:
+                if self._ser is None:
+                    self._connect()
+
+    def _log(self, line, serial_log=None):
+        self.connect_log.append(line)
+        if serial_log is not None:
+            serial_log.append(line)
+
+    def _connect(self, serial_log=None):
+        """Open + boot sync. Caller must hold the lock."""
+        try:
+            # exclusive: with several worker processes only one may hold the board
+            ser = serial.Serial(self.port, self.baud, timeout=self.read_timeout, exclusive=True)
+        except Exception as e:
+            self.held_elsewhere = getattr(e, "errno", None) in (errno.EAGAIN, errno.EWOULDBLOCK)
+            self._log(f"[warn] could not open {self.port}: {e}", serial_log)
+            return False
+        self.held_elsewhere = False
+
+        self._log(f"[info] opened {self.port} @ {self.baud}", serial_log)
+
+        # let Arduino boot + print "MPU6050 Found!", then wait for its first
+        # Ready instead of sleeping a fixed 3.5 s
+        self._ser = ser
+        self._reader = LineReader(ser, name=f"serial-reader {self.port}", on_line=self._on_line).start()
+        self._ready = False
+        self.plan_mode_ok = None
+        end_t = time.monotonic() + self.boot_timeout
+        while not self._ready and self._ser is not None:
+            remaining = end_t - time.monotonic()
+            if remaining <= 0:
+                break
+            raw = self.read_line(remaining)
+            if raw:
+                self._log(f"arduino -> {raw}", serial_log)
+        return self._ser is not None
+
+    def _close(self, reason):
+        if self._ser is None:
+            return
+        if self._reader is not None:
+            self._reader.stop()
+            self._reader = None
+        try:
+            self._ser.close()
+        except Exception:
+            pass
+        self._ser = None
+        self._log(reason)
+
+    # ---------- per-request access ----------
+
+    @contextmanager
+    def session(self, serial_log):
+        """
+        Exclusive use of the link for one manual command or one motor plan.
+
+        Yields True when real hardware is attached, False for SIM MODE.
+        Anything the board printed while nobody was listening is read and
+        dropped so the caller starts from a clean RX buffer (but we still
+        notice if it ended on Ready).
+        """
+        with self._lock:
+            if self._ser is None:
+                self._connect(serial_log)
+
+            if self._ser is None:
+                serial_log.append("[warn] SIM MODE (no Arduino)")
+                yield False
+                return
+
+            self._drain_pending()
+            self._estop.clear()
+            self.sessions += 1
+            self._busy_since = time.monotonic()
+            try:
+                yield self._ser is not None
+            finally:
+                self.busy_seconds += time.monotonic() - self._busy_since
+                self._busy_since = None
+
+    def busy_time(self):
+        """Seconds spent inside hardware sessions, including the one in progress."""
+        since = self._busy_since
+        return self.busy_seconds + (time.monotonic() - since if since is not None else 0.0)
+
+    def _drain_pending(self):
+        if self._reader is None:
+            return
+        lines = self._reader.drain()
+        if lines:
+            self._ready = lines[-1] == READY_MARKER
+
+    def wait_ready(self, serial_log=None, timeout=None):
+        """
+        Block until the sketch prints Ready, i.e. it's back at
+        while(Serial.available()==0) and its clearInputBuffer() is done,
+        so the next opcode won't get thrown away. Returns as soon as the
+        line arrives; False on timeout (e.g. firmware without the marker).
+        """
+        if timeout is None:
+            timeout = self.ready_timeout
+        if not self._ready:
+            self.wait_for_line(lambda raw: raw == READY_MARKER, timeout, serial_log)
+        return self._ready
+
+    def wait_for_line(self, match, timeout, serial_log=None):
+        """
+        Read lines until match(line) is true and return that line; None
+        on timeout or a dropped link. Every line read on the way is
+        logged as "arduino -> ..." to serial_log.
+        """
+        end_t = time.monotonic() + timeout
+        while self._ser is not None:
+            remaining = end_t - time.monotonic()
+            if remaining <= 0:
+                return None
+            raw = self.read_line(remaining)
+            if raw is None:
+                continue
+            if serial_log is not None:
+                serial_log.append(f"arduino -> {raw}")
+            if match(raw):
+                return raw
+        return None
+
+    def send_line(self, val):
+        """
+        Write one newline-terminated value. Returns False if the link
+        dropped, or if an emergency stop is pending (nothing is sent then,
+        so a half-finished handshake can't start the robot up again).
+        """
+        return self._write((str(val) + "\n").encode("utf-8"))
+
+    def write_bytes(self, data):
+        """Write raw bytes (plan frames). Same return as send_line()."""
+        return self._write(data)
+
+    def _write(self, data):
+        with self._write_lock:
+            if self._ser is None or self._estop.is_set():
+                return False
+            self._ready = False
+            try:
+                self._ser.write(data)
+                self._ser.flush()
+                self.last_sent_at = time.perf_counter()
+                return True
+            except Exception as e:
+                self._close(f"[warn] lost {self.port}: {e}")
+                return False
+
+    def emergency_stop(self, timeout=1.0, retry_every=0.05):
+        """
+        Put ESTOP_BYTE on the wire now, without waiting for session(): the
+        plan executor may be sitting in a 15 s wait for Done with the link.
+
+        The byte is rewritten every retry_every until the sketch answers
+        ESTOP_MARKER, because one that lands just before a
+        clearInputBuffer() gets thrown away. Until the next session()
+        starts, send_line() / write_bytes() send nothing.
+
+        Returns seconds until the sketch acknowledged, or None (no link,
+        or a sketch without emergency stop support).
+        """
+        if self._ser is None:
+            return None
+        t0 = time.perf_counter()
+        end_t = t0 + timeout
+        self._estop.set()
+        self._estop_ack.clear()
+        while True:
+            with self._write_lock:
+                if self._ser is None:
+                    return None
+                try:
+                    self._ser.write(ESTOP_BYTE)
+                    self._ser.flush()
+                except Exception:
+                    return None
+            remaining = end_t - time.perf_counter()
+            if self._estop_ack.wait(max(min(retry_every, remaining), 0.0)):
+                return time.perf_counter() - t0
+            if time.perf_counter() >= end_t:
+                return None
+
+    @property
+    def estop_pending(self):
+        return self._estop.is_set()
+
+    def _on_line(self, line):
+        """LineReader hook (reader thread): notes EStop acks, then on_line."""
+        if line == ESTOP_MARKER:
+            self._estop_ack.set()
+        if self.on_line is not None:
+            self.on_line(line)
+
+    def read_line(self, timeout=None):
+        """
+        One stripped line, or None on timeout / dropped link. Returns the
+        moment a line is in; timeout defaults to read_timeout.
+        """
+        reader = self._reader
+        if self._ser is None or reader is None:
+            return None
+        raw = reader.get(self.read_timeout if timeout is None else timeout)
+        if raw is None:
+            if reader.error is not None:
+                self._close(f"[warn] lost {self.port}: {reader.error}")
+            return None
+        self._ready = raw == READY_MARKER
+        return raw
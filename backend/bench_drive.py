@@ -0,0 +1,88 @@
+"""
+Benchmark: mashing a drive button, then STOP, against the emulator.
+
+Fires --presses LEFT presses --interval apart (each on its own thread,
+like concurrent /api/manualdrive requests), then one STOP, two ways:
+
+  direct     every press is its own send_manual_command_to_arduino
+             (what /api/manualdrive did before the pipeline)
+  pipeline   presses go through server_copy.drive (merged turns, STOP
+             jumps the line)
+
+and reports how many commands the robot got, how far it turned, how
+long STOP took to reach it and how long after the last press it was
+still busy.
+
+    python bench_drive.py [--presses 20] [--interval 0.05] [--time-scale 1.0]
+"""
+
+import argparse
+import threading
+import time
+
+from emulator import RoboEmulator
+
+
+def mash(send, presses, interval):
+    """Returns (seconds from STOP press to STOP done, seconds from STOP press to idle)."""
+    threads = []
+    for _ in range(presses):
+        thread = threading.Thread(target=send, args=("LEFT",))
+        thread.start()
+        threads.append(thread)
+        time.sleep(interval)
+
+    stop_done = []
+    t_stop = time.perf_counter()
+
+    def stop():
+        send("STOP")
+        stop_done.append(time.perf_counter() - t_stop)
+
+    thread = threading.Thread(target=stop)
+    thread.start()
+    threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return stop_done[0], time.perf_counter() - t_stop
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--presses", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--time-scale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    emu = RoboEmulator(time_scale=args.time_scale, imu=False)
+    port = emu.start()
+
+    import server_copy as server
+    link = server.fleet.first.link
+    link.port = port
+    link.boot_timeout = max(3.0 * args.time_scale, 0.5) + 1.0
+    link.start()
+
+    def direct(command):
+        server.send_manual_command_to_arduino(command)
+
+    def pipeline(command):
+        server.fleet.first.drive.submit("bench", command).wait()
+
+    print(f"{args.presses} x LEFT every {args.interval * 1e3:.0f} ms, then STOP; "
+          f"robot at x{args.time_scale}")
+    print(f"{'':10}{'commands':>10}{'turned':>9}{'STOP after':>12}{'busy after':>12}")
+    try:
+        for name, send in (("direct", direct), ("pipeline", pipeline)):
+            commands_before, turned_before = emu.commands, emu.degrees_turned
+            stop_after, idle_after = mash(send, args.presses, args.interval)
+            commands = emu.commands - commands_before
+            turned = emu.degrees_turned - turned_before
+            print(f"{name:10}{commands:10d}{turned:6.0f}deg{stop_after:11.2f}s{idle_after:11.2f}s")
+    finally:
+        link.stop()
+        emu.stop()
+
+
+if __name__ == "__main__":
+    main()
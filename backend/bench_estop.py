@@ -0,0 +1,91 @@
+"""
+Benchmark: how fast does a STOP reach the motors mid-plan?
+
+Runs a plan of long FORWARD steps against the emulator, and --into
+seconds into the first step stops it two ways:
+
+  cancel   POST /api/jobs/<id>/cancel; the step in flight runs to the
+           end, then the plan stops (all there was before)
+  estop    POST /api/estop; ArduinoLink.emergency_stop() writes the stop
+           byte straight away and the sketch cuts the motion short
+  both     cancel, then estop; with plan frames only once the cancel's
+           '9' is on the wire, and the '!' behind it must still cut the
+           motion short
+
+in both step-by-step and plan-frame mode. "motors off" is request ->
+the emulated motion loop ending, "plan over" is request -> the job
+finished and the link is free again.
+
+    python bench_estop.py [--steps 4] [--step-ft 3.0] [--into 0.5]
+"""
+
+import argparse
+import time
+
+from emulator import RoboEmulator
+
+
+def wait_until(predicate, timeout=30.0):
+    end_t = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > end_t:
+            raise TimeoutError
+        time.sleep(0.001)
+
+
+def run_once(server, emu, client, plan, how, into):
+    job = server.fleet.first.jobs.submit("bench", plan)
+    wait_until(lambda: emu.moving)
+    time.sleep(into)
+
+    t0 = time.perf_counter()
+    if how != "estop":
+        client.post(f"/api/jobs/{job.id}/cancel", json={"user_id": "bench"})
+    if how == "both" and server.PLAN_UPLOAD:
+        wait_until(lambda: any(line.startswith("sent 9") for line in job.serial_log.texts()[1]))
+    if how != "cancel":
+        client.post("/api/estop", json={"client_id": "bench"})
+    wait_until(lambda: not emu.moving and emu.stopped_at > t0)
+    motors_off = emu.stopped_at - t0
+    wait_until(lambda: job.finished)
+    plan_over = time.perf_counter() - t0
+    # let the sketch get back to Ready before the next run
+    time.sleep(0.5)
+    return motors_off, plan_over, job.steps_done
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=4)
+    parser.add_argument("--step-ft", type=float, default=3.0)
+    parser.add_argument("--into", type=float, default=0.5, help="seconds into the first step")
+    args = parser.parse_args()
+
+    emu = RoboEmulator(time_scale=1.0, imu=False)
+    port = emu.start()
+
+    import server_copy as server
+    link = server.fleet.first.link
+    link.port = port
+    link.start()
+    server.access.claim("bench")
+    client = server.app.test_client()
+
+    plan = [{"action": "FORWARD", "distance_ft": args.step_ft} for _ in range(args.steps)]
+    print(f"{args.steps} x FORWARD {args.step_ft} ft, stopped {args.into}s into step 1")
+    print(f"{'':22}{'motors off':>12}{'plan over':>12}{'steps done':>12}")
+    try:
+        for plan_upload in (False, True):
+            server.PLAN_UPLOAD = plan_upload
+            mode = "plan frames" if plan_upload else "step by step"
+            for how in ("cancel", "estop", "both"):
+                motors_off, plan_over, steps_done = run_once(server, emu, client, plan, how, args.into)
+                print(f"{mode + ', ' + how:22}{motors_off * 1e3:10.1f}ms{plan_over * 1e3:10.1f}ms"
+                      f"{steps_done:12d}")
+    finally:
+        link.stop()
+        emu.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark: one waiting line, several emulated robots.
+
+Each phase lets --clients browsers claim at the same moment. Whoever
+gets a robot runs one drawing on it (POST /api/runpath, polls
+/api/jobs/<id> with heartbeats like draw.js) and releases; the rest wait
+in line polling /api/status like waiting.js, and the scheduler hands
+each freed robot to the head of the line. Between phases more robots
+are registered (server_copy.add_robot), each on its own RoboEmulator
+pty, so --robots 1,2,4 serves the same line with 1, then 2, then 4.
+
+Per phase: makespan (first claim -> last release), time in line
+(p50 / max), and per robot the drawings it ran and its utilisation
+(link busy time over the phase). /api/admin/state keeps the same
+utilisation since each robot was registered.
+
+    python bench_fleet.py [--robots 1,2,4] [--clients 8] [--time-scale 0.05]
+"""
+
+import argparse
+import random
+import threading
+import time
+from collections import Counter
+
+from emulator import RoboEmulator
+
+STATUS_POLL = 0.05
+JOB_POLL = 0.05
+HEARTBEAT_EVERY = 1.0
+
+
+def make_segments(rng, n):
+    heading = rng.uniform(0.0, 360.0)
+    segments = []
+    for _ in range(n):
+        heading += rng.uniform(-40.0, 40.0)
+        segments.append({"distance_feet": rng.uniform(0.05, 0.2), "heading_degrees": heading})
+    return segments
+
+
+def visit(server, client_id, segments, start, out):
+    """One browser: claim, wait for a robot, draw, release."""
+    client = server.app.test_client()
+    post = {"client_id": client_id}
+    start.wait()
+    t0 = time.perf_counter()
+    view = client.post("/api/claim", json=post).get_json()
+    while not view.get("granted", view.get("is_owner")):
+        time.sleep(STATUS_POLL)
+        view = client.post("/api/status", json=post).get_json()
+    waited = time.perf_counter() - t0
+
+    started = client.post("/api/runpath", json={"user_id": client_id, "segments": segments}).get_json()
+    next_heartbeat = 0.0
+    while started.get("job_id"):
+        if time.monotonic() >= next_heartbeat:
+            client.post("/api/heartbeat", json=post)
+            next_heartbeat = time.monotonic() + HEARTBEAT_EVERY
+        job = client.get(f"/api/jobs/{started['job_id']}").get_json()
+        if job["status"] in ("done", "cancelled", "failed"):
+            break
+        time.sleep(JOB_POLL)
+
+    client.post("/api/release", json=post)
+    out.append((client_id, started.get("robot"), waited, time.perf_counter()))
+
+
+def run_phase(server, phase, args):
+    rng = random.Random(phase)
+    start = threading.Event()
+    out = []
+    threads = [
+        threading.Thread(target=visit, args=(
+            server, f"p{phase}-{i}", make_segments(rng, args.segments), start, out
+        ))
+        for i in range(args.clients)
+    ]
+    for thread in threads:
+        thread.start()
+    busy_before = {robot.name: robot.link.busy_time() for robot in server.fleet}
+    t0 = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    makespan = max(done for *_, done in out) - t0
+    busy = {robot.name: robot.link.busy_time() - busy_before[robot.name] for robot in server.fleet}
+    return makespan, out, busy
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--robots", default="1,2,4", help="robot count per phase, increasing")
+    parser.add_argument("--clients", type=int, default=8, help="browsers per phase")
+    parser.add_argument("--segments", type=int, default=10, help="segments per drawing")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="emulated robot speed")
+    args = parser.parse_args()
+    counts = [int(n) for n in args.robots.split(",")]
+
+    import server_copy as server
+    emulators = []
+
+    def new_port():
+        emu = RoboEmulator(time_scale=args.time_scale, imu=False, seed=len(emulators))
+        emulators.append(emu)
+        return emu.start()
+
+    def start_link(robot):
+        robot.link.boot_timeout = max(3.0 * args.time_scale, 0.5) + 1.0
+        robot.link.start()
+
+    server.fleet.first.link.port = new_port()
+    start_link(server.fleet.first)
+    print(f"{args.clients} browsers x {args.segments}-segment drawing per phase, "
+          f"robots at x{args.time_scale}")
+    print(f"{'robots':>6}{'makespan':>10}{'wait p50':>10}{'wait max':>10}   per robot: drawings, utilisation")
+    try:
+        for phase, count in enumerate(counts):
+            while len(server.fleet) < count:
+                start_link(server.add_robot(f"robot-{len(server.fleet) + 1}", new_port()))
+            makespan, out, busy = run_phase(server, phase, args)
+            waits = sorted(waited for _, _, waited, _ in out)
+            ran = Counter(robot for _, robot, _, _ in out)
+            per_robot = "  ".join(
+                f"{name} {ran.get(name, 0)}, {busy[name] / makespan:4.0%}" for name in busy
+            )
+            print(f"{count:6d}{makespan:9.2f}s{waits[len(waits) // 2]:9.2f}s{waits[-1]:9.2f}s   {per_robot}")
+
+        state = server.app.test_client().get("/api/admin/state").get_json()
+        print("since registration: " + "  ".join(
+            f"{name} {r['utilisation']:.0%} of {r['uptime_s']:.1f}s" for name, r in state["robots"].items()
+        ))
+    finally:
+        server.fleet.stop()
+        for emu in emulators:
+            emu.stop()
+
+
+if __name__ == "__main__":
+    main()
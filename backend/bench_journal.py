@@ -0,0 +1,94 @@
+"""
+Benchmark: what the state journal costs per transition, and how fast a
+restart gets the line back.
+
+Plays --ops random transitions (claims by new clients, owners
+releasing, clients leaving the line, status polls; the line hovers
+around --line clients) against InProcessAccessControl with --robots
+robots, with no journal and with one, then restarts from
+the journal into a fresh instance and checks owners + line match
+exactly. The restart runs twice: with snapshots every
+--snapshot-every records and with snapshots off (the whole history
+replayed), to show what compaction buys.
+
+    python bench_journal.py [--ops 200000] [--robots 2] [--line 200] [--snapshot-every 5000]
+"""
+
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+from access_control import InProcessAccessControl
+from state_journal import StateJournal
+
+
+def play(access, ops, line, seed):
+    rng = random.Random(seed)
+    clients = []
+    t0 = time.perf_counter()
+    for i in range(ops):
+        r = rng.random()
+        waiting = len(access._queue)
+        if not clients or (r < 0.3 and waiting < line):
+            client_id = f"c{i}"
+            clients.append(client_id)
+            access.claim(client_id)
+        elif r < 0.5 and access._owner:
+            access.release(rng.choice(list(access._owner.values())))
+        elif r < 0.6 and waiting:
+            access.release(rng.choice(access._q_list()))   # leaves the line
+        else:
+            access.status(rng.choice(clients[-2 * line - 10:]))
+    return time.perf_counter() - t0
+
+
+def restart(directory, snapshot_every, robots):
+    access = InProcessAccessControl(3600, 3600, robots)
+    journal = StateJournal(directory, snapshot_every=snapshot_every)
+    t0 = time.perf_counter()
+    access.open_journal(journal)
+    elapsed = time.perf_counter() - t0
+    journal.close()
+    return access, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--robots", type=int, default=2)
+    parser.add_argument("--line", type=int, default=200, help="clients waiting, roughly")
+    parser.add_argument("--snapshot-every", type=int, default=5000)
+    args = parser.parse_args()
+    robots = [f"robot-{i + 1}" for i in range(args.robots)]
+
+    plain = InProcessAccessControl(3600, 3600, robots)
+    t_plain = play(plain, args.ops, args.line, seed=1)
+
+    print(f"{args.ops} transitions, {args.robots} robots")
+    print(f"{'':28}{'per op':>10}{'restart':>10}{'replayed':>10}{'line':>8}")
+    print(f"{'no journal':28}{t_plain / args.ops * 1e6:8.2f}us")
+
+    for snapshot_every in (args.snapshot_every, args.ops * 10):
+        directory = tempfile.mkdtemp(prefix="bench_journal_")
+        try:
+            access = InProcessAccessControl(3600, 3600, robots)
+            journal = StateJournal(directory, snapshot_every=snapshot_every)
+            access.open_journal(journal)
+            t_journal = play(access, args.ops, args.line, seed=1)
+            journal.close()
+
+            restored, t_restart = restart(directory, snapshot_every, robots)
+            replayed = restored._journal.stats()["since_snapshot"]
+            same = restored._owner == access._owner and restored._q_list() == access._q_list()
+            assert same, "restored state differs"
+            label = f"snapshot every {snapshot_every}" if snapshot_every <= args.ops else "no snapshots"
+            print(f"{label:28}{t_journal / args.ops * 1e6:8.2f}us{t_restart * 1e3:8.1f}ms"
+                  f"{replayed:10d}{len(access._q_list()):8d}")
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Load test: N simulated browsers against the real app over HTTP.
+
+Runs server_copy.app on werkzeug's threaded server (same as __main__, on
+a free localhost port) with the RoboEmulator standing in for the board,
+then lets --clients browsers loose on it, arriving over --ramp seconds.
+Each one follows what the pages do when EventSource isn't available:
+
+  - access.js: POST /api/claim on load
+  - waiting.js: not granted -> POST /api/status right away and every 2 s
+    until is_owner
+  - owner: POST /api/heartbeat every 5 s; holds a drive button for
+    --drive seconds (POST /api/manualdrive, at most one every 100 ms as
+    controller.js repeats); POSTs one drawing to /api/runpath and polls
+    /api/jobs/<id> every 1 s like draw.js until it's finished; then
+    leaves (--leave release: POST /api/release, --leave timeout: just
+    stops talking, like closing the tab does today)
+
+Reported per endpoint: requests, errors, req/s over the run and p50 /
+p95 / p99 latency. Queue promotion latency comes from an
+in-process watcher on the access state:
+
+  handoff   previous owner left (release sent / last request) -> server
+            made the next client owner
+  notice    server promoted -> that client's poll saw is_owner
+  total     the two together, i.e. what the next person in line waits
+
+Everything also goes to --out as JSON, for tracking regressions; the
+default is bench_load.json in the temp dir, outside the tree.
+
+    python bench_load.py [--clients 50] [--duration 30] [--out results.json]
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import platform
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from werkzeug.serving import make_server
+
+from emulator import RoboEmulator
+
+STATUS_POLL = 2.0       # waiting.js setInterval(pollStatus, 2000)
+HEARTBEAT_EVERY = 5.0   # access.js setInterval(heartbeat, 5000)
+DRIVE_REPEAT = 0.1      # controller.js resends a held button every 100 ms
+JOB_POLL = 1.0          # draw.js watchJob
+DRIVE_COMMANDS = ("FORWARD", "LEFT", "RIGHT")
+
+
+class Recorder:
+    """Latency samples per endpoint, plus promotion timings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.left_at = {}        # client -> when it stopped being owner
+        self.promoted_at = {}    # client -> when the server made it owner
+        self.noticed_at = {}     # client -> when its poll said is_owner
+        self.handoff_from = {}   # client -> the owner it took over from
+
+    def request(self, endpoint, seconds, ok):
+        with self._lock:
+            self.latency[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+class Browser:
+    def __init__(self, index, port, rec, args, stop):
+        self.client_id = f"load-{index}"
+        self.port = port
+        self.rec = rec
+        self.args = args
+        self.stop = stop
+        self.rng = random.Random(index)
+        self._next_heartbeat = 0.0
+
+    def call(self, method, path, body=None, endpoint=None):
+        """One request on a fresh connection, like fetch() against werkzeug's HTTP/1.0."""
+        endpoint = endpoint or path.split("?")[0]
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        payload = json.dumps(body) if body is not None else None
+        t0 = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+            conn.request(method, path, payload, headers)
+            resp = conn.getresponse()
+            data = json.loads(resp.read() or b"{}")
+            conn.close()
+            ok = resp.status == 200
+        except (OSError, http.client.HTTPException, ValueError):
+            data, ok = {}, False
+        self.rec.request(endpoint, time.perf_counter() - t0, ok)
+        return data
+
+    def sleep(self, seconds):
+        return not self.stop.wait(seconds)
+
+    def run(self):
+        post = {"client_id": self.client_id}
+        if not self.call("POST", "/api/claim", post).get("granted"):
+            if not self.wait_in_line():
+                return
+            self.rec.noticed_at[self.client_id] = time.time()
+        self.drive_session()
+
+    def wait_in_line(self):
+        post = {"client_id": self.client_id}
+        while not self.stop.is_set():
+            view = self.call("POST", "/api/status", post)
+            if view.get("ok") and view.get("is_owner"):
+                return True
+            if not self.sleep(STATUS_POLL):
+                return False
+        return False
+
+    def heartbeat_due(self):
+        now = time.monotonic()
+        if now >= self._next_heartbeat:
+            self._next_heartbeat = now + HEARTBEAT_EVERY
+            self.call("POST", "/api/heartbeat", {"client_id": self.client_id})
+
+    def drive_session(self):
+        # hold one button down
+        command = self.rng.choice(DRIVE_COMMANDS)
+        end_t = time.monotonic() + self.args.drive
+        while time.monotonic() < end_t and not self.stop.is_set():
+            self.heartbeat_due()
+            t0 = time.monotonic()
+            self.call("POST", "/api/manualdrive", {"user_id": self.client_id, "command": command})
+            self.sleep(max(DRIVE_REPEAT - (time.monotonic() - t0), 0.0))
+
+        # one drawing, then follow the job
+        started = self.call("POST", "/api/runpath", {
+            "user_id": self.client_id,
+            "segments": make_drawing(self.rng, self.args.drawing_segments)
+        })
+        job_id = started.get("job_id")
+        since = 0
+        while job_id and not self.stop.is_set():
+            self.heartbeat_due()
+            job = self.call("GET", f"/api/jobs/{job_id}?since={since}", endpoint="/api/jobs/<id>")
+            if not job.get("ok"):
+                break
+            since = job["log_offset"] + len(job["serial_log"])
+            if job["status"] in ("done", "cancelled", "failed"):
+                break
+            self.sleep(JOB_POLL)
+
+        self.rec.left_at[self.client_id] = time.time()
+        if self.args.leave == "release":
+            self.call("POST", "/api/release", {"client_id": self.client_id})
+
+
+def make_drawing(rng, n):
+    heading = rng.uniform(0.0, 360.0)
+    segments = []
+    for _ in range(n):
+        heading += rng.uniform(-40.0, 40.0)
+        segments.append({"distance_feet": rng.uniform(0.02, 0.1), "heading_degrees": heading})
+    return segments
+
+
+def owners(access):
+    return {robot: slots["owner"] for robot, slots in access.snapshot()["robots"].items()}
+
+
+def watch_owner(access, rec, stop):
+    """Timestamps every owner change, per robot, on the server side."""
+    previous = owners(access)
+    while not stop.is_set():
+        seen = access.version
+        current = owners(access)
+        for robot, owner in current.items():
+            before = previous.get(robot)
+            if owner != before and owner is not None:
+                rec.promoted_at[owner] = time.time()
+                if before is not None:
+                    rec.handoff_from[owner] = before
+        previous = current
+        access.wait_for_change(seen, 0.5)
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = max(math.ceil(p / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[k]
+
+
+def summarize(values, elapsed=None):
+    values = sorted(values)
+    out = {"count": len(values)}
+    if elapsed:
+        out["req_per_s"] = round(len(values) / elapsed, 2)
+    for p in (50, 95, 99):
+        v = percentile(values, p)
+        out[f"p{p}_ms"] = round(v * 1e3, 2) if v is not None else None
+    out["max_ms"] = round(values[-1] * 1e3, 2) if values else None
+    return out
+
+
+def promotion_report(rec):
+    handoff, notice, total = [], [], []
+    for client, promoted in rec.promoted_at.items():
+        previous = rec.handoff_from.get(client)
+        noticed = rec.noticed_at.get(client)
+        left = rec.left_at.get(previous)
+        if left is not None:
+            handoff.append(max(promoted - left, 0.0))
+        if noticed is not None:
+            notice.append(max(noticed - promoted, 0.0))
+            if left is not None:
+                total.append(max(noticed - left, 0.0))
+    return {
+        "promotions": len(rec.promoted_at),
+        "handoff": summarize(handoff),
+        "notice": summarize(notice),
+        "total": summarize(total)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--ramp", type=float, default=5.0, help="browsers arrive over this many seconds")
+    parser.add_argument("--drive", type=float, default=2.0, help="seconds each owner holds a drive button")
+    parser.add_argument("--drawing-segments", type=int, default=40)
+    parser.add_argument("--leave", choices=("release", "timeout"), default="release")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="emulated robot speed")
+    parser.add_argument("--out", default=os.path.join(tempfile.gettempdir(), "bench_load.json"),
+                        help="write the results here as JSON")
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    emu = RoboEmulator(time_scale=args.time_scale)
+    port = emu.start()
+
+    import server_copy as server
+    link = server.fleet.first.link
+    link.port = port
+    link.boot_timeout = max(3.0 * args.time_scale, 0.5) + 1.0
+    link.start()
+    server.reaper.start()
+
+    httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, name="http", daemon=True).start()
+
+    rec = Recorder()
+    stop = threading.Event()
+    threading.Thread(target=watch_owner, args=(server.access, rec, stop), daemon=True).start()
+
+    browsers = [Browser(i, httpd.server_port, rec, args, stop) for i in range(args.clients)]
+    threads = []
+    t0 = time.perf_counter()
+    for i, browser in enumerate(browsers):
+        arrive = args.ramp * i / max(args.clients, 1)
+        delay = arrive - (time.perf_counter() - t0)
+        if delay > 0 and stop.wait(delay):
+            break
+        thread = threading.Thread(target=browser.run, name=browser.client_id, daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    stop.wait(max(args.duration - (time.perf_counter() - t0), 0.0))
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=35)
+    elapsed = time.perf_counter() - t0
+
+    httpd.shutdown()
+    link.stop()
+    emu.stop()
+
+    endpoints = {name: summarize(values, elapsed) for name, values in sorted(rec.latency.items())}
+    for name, stats in endpoints.items():
+        stats["errors"] = rec.errors.get(name, 0)
+    results = {
+        "benchmark": "bench_load",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "elapsed_s": round(elapsed, 3),
+        "endpoints": endpoints,
+        "promotion": promotion_report(rec),
+        "emulator": {"commands": emu.commands, "steps": emu.steps}
+    }
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{args.clients} browsers, {elapsed:.1f}s, robot emulated at x{args.time_scale}")
+    print(f"{'endpoint':18}{'reqs':>7}{'err':>5}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, s in endpoints.items():
+        print(f"{name:18}{s['count']:7d}{s['errors']:5d}{s['req_per_s']:8.1f}"
+              f"{s['p50_ms']:7.1f}ms{s['p95_ms']:7.1f}ms{s['p99_ms']:7.1f}ms")
+    promo = results["promotion"]
+    print(f"promotions: {promo['promotions']}")
+    for part in ("handoff", "notice", "total"):
+        s = promo[part]
+        if s["count"]:
+            print(f"  {part:8} p50 {s['p50_ms']:8.1f}ms  p95 {s['p95_ms']:8.1f}ms  p99 {s['p99_ms']:8.1f}ms")
+    print(f"results -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
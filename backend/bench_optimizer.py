@@ -0,0 +1,97 @@
+"""
+Benchmark: what plan_optimizer buys and whether it keeps its error bound.
+
+Builds --paths random drawings (draw.js-ish hops with the odd sharp
+corner), runs build_motor_plan and then optimize_motor_plan at each
+--tolerances value, and drives both plans through a model of the
+firmware (whole-degree turns, as plan_frame sends them). Per tolerance:
+steps and predicted time saved, and how far each plan's end point lands
+from the drawn one, next to how far the unoptimized plan lands just from
+its own rounding. It also counts plans whose report breaks
+max_error_ft <= max(tolerance_ft, rounding_floor_ft) or whose driven end
+point is further off than that, which should both be 0.
+
+    python bench_optimizer.py [--paths 1500] [--segments 60] [--tolerances 0,0.0005,0.002]
+"""
+
+import argparse
+import math
+import random
+
+from plan_frame import step_to_opcode
+from plan_optimizer import optimize_motor_plan
+from server_copy import build_motor_plan, cost_model
+
+
+def make_segments(rng, n):
+    heading = rng.uniform(0.0, 360.0)
+    segments = []
+    for _ in range(n):
+        heading += rng.gauss(0.0, 6.0) if rng.random() < 0.9 else rng.uniform(-150.0, 150.0)
+        segments.append({"distance_feet": rng.uniform(0.005, 0.08), "heading_degrees": heading})
+    return segments
+
+
+def end_point(motor_plan, whole_degrees):
+    """Where the robot stops; whole_degrees=False is the drawn path itself."""
+    heading = x = y = 0.0
+    for step in motor_plan:
+        if whole_degrees:
+            sent = step_to_opcode(step)
+            if sent is None:
+                continue
+            opcode, param = sent
+            if opcode in (4, 5):
+                heading += param if opcode == 5 else -param
+            else:
+                x += param * math.cos(math.radians(heading))
+                y += param * math.sin(math.radians(heading))
+        elif step["action"] in ("TURN_LEFT", "TURN_RIGHT"):
+            heading += step["deg"] if step["action"] == "TURN_LEFT" else -step["deg"]
+        elif step["action"] == "FORWARD":
+            x += step["distance_ft"] * math.cos(math.radians(heading))
+            y += step["distance_ft"] * math.sin(math.radians(heading))
+    return x, y
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paths", type=int, default=1500)
+    parser.add_argument("--segments", type=int, default=60)
+    parser.add_argument("--tolerances", default="0,0.0005,0.002", help="tolerance_ft values")
+    args = parser.parse_args()
+    tolerances = [float(t) for t in args.tolerances.split(",")]
+
+    rng = random.Random(0)
+    plans = [build_motor_plan(make_segments(rng, args.segments)) for _ in range(args.paths)]
+    drawn = [end_point(plan, whole_degrees=False) for plan in plans]
+    baseline_err = [
+        math.dist(end_point(plan, whole_degrees=True), target) for plan, target in zip(plans, drawn)
+    ]
+
+    print(f"{args.paths} drawings x {args.segments} segments; unoptimized end point off by "
+          f"{sum(baseline_err) / len(plans) * 1e3:.2f} mft mean, {max(baseline_err) * 1e3:.2f} mft max")
+    print(f"{'tolerance_ft':>12}{'steps':>8}{'time':>8}{'end err mean':>14}{'max':>9}"
+          f"{'worse than base':>17}{'bound broken':>14}")
+    for tolerance in tolerances:
+        steps = saved = 0.0
+        errs = []
+        worse = broken = 0
+        for plan, target, base in zip(plans, drawn, baseline_err):
+            optimized, report = optimize_motor_plan(plan, cost_model, tolerance)
+            steps += report["steps_after"] / report["steps_before"]
+            saved += report["predicted_ms_after"] / report["predicted_ms_before"]
+            err = math.dist(end_point(optimized, whole_degrees=True), target)
+            errs.append(err)
+            bound = max(tolerance, report["rounding_floor_ft"]) + 1e-9
+            if err > max(tolerance, base) + 1e-9:
+                worse += 1
+            if report["max_error_ft"] > bound or err > bound:
+                broken += 1
+        n = len(plans)
+        print(f"{tolerance:12g}{steps / n:8.0%}{saved / n:8.0%}{sum(errs) / n * 1e3:10.2f} mft"
+              f"{max(errs) * 1e3:5.2f} mft{worse:17d}{broken:14d}")
+
+
+if __name__ == "__main__":
+    main()
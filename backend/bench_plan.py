@@ -0,0 +1,74 @@
+"""
+Benchmark: compiling a huge imported drawing into a motor plan.
+
+Times build_motor_plan (pure Python, one dict at a time) against
+plan_compiler.compile_motor_plan (NumPy) on the same segments, checks
+both produce the identical plan, and splits the NumPy side into the
+dict -> array conversion and the compile itself.
+
+    python bench_plan.py [--segments 100000] [--repeat 5]
+"""
+
+import argparse
+import random
+import time
+
+import plan_compiler
+from server_copy import HEADING_OFFSET, build_motor_plan
+
+
+def make_segments(n):
+    # mix of draw.js-ish short hops, long straight runs and the odd
+    # wound-up heading an SVG/G-code import might hand us
+    segments = []
+    heading = 0.0
+    for _ in range(n):
+        heading += random.gauss(0.0, 8.0)
+        if random.random() < 0.01:
+            heading += random.choice((720.0, -1080.0))
+        segments.append({
+            "distance_feet": f"{random.uniform(0.005, 0.05):.6f}",
+            "heading_degrees": heading
+        })
+    return segments
+
+
+def best_of(repeat, fn, *args):
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not plan_compiler.available:
+        print("numpy not installed, nothing to compare")
+        return
+
+    random.seed(0)
+    segments = make_segments(args.segments)
+
+    t_py, plan_py = best_of(args.repeat, build_motor_plan, segments)
+    t_conv, (distances, headings) = best_of(args.repeat, plan_compiler.segments_to_arrays, segments)
+    t_np, plan_np = best_of(args.repeat, plan_compiler.compile_motor_plan,
+                            distances, headings, HEADING_OFFSET)
+
+    print(f"{args.segments} segments -> {len(plan_py)} steps, best of {args.repeat}")
+    print(f"{'build_motor_plan':24}{t_py * 1e3:10.1f}ms")
+    print(f"{'segments_to_arrays':24}{t_conv * 1e3:10.1f}ms")
+    print(f"{'compile_motor_plan':24}{t_np * 1e3:10.1f}ms")
+    print(f"{'numpy total':24}{(t_conv + t_np) * 1e3:10.1f}ms  "
+          f"({t_py / (t_conv + t_np):.1f}x)")
+    print("identical output:", plan_py == plan_np)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: 10k clients sitting in the waiting line, all polling status.
+
+Compares the old plain-list queue against WaitQueue for the operations
+/api/status, /api/claim and promotion actually do, then runs the real
+/api/status route through Flask's test client with a full queue.
+
+    python bench_queue.py [--clients 10000] [--polls 20000]
+"""
+
+import argparse
+import random
+import time
+
+from wait_queue import WaitQueue
+
+
+def bench_list(client_ids, polls):
+    queue = []
+    t0 = time.perf_counter()
+    for cid in client_ids:
+        if cid not in queue:
+            queue.append(cid)
+    t_fill = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for cid in polls:
+        if cid in queue:
+            queue.index(cid) + 1
+    t_poll = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    while queue:
+        queue.pop(0)
+    t_drain = time.perf_counter() - t0
+    return t_fill, t_poll, t_drain
+
+
+def bench_wait_queue(client_ids, polls):
+    queue = WaitQueue()
+    t0 = time.perf_counter()
+    for cid in client_ids:
+        queue.append(cid)
+    t_fill = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for cid in polls:
+        queue.position(cid)
+    t_poll = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    while queue:
+        queue.popleft()
+    t_drain = time.perf_counter() - t0
+    return t_fill, t_poll, t_drain
+
+
+def bench_status_route(client_ids, polls):
+    """End-to-end /api/status with the queue full of client_ids."""
+    import server_copy
+
+    access = server_copy.access
+    access.owner_timeout = access.queue_timeout = 3600  # nobody goes stale mid-run
+    access.claim("bench-owner")
+    for cid in client_ids:
+        access.claim(cid)
+
+    client = server_copy.app.test_client()
+    t0 = time.perf_counter()
+    for cid in polls:
+        client.post("/api/status", json={"client_id": cid})
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--polls", type=int, default=20000)
+    parser.add_argument("--route-polls", type=int, default=2000)
+    parser.add_argument("--no-route", action="store_true", help="skip the Flask part")
+    args = parser.parse_args()
+
+    random.seed(0)
+    client_ids = [f"user-{i}" for i in range(args.clients)]
+    polls = [random.choice(client_ids) for _ in range(args.polls)]
+
+    print(f"{args.clients} queued clients, {args.polls} status polls")
+    print(f"{'':12}{'fill':>12}{'poll':>12}{'per poll':>12}{'drain':>12}")
+    for name, fn in (("list", bench_list), ("WaitQueue", bench_wait_queue)):
+        t_fill, t_poll, t_drain = fn(client_ids, polls)
+        print(f"{name:12}{t_fill * 1e3:10.1f}ms{t_poll * 1e3:10.1f}ms"
+              f"{t_poll / len(polls) * 1e6:10.2f}us{t_drain * 1e3:10.1f}ms")
+
+    if not args.no_route:
+        route_polls = polls[:args.route_polls]
+        elapsed = bench_status_route(client_ids, route_polls)
+        print(f"/api/status via test client: {len(route_polls) / elapsed:.0f} req/s "
+              f"({elapsed / len(route_polls) * 1e6:.0f}us each)")
+
+
+if __name__ == "__main__":
+    main()
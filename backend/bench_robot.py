@@ -0,0 +1,82 @@
+"""
+Benchmark: run_motor_plan_on_arduino end to end against the emulator.
+
+Starts a RoboEmulator on a pty, points server_copy's ArduinoLink at it
+and runs the same motor plan step by step and as uploaded plan frames.
+For each it reports wall time, how much of that the emulated robot was
+busy (motion + the sketch's own delays) and the protocol overhead per
+step that's left, which is the part the server code is responsible for.
+
+    python bench_robot.py [--segments 60] [--time-scale 0.1]
+
+Needs no hardware, so it can run in CI; a small --time-scale keeps it
+quick while still exercising every timeout and handshake.
+"""
+
+import argparse
+import random
+import time
+
+from emulator import RoboEmulator
+
+
+def make_segments(n):
+    random.seed(0)
+    heading = 0.0
+    segments = []
+    for _ in range(n):
+        heading += random.uniform(-40.0, 40.0)
+        segments.append({"distance_feet": random.uniform(0.02, 0.1), "heading_degrees": heading})
+    return segments
+
+
+def run_once(server, emu, motor_plan, plan_upload):
+    server.PLAN_UPLOAD = plan_upload
+    busy_before, steps_before = emu.busy_time, emu.steps
+    t0 = time.perf_counter()
+    log = server.run_motor_plan_on_arduino(motor_plan)
+    wall = time.perf_counter() - t0
+    _, lines = log.texts()
+    problems = [line for line in lines if line.startswith("[warn]") or "(no " in line]
+    return {
+        "wall": wall,
+        "busy": emu.busy_time - busy_before,
+        "steps": emu.steps - steps_before,
+        "problems": problems
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=60)
+    parser.add_argument("--time-scale", type=float, default=0.1)
+    args = parser.parse_args()
+
+    emu = RoboEmulator(time_scale=args.time_scale)
+    port = emu.start()
+
+    import server_copy as server
+    link = server.fleet.first.link
+    link.port = port
+    link.boot_timeout = max(3.0 * args.time_scale, 0.5) + 1.0
+    link.start()
+
+    motor_plan = server.build_motor_plan(make_segments(args.segments))
+    print(f"{len(motor_plan)} steps on {port}, time scale {args.time_scale}")
+    print(f"{'':14}{'wall':>10}{'robot busy':>12}{'overhead':>10}{'per step':>10}{'steps':>7}")
+    try:
+        for name, plan_upload in (("step by step", False), ("plan frames", True)):
+            r = run_once(server, emu, motor_plan, plan_upload)
+            overhead = r["wall"] - r["busy"]
+            per_step = overhead / r["steps"] if r["steps"] else float("nan")
+            print(f"{name:14}{r['wall']:9.2f}s{r['busy']:11.2f}s{overhead:9.2f}s"
+                  f"{per_step * 1e3:8.1f}ms{r['steps']:7d}")
+            for line in r["problems"][:5]:
+                print(f"    {line}")
+    finally:
+        link.stop()
+        emu.stop()
+
+
+if __name__ == "__main__":
+    main()
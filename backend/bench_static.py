@@ -0,0 +1,140 @@
+"""
+Benchmark: requests, bytes on the wire and server CPU per UI page load.
+
+Loads each UI page (the HTML plus every script, stylesheet and image it
+references) through the app's test client the way a phone would
+(Accept-Encoding br/gzip, Accept image/webp, viewport --viewport CSS px
+at --dpr), first from Flask's static_folder straight out of --src (what
+we had) and then from the static_assets build of --src. Each is loaded
+cold and again as a revisit with a warm browser cache: anything that
+came back immutable isn't requested at all, everything else is
+revalidated with If-None-Match. Flask's static files are all
+revalidated; the bundle only revalidates the HTML.
+
+    python bench_static.py [--src ../frontEnd] [--viewport 390] [--dpr 3] [--repeat 50]
+"""
+
+import argparse
+import gzip
+import os
+import re
+import shutil
+import tempfile
+import time
+
+REF = re.compile(r'''(?:src|href)\s*=\s*["']([^"'#?]+)["']''')
+PAGES = ("/index.html", "/home.html", "/controller.html", "/waiting.html")
+
+
+def subresources(html):
+    return [
+        "/" + url.lstrip("./").lstrip("/")
+        for url in REF.findall(html)
+        if not url.startswith(("http:", "https:", "//")) and not url.endswith(".html")
+    ]
+
+
+def decoded(resp):
+    data = resp.get_data()
+    encoding = resp.headers.get("Content-Encoding")
+    if encoding == "br":
+        import brotli
+        return brotli.decompress(data)
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    return data
+
+
+def page_load(client, page, headers, cache):
+    """
+    One visit. cache maps URL -> (etag, immutable, subresources) from
+    earlier visits and is updated in place; returns (requests, body
+    bytes, server CPU seconds).
+    """
+    requests = body = 0
+    cpu = 0.0
+    urls = [page]
+    for url in urls:
+        cached = cache.get(url)
+        if cached is not None and cached[1]:
+            continue  # immutable: the browser doesn't even ask
+        h = dict(headers)
+        if cached is not None:
+            h["If-None-Match"] = cached[0]
+        t0 = time.process_time()
+        resp = client.get(url, headers=h)
+        data = resp.get_data()
+        cpu += time.process_time() - t0
+        requests += 1
+        body += len(data)
+
+        if resp.status_code == 304:
+            urls.extend(cached[2])
+        elif resp.status_code == 200:
+            refs = subresources(decoded(resp).decode()) if url.endswith(".html") else []
+            urls.extend(refs)
+            if "ETag" in resp.headers:
+                immutable = "immutable" in resp.headers.get("Cache-Control", "")
+                cache[url] = (resp.headers["ETag"], immutable, refs)
+    return requests, body, cpu
+
+
+def measure(client, headers, repeat, warm):
+    totals = [0, 0, 0.0]
+    for page in PAGES:
+        cache = {}
+        if warm:
+            page_load(client, page, headers, cache)
+        for _ in range(repeat):
+            visit_cache = dict(cache) if warm else {}
+            requests, body, cpu = page_load(client, page, headers, visit_cache)
+            totals[0] += requests
+            totals[1] += body
+            totals[2] += cpu
+    n = repeat * len(PAGES)
+    return totals[0] / n, totals[1] / n, totals[2] / n
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--src", default=os.path.join(os.path.dirname(__file__), "..", "frontEnd"))
+    parser.add_argument("--viewport", type=int, default=390, help="CSS px")
+    parser.add_argument("--dpr", type=float, default=3.0)
+    parser.add_argument("--repeat", type=int, default=50, help="visits per page")
+    args = parser.parse_args()
+
+    import server_copy as server
+    from static_assets import AssetServer, build
+
+    headers = {
+        "Accept-Encoding": "gzip, deflate, br",
+        "Accept": "image/avif,image/webp,*/*",
+        "Sec-CH-Viewport-Width": str(args.viewport),
+        "Sec-CH-DPR": str(args.dpr)
+    }
+    client = server.app.test_client()
+    build_dir = tempfile.mkdtemp(prefix="bench_static_")
+    try:
+        server.assets = None
+        server.app.static_folder = os.path.abspath(args.src)
+        rows = [("static", measure(client, headers, args.repeat, warm=False)),
+                ("static revisit", measure(client, headers, args.repeat, warm=True))]
+
+        t0 = time.perf_counter()
+        build(args.src, build_dir)
+        built_in = time.perf_counter() - t0
+        server.assets = AssetServer.load(build_dir)
+        rows += [("bundle", measure(client, headers, args.repeat, warm=False)),
+                 ("bundle revisit", measure(client, headers, args.repeat, warm=True))]
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    print(f"{len(PAGES)} pages, phone at {args.viewport} CSS px x{args.dpr}; "
+          f"bundle built in {built_in:.2f}s, {server.assets.total_bytes / 1024:.0f} KB in memory")
+    print(f"{'per page load':16}{'requests':>10}{'KB':>10}{'server CPU':>12}")
+    for name, (requests, body, cpu) in rows:
+        print(f"{name:16}{requests:10.1f}{body / 1024:10.1f}{cpu * 1e3:10.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: how much IMU telemetry reaches /api/telemetry.
+
+Starts a RoboEmulator with IMU prints on a pty, lets the robot sit idle
+for --idle seconds, then drives a --segments drawing both step by step
+and as plan frames. Reports the samples per second the ring got while
+idle and over each run (the sketch only streams while it waits for an
+opcode, so motion pauses it), whether the runs still finished cleanly
+with samples + Readys arriving around every opcode, and what a
+/api/telemetry query over the idle stretch returns.
+
+    python bench_telemetry.py [--idle 3] [--segments 20] [--time-scale 1.0]
+"""
+
+import argparse
+import random
+import time
+
+from emulator import TELEMETRY_INTERVAL, RoboEmulator
+
+
+def make_segments(n):
+    rng = random.Random(0)
+    heading = 0.0
+    segments = []
+    for _ in range(n):
+        heading += rng.uniform(-40.0, 40.0)
+        segments.append({"distance_feet": rng.uniform(0.02, 0.1), "heading_degrees": heading})
+    return segments
+
+
+def received(ring, since, until):
+    """Samples the ring took in [since, until] (len(ring) stops at capacity)."""
+    return sum(bucket["n"] for bucket in ring.query(since, until, 1)["buckets"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--idle", type=float, default=3.0, help="seconds idle before driving")
+    parser.add_argument("--segments", type=int, default=20)
+    parser.add_argument("--time-scale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    emu = RoboEmulator(time_scale=args.time_scale)
+    port = emu.start()
+
+    import server_copy as server
+    robot = server.fleet.first
+    link = robot.link
+    link.port = port
+    link.boot_timeout = max(3.0 * args.time_scale, 0.5) + 1.0
+    link.start()
+    client = server.app.test_client()
+    ring = robot.telemetry.ring
+
+    expected = 1.0 / (TELEMETRY_INTERVAL * args.time_scale)
+    print(f"{port}, time scale {args.time_scale}: sketch streams {expected:.0f} samples/s while idle")
+    print(f"{'':14}{'seconds':>9}{'samples':>9}{'per s':>8}{'steps':>7}  problems")
+    try:
+        t0 = time.time()
+        time.sleep(args.idle)
+        t1 = time.time()
+        got = received(ring, t0, t1)
+        print(f"{'idle':14}{t1 - t0:9.2f}{got:9d}{got / (t1 - t0):8.1f}")
+
+        motor_plan = server.build_motor_plan(make_segments(args.segments))
+        for name, plan_upload in (("step by step", False), ("plan frames", True)):
+            server.PLAN_UPLOAD = plan_upload
+            steps_before, t_before = emu.steps, time.time()
+            log = server.run_motor_plan_on_arduino(motor_plan)
+            t_after = time.time()
+            elapsed = t_after - t_before
+            _, lines = log.texts()
+            problems = [line for line in lines if line.startswith("[warn]") or "(no " in line]
+            got = received(ring, t_before, t_after)
+            print(f"{name:14}{elapsed:9.2f}{got:9d}{got / elapsed:8.1f}{emu.steps - steps_before:7d}  "
+                  f"{len(problems)}")
+            for line in problems[:5]:
+                print(f"    {line}")
+
+        result = client.get(f"/api/telemetry?since={t0}&until={t1}&buckets=10").get_json()
+        counts = [bucket["n"] for bucket in result["buckets"]]
+        gz = [bucket["gz"]["mean"] for bucket in result["buckets"]]
+        print(f"/api/telemetry over the idle stretch: {len(counts)} buckets, n per bucket "
+              f"{min(counts)}-{max(counts)}, gz mean {min(gz):+.3f}..{max(gz):+.3f}")
+    finally:
+        link.stop()
+        emu.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+"""
+ROBO.ino emulator on a pseudo-terminal.
+
+Without the board the server drops into SIM MODE, where every step is
+done instantly, so none of the serial protocol code (handshakes, Ready
+sync, plan frames, timeouts) gets exercised and there's nothing to time.
+RoboEmulator plays the sketch instead, byte for byte, on a pty:
+
+  - the DTR reset: opening the port reboots the board, so the sketch
+    (re)starts with its boot banner ("MPU6050 Found") and the setup()
+    delay each time the host opens the pty
+  - per loop(): IMU print, delay(200), clearInputBuffer(), "Ready", then
+    while waiting for the opcode an IMU print + "Ready" every 100 ms
+  - Serial.parseInt / parseFloat / readBytes with the 1 s Stream timeout,
+    so a param sent before the echo really does get thrown away
+  - echo, then Done<n> after a motion time from degrees / distance and
+    the PWM tier; plan mode (opcode 7) with frame checks and '9' aborts
+  - the '!' emergency stop: mid-motion, at the input waits and between
+    plan steps, answered with "EStop" (estop=False plays a sketch from
+    before it, which ignores the byte)
+
+serial.Serial opens the pty path like any other port, so the server runs
+against it unchanged:
+
+    emu = RoboEmulator(time_scale=0.1)
+    port = emu.start()           # e.g. /dev/pts/5
+    ...
+    emu.stop()
+
+time_scale scales every delay (1.0 = real time, 0 = as fast as possible).
+python emulator.py runs one in the foreground and prints its port.
+"""
+
+import argparse
+import fcntl
+import os
+import pty
+import random
+import struct
+import termios
+import threading
+import time
+import tty
+
+from plan_frame import FRAME_MAGIC, MAX_PLAN_STEPS, crc16
+
+ESTOP_BYTE = ord("!")
+
+STREAM_TIMEOUT = 1.0        # Arduino Stream default setTimeout(1000)
+BOOT_DELAY = 1.5            # bootloader + setup() until "MPU6050 Found"
+SETUP_DELAY = 0.3           # delay(300) at the end of setup()
+LOOP_DELAY = 0.2            # delay(200) at the top of loop()
+TELEMETRY_INTERVAL = 0.1    # TELEMETRY_MS, IMU samples while waiting for an opcode
+
+# emulated robot; same ballpark as the calibration placeholders in server_copy
+FT_PER_S = {120: 1.0, 180: 1.5, 240: 2.0}
+DEG_PER_S = 100.0
+MOTOR_START = 0.05          # spin-up before anything moves
+
+
+class RoboEmulator:
+    def __init__(self, time_scale=1.0, plan_mode=True, imu=True, estop=True, seed=0):
+        self.time_scale = time_scale
+        self.plan_mode = plan_mode
+        self.imu = imu
+        self.estop = estop
+        self._rng = random.Random(seed)
+
+        self._master = None
+        self._slave = None
+        self._rx = bytearray()
+        self._rx_cond = threading.Condition()
+        self._in_plan = False       # inPlan / planCancel
+        self._plan_cancel = False
+        self._stop = threading.Event()
+        self._reset = threading.Event()
+        self._threads = []
+
+        # what the emulated robot did, for benchmarks
+        self.commands = 0
+        self.steps = 0
+        self.busy_time = 0.0     # scaled seconds spent "moving" / delaying
+        self.degrees_turned = 0.0
+        self.feet_driven = 0.0
+        self.moving = False
+        self.estops = 0
+        self.samples = 0         # IMU prints, for telemetry benchmarks
+        self.stopped_at = None   # perf_counter() when the motors last stopped
+        self.boots = 0
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        """Open the pty and boot. Returns the port path to hand to pyserial."""
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        # packet mode, so the host flushing its input (pyserial does on
+        # open) shows up here; that's our stand-in for the DTR reset
+        fcntl.ioctl(self._master, termios.TIOCPKT, struct.pack("i", 1))
+        for target, name in ((self._rx_loop, "emu-rx"), (self._sketch, "emu-sketch")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return os.ttyname(self._slave)
+
+    def stop(self):
+        self._stop.set()
+        self._notify()
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+
+    # ---------- host side of the wire ----------
+
+    def _rx_loop(self):
+        while not self._stop.is_set():
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                return
+            if not data:
+                return
+            if data[0] != termios.TIOCPKT_DATA:
+                if data[0] & termios.TIOCPKT_FLUSHREAD:
+                    self._reset.set()
+                    self._notify()
+                continue
+            with self._rx_cond:
+                self._rx += data[1:]
+                self._rx_cond.notify_all()
+
+    def _notify(self):
+        with self._rx_cond:
+            self._rx_cond.notify_all()
+
+    def _println(self, text=""):
+        try:
+            os.write(self._master, f"{text}\r\n".encode())
+        except (OSError, TypeError):
+            self._stop.set()
+
+    def _echo(self, iput, clear):
+        """
+        Serial.println(iput) followed by clearInputBuffer(). On the board
+        the clear runs microseconds after the echo is queued, long before
+        the Pi can answer it; here a thread switch could land in between
+        and wipe the Pi's reply, so both happen under the rx lock.
+        """
+        with self._rx_cond:
+            self._println(iput)
+            if clear:
+                self._rx.clear()
+
+    # ---------- Arduino Serial / timing primitives ----------
+
+    def _check(self):
+        if self._stop.is_set():
+            raise _Stopped()
+        if self._reset.is_set():
+            raise _Reset()
+
+    def _delay(self, seconds):
+        scaled = seconds * self.time_scale
+        self.busy_time += scaled
+        if scaled > 0:
+            end_t = time.monotonic() + scaled
+            with self._rx_cond:
+                while not (self._stop.is_set() or self._reset.is_set()):
+                    remaining = end_t - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._rx_cond.wait(remaining)
+        self._check()
+
+    def _available(self):
+        with self._rx_cond:
+            return len(self._rx)
+
+    def _clear_input_buffer(self):
+        with self._rx_cond:
+            self._rx.clear()
+
+    def _wait_available(self):
+        """while (Serial.available() == 0) {}"""
+        with self._rx_cond:
+            while not self._rx:
+                self._check()
+                self._rx_cond.wait(0.5)
+
+    def _timed_read(self, peek=False):
+        """Stream::timedRead / timedPeek: next byte or -1 after the timeout."""
+        with self._rx_cond:
+            self._rx_cond.wait_for(
+                lambda: self._rx or self._stop.is_set() or self._reset.is_set(), STREAM_TIMEOUT
+            )
+            self._check()
+            if not self._rx:
+                return -1
+            b = self._rx[0]
+            if not peek:
+                del self._rx[0]
+            return b
+
+    def _read_byte(self):
+        with self._rx_cond:
+            if not self._rx:
+                return -1
+            b = self._rx[0]
+            del self._rx[0]
+            return b
+
+    def _parse_number(self, allow_dot):
+        """Serial.parseInt / parseFloat (SKIP_ALL lookahead)."""
+        while True:
+            c = self._timed_read(peek=True)
+            if c < 0:
+                return 0
+            if c == ord("-") or ord("0") <= c <= ord("9") or (allow_dot and c == ord(".")):
+                break
+            self._timed_read()
+        text = ""
+        while True:
+            c = self._timed_read(peek=True)
+            if c < 0:
+                break
+            ch = chr(c)
+            if ch.isdigit() or (ch == "-" and not text) or (allow_dot and ch == "." and "." not in text):
+                text += ch
+                self._timed_read()
+            else:
+                break
+        try:
+            return float(text) if allow_dot else int(text)
+        except ValueError:
+            return 0
+
+    def _read_bytes(self, n):
+        """Serial.readBytes with the Stream timeout between bytes."""
+        out = bytearray()
+        while len(out) < n:
+            c = self._timed_read()
+            if c < 0:
+                break
+            out.append(c)
+        return bytes(out)
+
+    # ---------- the sketch ----------
+
+    def _sketch(self):
+        """Power on, then reboot on every reset until stop()."""
+        while not self._stop.is_set():
+            self._reset.clear()
+            with self._rx_cond:
+                self._rx.clear()
+            self.boots += 1
+            try:
+                self._delay(BOOT_DELAY)
+                self._println("MPU6050 Found")
+                self._delay(SETUP_DELAY)
+                while True:
+                    self._loop()
+            except _Reset:
+                continue
+            except _Stopped:
+                return
+
+    def _print_imu(self):
+        self.samples += 1
+        gauss = self._rng.gauss
+        self._println(f"Acceleration: {gauss(0.0, 0.05):.2f}")
+        self._println(f"{gauss(0.0, 0.05):.2f}")
+        self._println(f"Turn rate: {gauss(0.0, 0.01):.2f}")
+
+    def _estop_requested(self):
+        """
+        estopRequested(): skip stray bytes, stop on '!'. A '9' is the plan
+        cancel (planCancel) inside a frame and the next opcode outside one.
+        Caller holds the lock.
+        """
+        while self._rx:
+            c = self._rx[0]
+            if c == ESTOP_BYTE:
+                del self._rx[0]
+                return True
+            if c == ord("9"):
+                if not self._in_plan:
+                    return False
+                self._plan_cancel = True
+            del self._rx[0]
+        return False
+
+    def _move(self, seconds):
+        """A motion loop: runs for `seconds` unless '!' comes in. False if it was cut short."""
+        self.moving = True
+        start = time.monotonic()
+        end_t = start + seconds * self.time_scale
+        finished = True
+        try:
+            with self._rx_cond:
+                while True:
+                    self._check()
+                    if self.estop and self._estop_requested():
+                        finished = False
+                        break
+                    remaining = end_t - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._rx_cond.wait(remaining)
+        finally:
+            self.moving = False
+            self.stopped_at = time.perf_counter()
+            self.busy_time += time.monotonic() - start
+        if not finished:
+            self.estops += 1
+        return finished
+
+    def _drive(self, pwm, distance):
+        self.feet_driven += max(distance, 0.0)
+        return self._move(MOTOR_START + max(distance, 0.0) / FT_PER_S[pwm])
+
+    def _turn(self, degrees):
+        self.degrees_turned += max(degrees, 0.0)
+        return self._move(MOTOR_START + max(degrees, 0.0) / DEG_PER_S)
+
+    def _wait_for_input(self):
+        """waitForInput(): False (motors off, "EStop") if the first byte is '!'."""
+        self._wait_available()
+        if not self.estop:
+            return True
+        with self._rx_cond:
+            if self._rx[0] != ESTOP_BYTE:
+                return True
+            del self._rx[0]
+        self.estops += 1
+        self.stopped_at = time.perf_counter()
+        self._println("EStop")
+        return False
+
+    def _wait_for_opcode(self):
+        """waitForOpcode(): an IMU print + "Ready" every TELEMETRY_INTERVAL until input, then waitForInput()."""
+        interval = TELEMETRY_INTERVAL * self.time_scale
+        if self.imu and interval > 0:
+            next_sample = time.monotonic() + interval
+            with self._rx_cond:
+                while not self._rx:
+                    self._check()
+                    remaining = next_sample - time.monotonic()
+                    if remaining > 0:
+                        self._rx_cond.wait(remaining)
+                        continue
+                    next_sample += interval
+                    self._print_imu()
+                    self._println("Ready")
+        return self._wait_for_input()
+
+    def _loop(self):
+        if self.imu:
+            self._print_imu()
+        self._delay(LOOP_DELAY)
+        self._clear_input_buffer()
+        self._println("Ready")
+        if not self._wait_for_opcode():
+            return
+        iput = self._parse_number(allow_dot=False)
+        clears = iput in (1, 2, 3, 4, 5, 9) or (iput == 7 and self.plan_mode)
+        self._echo(iput, clear=clears)
+        self.commands += 1
+
+        if iput in (1, 2, 3):
+            if not self._wait_for_input():
+                return
+            distance = self._parse_number(allow_dot=True)
+            if not self._drive({1: 120, 2: 180, 3: 240}[iput], distance):
+                self._println("EStop")
+                return
+            self.steps += 1
+            self._println(f"Done{iput}")
+        elif iput in (4, 5):
+            if not self._wait_for_input():
+                return
+            if not self._turn(self._parse_number(allow_dot=False)):
+                self._println("EStop")
+                return
+            self.steps += 1
+            self._println(f"Done{iput}")
+        elif iput == 7 and self.plan_mode:
+            self._println("Frame")
+            self._run_plan()
+        elif iput == 9:
+            self._println("Done9")
+
+    def _run_plan(self):
+        header = self._read_bytes(3)
+        if len(header) != 3 or header[:2] != FRAME_MAGIC:
+            self._println("PlanErr header")
+            return
+        count = header[2]
+        if count > MAX_PLAN_STEPS:
+            self._println("PlanErr size")
+            return
+        body = self._read_bytes(count * 5)
+        if len(body) != count * 5:
+            self._println("PlanErr short")
+            return
+        tail = self._read_bytes(2)
+        if len(tail) != 2 or struct.unpack("<H", tail)[0] != crc16(header + body):
+            self._println("PlanErr crc")
+            return
+
+        self._println(f"PlanOk {count}")
+        self._in_plan = True
+        self._plan_cancel = False
+        try:
+            self._run_plan_steps(body, count)
+        finally:
+            self._in_plan = False
+
+    def _run_plan_steps(self, body, count):
+        for i in range(count):
+            if self._plan_cancel:
+                self._println("PlanAbort")
+                return
+            if self._available():
+                c = self._read_byte()
+                if c == ord("9") or (self.estop and c == ESTOP_BYTE):
+                    if c == ESTOP_BYTE:
+                        self.estops += 1
+                        self.stopped_at = time.perf_counter()
+                        self._println("EStop")
+                    self._println("PlanAbort")
+                    return
+            op, param = struct.unpack_from("<Bf", body, i * 5)
+            finished = True
+            if op in (1, 2, 3):
+                finished = self._drive({1: 120, 2: 180, 3: 240}[op], param)
+            elif op in (4, 5):
+                finished = self._turn(param)
+            if not finished:
+                self._println("EStop")
+                self._println("PlanAbort")
+                return
+            self.steps += 1
+            self._println(f"Step {i} Done{op}")
+        self._println("PlanDone")
+
+
+class _Stopped(Exception):
+    pass
+
+
+class _Reset(Exception):
+    pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--time-scale", type=float, default=1.0)
+    parser.add_argument("--no-plan-mode", action="store_true", help="act like a sketch without opcode 7")
+    parser.add_argument("--no-imu", action="store_true")
+    args = parser.parse_args()
+
+    emu = RoboEmulator(args.time_scale, plan_mode=not args.no_plan_mode, imu=not args.no_imu)
+    port = emu.start()
+    print(f"emulating ROBO.ino on {port} (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emu.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+The robots this server drives, by name.
+
+A Robot bundles one serial device with its ArduinoLink, JobRunner,
+DrivePipeline and Telemetry ring; Fleet is the registry the endpoints
+look them up in. Who drives which robot is decided in access_control.
+
+Utilisation is measured where the port lives: time the link spent in
+hardware sessions (a plan or a manual command on the wire) over time
+since the robot was registered.
+"""
+
+import time
+
+
+class Robot:
+    """
+    One serial device and everything that hangs off it. jobs (JobRunner)
+    and drive (DrivePipeline) are set by whoever registers the robot,
+    since what they run needs the robot itself.
+    """
+
+    def __init__(self, name, link, telemetry):
+        self.name = name
+        self.link = link
+        self.telemetry = telemetry
+        self.jobs = None
+        self.drive = None
+        self.added_at = time.monotonic()
+
+    @property
+    def busy(self):
+        """A plan is running or a manual command is in flight / pending."""
+        return self.jobs.busy or self.drive.busy
+
+    def utilisation(self):
+        up = time.monotonic() - self.added_at
+        busy = self.link.busy_time()
+        return {
+            "uptime_s": round(up, 1),
+            "busy_s": round(busy, 1),
+            "utilisation": round(busy / up, 4) if up > 0 else 0.0,
+            "sessions": self.link.sessions
+        }
+
+
+class Fleet:
+    """name -> Robot, in registration order (which is scheduling order)."""
+
+    def __init__(self):
+        self._robots = {}
+
+    def add(self, robot):
+        if robot.name in self._robots:
+            raise ValueError(f"robot {robot.name!r} already registered")
+        self._robots[robot.name] = robot
+        return robot
+
+    def get(self, name):
+        return self._robots.get(name)
+
+    def __getitem__(self, name):
+        return self._robots[name]
+
+    def __iter__(self):
+        return iter(list(self._robots.values()))
+
+    def __len__(self):
+        return len(self._robots)
+
+    @property
+    def first(self):
+        return next(iter(self._robots.values()))
+
+    def find_job(self, job_id):
+        """(robot, job) for a job id from any robot, or (None, None)."""
+        for robot in self:
+            job = robot.jobs.get(job_id)
+            if job is not None:
+                return robot, job
+        return None, None
+
+    def running_job_of(self, client_id):
+        """(robot, job) for the plan this client has running, or (None, None)."""
+        for robot in self:
+            job = robot.jobs.active
+            if job is not None and job.owner == client_id:
+                return robot, job
+        return None, None
+
+    def start(self):
+        for robot in self:
+            robot.link.start()
+
+    def stop(self):
+        for robot in self:
+            robot.link.stop()
@@ -0,0 +1,172 @@
+"""
+Background run-path jobs.
+
+/api/runpath submits a PlanJob and returns its id; a single background
+worker runs the plan on the Arduino while the browser polls
+/api/jobs/<id> for progress, the partial serial_log and the result (or
+streams the log from /api/jobs/<id>/log).
+
+Each robot has its own JobRunner (see fleet) and only one job runs on
+it at a time, so "is the robot busy" is simply "is there an active job".
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from run_log import RunLog
+
+JOB_HISTORY = 50  # finished jobs we keep around for late pollers
+
+
+class PlanJob:
+    """
+    One submitted motor plan and everything we know about its run.
+
+    status goes: "queued" -> "running" -> "done" | "cancelled" | "failed"
+    serial_log is a RunLog appended to live by the runner, so pollers can
+    read it partially while the plan is still going.
+    """
+
+    def __init__(self, owner, motor_plan, serial_log=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.owner = owner
+        self.motor_plan = motor_plan
+        self.status = "queued"
+        self.steps_total = len(motor_plan)
+        self.steps_done = 0
+        self.current_step = None
+        self.serial_log = serial_log if serial_log is not None else RunLog()
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "cancelled", "failed")
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def request_cancel(self):
+        self._cancel.set()
+
+    def step_started(self, index):
+        self.current_step = index
+
+    def step_finished(self, index):
+        self.steps_done = index + 1
+        self.current_step = None
+
+    def to_dict(self, log_since=0):
+        """
+        JSON-able view. log_since lets a poller fetch only new log lines;
+        log_offset is the seq of the first line returned (later than
+        log_since if older lines have already been dropped).
+        """
+        log_offset, lines = self.serial_log.texts(log_since)
+        return {
+            "job_id": self.id,
+            "owner": self.owner,
+            "status": self.status,
+            "steps_total": self.steps_total,
+            "steps_done": self.steps_done,
+            "current_step": self.current_step,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "log_offset": log_offset,
+            "serial_log": lines,
+            "log_dropped": self.serial_log.dropped,
+        }
+
+
+class JobRunner:
+    """
+    Owns the one-worker executor and the table of recent jobs.
+
+    run_plan(job) is whatever actually drives the Arduino; it is expected
+    to fill job.serial_log, call job.step_started/step_finished and check
+    job.cancel_requested between steps. on_finish(job), if given, runs
+    after every job whatever the outcome. make_log() builds each job's
+    serial_log (retention / verbosity live there).
+    """
+
+    def __init__(self, run_plan, on_finish=None, history=JOB_HISTORY, make_log=RunLog):
+        self._run_plan = run_plan
+        self._on_finish = on_finish
+        self._make_log = make_log
+        self._history = history
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plan-job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._active = None
+
+    @property
+    def busy(self):
+        return self._active is not None
+
+    @property
+    def active(self):
+        return self._active
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def submit(self, owner, motor_plan):
+        """
+        Start a job for this plan. Returns None if another job is still
+        running, so the check-and-claim can't race between requests.
+        """
+        with self._lock:
+            if self._active is not None:
+                return None
+            job = PlanJob(owner, motor_plan, self._make_log())
+            self._active = job
+            self._jobs[job.id] = job
+            self._trim()
+        self._executor.submit(self._run, job)
+        return job
+
+    def cancel(self, job_id):
+        """Ask a job to stop after its current step. Returns the job or None."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if not job.finished:
+            job.request_cancel()
+        return job
+
+    def _run(self, job):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            self._run_plan(job)
+            job.status = "cancelled" if job.cancel_requested else "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            job.serial_log.append(f"[error] {e}")
+        finally:
+            job.finished_at = time.time()
+            job.serial_log.close()
+            with self._lock:
+                self._active = None
+            if self._on_finish is not None:
+                self._on_finish(job)
+
+    def _trim(self):
+        # drop the oldest finished jobs once we're over the history cap
+        while len(self._jobs) > self._history:
+            for job_id, job in self._jobs.items():
+                if job.finished:
+                    del self._jobs[job_id]
+                    break
+            else:
+                return
@@ -0,0 +1,182 @@
+"""
+Manual-drive command pipeline.
+
+DrivePipeline sits between /api/manualdrive and the Arduino. Presses go
+into a small pending set and one worker thread feeds the Arduino from
+it, one command at a time:
+
+  - LEFT / RIGHT nudges merge into one turn of the net summed degrees
+    (3 x LEFT + 1 x RIGHT at 10 deg -> one LEFT 20)
+  - FORWARD keeps only the latest intent (boost or not); more presses
+    while one is pending don't add distance
+  - STOP jumps ahead of everything: it throws away whatever turn or
+    forward is still pending and goes out next
+
+So however fast a held button repeats, at most one command is in flight
+with a STOP, a turn and a forward waiting behind it.
+
+Each press gets a DrivePress back. The request can wait() on it to
+report what was actually sent and its serial log.
+"""
+
+import threading
+
+TURN_COMMANDS = {"LEFT": -1, "RIGHT": 1}
+
+
+class DrivePress:
+    """
+    One button press. result, once done, is
+        {"status", "sent", "degrees", "coalesced", "serial_log"}
+    status: "executed" (went out, possibly merged with other presses),
+    "stopped" (a STOP overtook it), "cancelled_out" (LEFTs and RIGHTs
+    summed to nothing), "dropped" (control passed to someone else) or
+    "failed" (sending it raised).
+    """
+
+    def __init__(self, command, boost):
+        self.command = command
+        self.boost = boost
+        self.result = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _finish(self, status, sent=None, degrees=None, coalesced=1, serial_log=None):
+        self.result = {
+            "status": status,
+            "sent": sent,
+            "degrees": degrees,
+            "coalesced": coalesced,
+            "serial_log": serial_log
+        }
+        self._done.set()
+
+
+class DrivePipeline:
+    """
+    execute(command, boost, degrees) sends one command and returns its
+    RunLog; in the server that's send_manual_command_to_arduino.
+    """
+
+    def __init__(self, execute, turn_step_deg):
+        self._execute = execute
+        self.turn_step_deg = turn_step_deg
+        self._cond = threading.Condition()
+        self._owner = None
+        self._stop = []        # presses waiting on the next STOP
+        self._turn = None      # [net degrees, presses]; + is RIGHT
+        self._forward = None   # [boost, presses]
+        self._order = []       # "turn" / "forward", oldest first
+        self._thread = None
+        self.in_flight = None  # command being sent right now
+        self.presses = 0
+        self.sent = 0
+
+    @property
+    def busy(self):
+        return self.in_flight is not None or bool(self._stop or self._order)
+
+    def submit(self, owner, command, boost=False):
+        press = DrivePress(command, boost)
+        with self._cond:
+            self.presses += 1
+            if owner != self._owner:
+                # new driver; whatever the old one left pending isn't theirs
+                self._drop_pending("dropped")
+                self._owner = owner
+
+            if command in TURN_COMMANDS:
+                if self._turn is None:
+                    self._turn = [0, []]
+                    self._order.append("turn")
+                self._turn[0] += TURN_COMMANDS[command] * self.turn_step_deg
+                self._turn[1].append(press)
+            elif command == "FORWARD":
+                if self._forward is None:
+                    self._forward = [boost, []]
+                    self._order.append("forward")
+                self._forward[0] = boost
+                self._forward[1].append(press)
+            else:
+                # STOP (and anything unknown, as before) cuts the line
+                self._drop_pending("stopped")
+                self._stop.append(press)
+
+            self._start()
+            self._cond.notify()
+        return press
+
+    def halt(self):
+        """Drop pending turn / forward presses; an emergency stop is going out."""
+        with self._cond:
+            self._drop_pending("stopped")
+
+    def pending(self):
+        """What's waiting behind the command in flight, for /api/admin/state."""
+        with self._cond:
+            return {
+                "owner": self._owner,
+                "stop": bool(self._stop),
+                "turn_deg": self._turn[0] if self._turn else None,
+                "forward_boost": self._forward[0] if self._forward else None,
+                "in_flight": self.in_flight,
+                "presses": self.presses,
+                "sent": self.sent
+            }
+
+    def _drop_pending(self, status):
+        """Caller holds the lock."""
+        for entry in (self._turn, self._forward):
+            if entry is not None:
+                for press in entry[1]:
+                    press._finish(status, coalesced=len(entry[1]))
+        self._turn = self._forward = None
+        self._order = []
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="manual-drive", daemon=True)
+            self._thread.start()
+
+    def _take(self):
+        """Next (command, boost, degrees, presses) to send. Caller holds the lock."""
+        if self._stop:
+            presses, self._stop = self._stop, []
+            return "STOP", False, None, presses
+        kind = self._order.pop(0)
+        if kind == "turn":
+            degrees, presses = self._turn
+            self._turn = None
+            command = "RIGHT" if degrees > 0 else "LEFT"
+            return command, False, abs(degrees), presses
+        boost, presses = self._forward
+        self._forward = None
+        return "FORWARD", boost, None, presses
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not (self._stop or self._order):
+                    self._cond.wait()
+                command, boost, degrees, presses = self._take()
+                self.in_flight = command
+
+            if degrees == 0:
+                self.in_flight = None
+                for press in presses:
+                    press._finish("cancelled_out", coalesced=len(presses))
+                continue
+
+            try:
+                serial_log = self._execute(command, boost, degrees)
+                status = "executed"
+            except Exception:
+                serial_log = None
+                status = "failed"
+            with self._cond:
+                self.sent += 1
+                self.in_flight = None
+            for press in presses:
+                press._finish(status, command, degrees, len(presses), serial_log)
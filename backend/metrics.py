@@ -0,0 +1,189 @@
+"""
+In-process metrics, exported in the Prometheus text format at /metrics.
+
+Deliberately tiny (no prometheus_client on the Pi): counters, histograms
+and callback gauges, each behind its own lock. observe() is a bisect
+into the bucket bounds plus two additions, so instrumenting a request or
+a serial round trip costs about a microsecond; all the formatting work
+happens at scrape time in render().
+
+Like any Prometheus exporter the numbers are per process. With several
+worker processes (ACCESS_BACKEND = "sqlite") scrape each one; a queue
+wait that starts in one worker and ends in another isn't counted.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds; HTTP handlers, serial echoes / motions, people waiting in line
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SERIAL_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 15.0)
+WAIT_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 3600.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{v}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from fn(), e.g. the current queue length."""
+
+    def __init__(self, name, help, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_number(self.fn())}"
+        ]
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.bounds) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (buckets, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.bounds + (float("inf"),), buckets):
+                cumulative += n
+                le = (("le", _number(float(bound))),)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, fn):
+        return self._add(Gauge(name, help, fn))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class AccessMetrics:
+    """
+    AccessControl listener: turns queued / promoted / left events into
+    queue wait and owner session histograms.
+
+        access.listener = AccessMetrics(registry).on_event
+    """
+
+    def __init__(self, registry):
+        self.queue_wait = registry.histogram(
+            "robot_queue_wait_seconds",
+            "Time from joining the waiting line to leaving it.",
+            ("outcome",), WAIT_BUCKETS
+        )
+        self.owner_session = registry.histogram(
+            "robot_owner_session_seconds",
+            "How long each client held a robot.",
+            (), WAIT_BUCKETS
+        )
+        self._queued_at = {}
+        self._owner_since = {}
+        self._lock = threading.Lock()
+
+    def on_event(self, event, client_id):
+        now = time.monotonic()
+        with self._lock:
+            if event == "queued":
+                self._queued_at.setdefault(client_id, now)
+                return
+            if event in ("owner", "skipped", "left_queue"):
+                queued_at = self._queued_at.pop(client_id, None)
+                if queued_at is not None:
+                    outcome = "promoted" if event == "owner" else "left"
+                    self.queue_wait.observe(now - queued_at, outcome)
+                if event == "owner":
+                    self._owner_since[client_id] = now
+                return
+            if event == "owner_end":
+                since = self._owner_since.pop(client_id, None)
+                if since is not None:
+                    self.owner_session.observe(now - since)
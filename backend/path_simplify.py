@@ -0,0 +1,216 @@
+"""
+Path simplification ahead of build_motor_plan.
+
+A finger-drawn path from draw.js arrives as lots of short, nearly
+collinear segments, and every one of them costs the robot a turn and a
+forward. simplify_segments() rebuilds the polyline the segments describe,
+runs Ramer-Douglas-Peucker on it with a tolerance in feet, and turns the
+kept points back into segments, so the drawing stays within tolerance_ft
+of what was drawn with far fewer steps. A segment that survives on its
+own is passed through exactly as drawn; only runs that were merged get a
+new distance and heading, summed from the original segments. Going back
+through float coordinates would nudge values across build_motor_plan's
+thresholds (0.01 ft comes back as 0.010000000000000002).
+
+Segments are the same shape draw.js sends:
+    { "distance_feet": <num>, "heading_degrees": <canvas angle> }
+
+simplify_arrays() is the same thing for the binary upload, which hands
+us (distances, headings) arrays; it needs NumPy and keeps them arrays.
+"""
+
+import math
+
+from plan_compiler import np
+
+
+def segments_to_points(segments):
+    """Walk the segments from (0, 0) -> list of polyline vertices."""
+    x, y = 0.0, 0.0
+    points = [(x, y)]
+    for seg in segments:
+        dist = float(seg.get("distance_feet", 0.0))
+        heading = math.radians(float(seg.get("heading_degrees", 0.0)))
+        x += dist * math.cos(heading)
+        y += dist * math.sin(heading)
+        points.append((x, y))
+    return points
+
+
+def _point_segment_distance(p, a, b):
+    ax, ay = a
+    bx, by = b
+    px, py = p
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0.0:
+        return math.hypot(px - ax, py - ay)
+    t = ((px - ax) * dx + (py - ay) * dy) / length_sq
+    t = max(0.0, min(1.0, t))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def rdp(points, tolerance):
+    """
+    Ramer-Douglas-Peucker. Returns (indexes of kept points, max distance
+    of any dropped point from the simplified line).
+
+    Iterative so a long drawing can't hit the recursion limit.
+    """
+    n = len(points)
+    if n < 3:
+        return list(range(n)), 0.0
+
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    max_dev = 0.0
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        worst, worst_dist = None, -1.0
+        for i in range(first + 1, last):
+            d = _point_segment_distance(points[i], points[first], points[last])
+            if d > worst_dist:
+                worst, worst_dist = i, d
+        if worst is None:
+            continue
+        if worst_dist > tolerance:
+            keep[worst] = True
+            stack.append((first, worst))
+            stack.append((worst, last))
+        else:
+            # everything between first and last is dropped
+            max_dev = max(max_dev, worst_dist)
+    return [i for i in range(n) if keep[i]], max_dev
+
+
+def _merge_run(run):
+    """
+    One segment for a run of consecutive segments RDP dropped the inner
+    vertices of: the segment itself if it's alone, else the chord from
+    the run's start to its end (None if that has no length).
+    """
+    if len(run) == 1:
+        return run[0]
+    headings = [float(seg.get("heading_degrees", 0.0)) for seg in run]
+    distances = [float(seg.get("distance_feet", 0.0)) for seg in run]
+    if all(h == headings[0] for h in headings):
+        dist, heading = sum(distances), headings[0]
+    else:
+        dx = sum(d * math.cos(math.radians(h)) for d, h in zip(distances, headings))
+        dy = sum(d * math.sin(math.radians(h)) for d, h in zip(distances, headings))
+        dist, heading = math.hypot(dx, dy), math.degrees(math.atan2(dy, dx))
+    if dist == 0.0:
+        return None
+    return {"distance_feet": dist, "heading_degrees": heading}
+
+
+def simplify_segments(segments, tolerance_ft):
+    """
+    Returns (simplified_segments, report) with
+    report = {"segments_before", "segments_after", "max_deviation_ft"}.
+
+    tolerance_ft <= 0 leaves the segments as they are.
+    """
+    if tolerance_ft <= 0 or len(segments) < 2:
+        return segments, {
+            "segments_before": len(segments),
+            "segments_after": len(segments),
+            "max_deviation_ft": 0.0
+        }
+
+    points = segments_to_points(segments)
+    kept, max_dev = rdp(points, tolerance_ft)
+    if len(kept) == len(points):
+        simplified = segments
+    else:
+        simplified = []
+        for first, last in zip(kept, kept[1:]):
+            merged = _merge_run(segments[first:last])
+            if merged is not None:
+                simplified.append(merged)
+    return simplified, {
+        "segments_before": len(segments),
+        "segments_after": len(simplified),
+        "max_deviation_ft": max_dev
+    }
+
+
+def _rdp_numpy(points, tolerance):
+    """rdp() on an (n, 2) array, each split scanned in one vector op."""
+    n = len(points)
+    if n < 3:
+        return np.arange(n), 0.0
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    max_dev = 0.0
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a = points[first]
+        d = points[last] - a
+        rel = points[first + 1:last] - a
+        length_sq = float(d @ d)
+        if length_sq == 0.0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            t = np.clip((rel @ d) / length_sq, 0.0, 1.0)
+            off = rel - t[:, None] * d
+            dist = np.hypot(off[:, 0], off[:, 1])
+        i = int(np.argmax(dist))
+        worst_dist = float(dist[i])
+        if worst_dist > tolerance:
+            worst = first + 1 + i
+            keep[worst] = True
+            stack.append((first, worst))
+            stack.append((worst, last))
+        else:
+            max_dev = max(max_dev, worst_dist)
+    return np.flatnonzero(keep), max_dev
+
+
+def simplify_arrays(distances, headings, tolerance_ft):
+    """
+    simplify_segments() for (distances, headings) arrays. Returns
+    (distances, headings, report), still as float64 arrays.
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    headings = np.asarray(headings, dtype=np.float64)
+    n = len(distances)
+    if tolerance_ft <= 0 or n < 2:
+        return distances, headings, {
+            "segments_before": n,
+            "segments_after": n,
+            "max_deviation_ft": 0.0
+        }
+
+    rad = np.radians(headings)
+    points = np.zeros((n + 1, 2))
+    points[1:, 0] = np.cumsum(distances * np.cos(rad))
+    points[1:, 1] = np.cumsum(distances * np.sin(rad))
+
+    kept, max_dev = _rdp_numpy(points, tolerance_ft)
+    if len(kept) == len(points):
+        new_dist, new_head = distances, headings
+    else:
+        # same rule as _merge_run, one vector op per quantity: lone
+        # segments as drawn, merged runs as the sum of their segments
+        starts, ends = kept[:-1], kept[1:]
+        alone = ends - starts == 1
+        heading_changes = np.concatenate(([0], np.cumsum(headings[1:] != headings[:-1])))
+        straight = heading_changes[ends - 1] == heading_changes[starts]
+        run_dist = np.add.reduceat(distances, starts)
+        dx = np.add.reduceat(distances * np.cos(rad), starts)
+        dy = np.add.reduceat(distances * np.sin(rad), starts)
+        new_dist = np.where(alone | straight, run_dist, np.hypot(dx, dy))
+        new_head = np.where(alone | straight, headings[starts], np.degrees(np.arctan2(dy, dx)))
+        keep = alone | (new_dist > 0.0)
+        new_dist, new_head = new_dist[keep], new_head[keep]
+    return new_dist, new_head, {
+        "segments_before": n,
+        "segments_after": len(new_dist),
+        "max_deviation_ft": max_dev
+    }
@@ -0,0 +1,109 @@
+"""
+Content-addressed cache of compiled motor plans.
+
+People re-run the same drawing (and demo mode replays canned shapes), so
+/api/runpath keeps what simplify + compile + optimize produced, keyed by
+a hash of the quantised segments plus every setting that changes the
+result, so a re-run drawing skips all of that. Bounded LRU, with
+hit/miss counters for /api/admin/state.
+
+Cached values are shared between requests and jobs: treat them as
+read-only. Entries are plain dicts so more compiled artefacts (e.g. the
+binary firmware frames) can be stored next to the plan later.
+"""
+
+import hashlib
+import json
+import struct
+import threading
+from collections import OrderedDict
+
+from plan_compiler import available, np
+
+PLAN_CACHE_SIZE = 64  # compiled plans kept (LRU)
+
+# segments closer than this are the same drawing as far as the cache goes;
+# draw.js already rounds distances to 6 decimals
+DISTANCE_QUANTUM = 1e-6   # ft
+HEADING_QUANTUM = 1e-4    # deg
+
+
+def plan_key(distances, headings, config):
+    """
+    Hex digest for (distances, headings) + config. config is anything
+    JSON-able (sorted keys), holding whatever affects the compiled plan.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+    if available:
+        dist_q = np.rint(np.asarray(distances, dtype=np.float64) / DISTANCE_QUANTUM).astype("<i8")
+        head_q = np.rint(np.asarray(headings, dtype=np.float64) / HEADING_QUANTUM).astype("<i8")
+        digest.update(struct.pack("<Q", len(dist_q)))
+        digest.update(dist_q.tobytes())
+        digest.update(head_q.tobytes())
+    else:
+        digest.update(struct.pack("<Q", len(distances)))
+        for values, quantum in ((distances, DISTANCE_QUANTUM), (headings, HEADING_QUANTUM)):
+            digest.update(struct.pack(f"<{len(values)}q", *(round(v / quantum) for v in values)))
+    return digest.hexdigest()
+
+
+class PlanCache:
+    """Thread-safe LRU of key -> compiled entry dict."""
+
+    def __init__(self, max_entries=PLAN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        (entry, hit). compute() runs outside the lock, so two requests for
+        the same new drawing may both compile it; the last one wins.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry, True
+        entry = compute()
+        self.put(key, entry)
+        return entry, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else None
+            }
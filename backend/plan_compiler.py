@@ -0,0 +1,104 @@
+"""
+Batched motor-plan compiler for big segment lists (SVG / G-code style
+imports with ~10^5 segments).
+
+build_motor_plan() in server_copy walks segments one dict at a time and
+wraps angles with while loops. compile_motor_plan() does the same maths
+on whole arrays with NumPy and produces the identical plan:
+
+  - headings are wrapped with fmod, which like the repeated +-360 of the
+    loops is exact, so every value comes out bit for bit the same
+  - each turn is relative to the previous segment's target heading (the
+    loop moves current_heading even when the turn is too small to emit),
+    so all deltas are one vectorised difference
+  - the 0.5 deg / 0.01 ft thresholds become boolean masks
+
+NumPy is optional: `available` is False without it and callers should
+stick to build_motor_plan. The other NumPy paths (path_simplify,
+segment_frame, plan_cache) take np and available from here too.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+available = np is not None
+
+MIN_TURN_DEG = 0.5    # same thresholds as build_motor_plan
+MIN_FORWARD_FT = 0.01
+
+
+def segments_to_arrays(segments):
+    """
+    JSON segment dicts -> (distances, headings) float64 arrays.
+
+    Values go through float() like build_motor_plan does, so strings such
+    as draw.js's toFixed() distances parse identically.
+    """
+    n = len(segments)
+    distances = np.fromiter((float(seg.get("distance_feet", 0.0)) for seg in segments),
+                            dtype=np.float64, count=n)
+    headings = np.fromiter((float(seg.get("heading_degrees", 0.0)) for seg in segments),
+                           dtype=np.float64, count=n)
+    return distances, headings
+
+
+def _wrap(deg):
+    """
+    Vectorised version of
+
+        while x > 180: x -= 360
+        while x < -180: x += 360
+
+    including its edges (180 and -180 stay put).
+    """
+    r = np.fmod(deg, 360.0)
+    r = np.where((deg > 180.0) & (r > 180.0), r - 360.0, r)
+    r = np.where((deg < -180.0) & (r < -180.0), r + 360.0, r)
+    return r
+
+
+def compile_motor_plan(distances, headings, heading_offset):
+    """
+    (distances, headings) arrays in draw.js units -> motor_plan, exactly
+    what build_motor_plan gives for the same segments.
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    headings = np.asarray(headings, dtype=np.float64)
+    n = len(distances)
+    if n == 0:
+        return []
+
+    target = _wrap(headings + heading_offset)
+    current = np.empty(n)
+    current[0] = 0.0  # robot starts "facing north"
+    current[1:] = target[:-1]
+
+    delta = -_wrap(target - current)  # flip sign like build_motor_plan
+    turn_deg = np.abs(delta)
+
+    has_turn = turn_deg > MIN_TURN_DEG
+    turn_left = delta > 0
+    has_forward = distances > MIN_FORWARD_FT
+
+    # interleave back into one list: turn (if any) then forward (if any).
+    # Plain lists from here on; indexing numpy scalars one by one is slow.
+    turn_list = turn_deg.tolist()
+    dist_list = distances.tolist()
+    has_turn_list = has_turn.tolist()
+    has_forward_list = has_forward.tolist()
+    left_list = turn_left.tolist()
+    motor_plan = []
+    for i in np.flatnonzero(has_turn | has_forward).tolist():
+        if has_turn_list[i]:
+            motor_plan.append({
+                "action": "TURN_LEFT" if left_list[i] else "TURN_RIGHT",
+                "deg": turn_list[i]
+            })
+        if has_forward_list[i]:
+            motor_plan.append({
+                "action": "FORWARD",
+                "distance_ft": dist_list[i]
+            })
+    return motor_plan
@@ -0,0 +1,91 @@
+"""
+Binary plan frames for the firmware's plan mode (opcode 7).
+
+Instead of one opcode / echo / param / Done exchange per step, the whole
+motor plan goes over in one checksummed frame; ROBO.ino buffers it, runs
+the steps back to back and reports "Step <i> Done<op>" as each finishes.
+
+Frame layout (little endian), must match runPlan() in ROBO.ino:
+
+    'P' 'L' | count: uint8 | count x (op: uint8, param: float32) | crc16: uint16
+
+crc16 is CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) over everything
+before it. The sketch buffers at most MAX_PLAN_STEPS steps, so longer
+plans are split into several frames.
+"""
+
+import struct
+
+MAX_PLAN_STEPS = 48   # keep in sync with ROBO.ino
+FRAME_MAGIC = b"PL"
+
+FORWARD_OPCODE = 1    # PWM 120, default when a step doesn't pick a tier
+FORWARD_OPCODES = (1, 2, 3)  # PWM 120 / 180 / 240
+
+
+def step_to_opcode(step):
+    """
+    One motor_plan entry -> (opcode, param) as the sketch expects it,
+    or None for steps that are too small to send.
+    """
+    action = step["action"]
+    if action in ("TURN_LEFT", "TURN_RIGHT"):
+        deg_val = int(round(step.get("deg", 0)))
+        if deg_val < 1:
+            return None
+        return (5 if action == "TURN_LEFT" else 4), deg_val
+    if action == "FORWARD":
+        dist_ft = float(step.get("distance_ft", 0.0))
+        if dist_ft <= 0.0:
+            return None
+        opcode = step.get("opcode", FORWARD_OPCODE)
+        if opcode not in FORWARD_OPCODES:
+            opcode = FORWARD_OPCODE
+        return opcode, dist_ft
+    # fallback / emergency stop
+    return 9, 0.0
+
+
+def crc16(data, crc=0xFFFF):
+    for b in data:
+        crc ^= b << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+            crc &= 0xFFFF
+    return crc
+
+
+def encode_frame(ops):
+    """[(opcode, param), ...] (at most MAX_PLAN_STEPS) -> frame bytes."""
+    if len(ops) > MAX_PLAN_STEPS:
+        raise ValueError(f"{len(ops)} steps won't fit in one frame (max {MAX_PLAN_STEPS})")
+    body = bytearray(FRAME_MAGIC)
+    body.append(len(ops))
+    for opcode, param in ops:
+        body += struct.pack("<Bf", opcode, float(param))
+    body += struct.pack("<H", crc16(body))
+    return bytes(body)
+
+
+def encode_plan(motor_plan):
+    """
+    Whole motor_plan -> list of (frame_bytes, plan_indexes).
+
+    plan_indexes[i] is the motor_plan index of the i-th step in that
+    frame, so "Step i Done" records can be mapped back for progress.
+    Steps step_to_opcode() drops are simply not sent.
+    """
+    frames = []
+    ops, indexes = [], []
+    for index, step in enumerate(motor_plan):
+        op = step_to_opcode(step)
+        if op is None:
+            continue
+        ops.append(op)
+        indexes.append(index)
+        if len(ops) == MAX_PLAN_STEPS:
+            frames.append((encode_frame(ops), indexes))
+            ops, indexes = [], []
+    if ops:
+        frames.append((encode_frame(ops), indexes))
+    return frames
@@ -0,0 +1,281 @@
+"""
+Cost-model-driven motor plan optimizer.
+
+build_motor_plan() emits one turn + one forward per drawn segment, in
+order, always at the slowest forward opcode. optimize_motor_plan() takes
+that plan and, within a drawing-error tolerance:
+
+  - merges consecutive turns and consecutive (collinear) forwards
+  - steers every leg at where the unoptimized plan's leg ends, seen from
+    where the robot actually is, so the offset left by whole-degree
+    turns and folded turns is taken out on the next turn instead of
+    accumulating
+  - folds turns the firmware can't or needn't do (round to 0 deg, or
+    driving straight on stays within tolerance) into the next turn
+  - picks the cheaper turn direction, and per forward the fastest speed
+    tier the calibration table allows for its length and neighbouring
+    turns
+
+The tolerance bounds how far the robot's position after every forward
+can be from where the unoptimized plan would have put it, down to what
+whole-degree turns can do at all: aiming within 0.5 deg over a leg of
+length d misses by up to d * sin(0.5 deg), so the bound is
+max(tolerance, rounding_floor_ft) with rounding_floor_ft worked out from
+the longest leg (see _rounding_floor). Faster tiers trade distance
+accuracy for speed by their calibrated error_per_ft; that worst case is
+reported separately as speed_error_ft. Everything is in the same "feet"
+units draw.js sends.
+"""
+
+import math
+
+
+def default_speed_tiers(ms_per_foot):
+    """
+    Speed-tier calibration table for firmware forward opcodes 1/2/3
+    (PWM 120/180/240), keyed by opcode:
+
+      ft_per_s        observed throughput
+      error_per_ft    observed worst-case distance error per foot
+      min_run_ft      shortest forward worth it (spin-up / overshoot)
+      max_corner_deg  sharpest neighbouring turn it may sit next to
+
+    Until we have measurements for the faster tiers this assumes speed
+    and error scale with PWM; override with real numbers when you have
+    them (CostModel(forward_tiers=...)).
+    """
+    base = 1000.0 / ms_per_foot
+    return {
+        1: {"pwm": 120, "ft_per_s": base, "error_per_ft": 0.02,
+            "min_run_ft": 0.0, "max_corner_deg": 180},
+        2: {"pwm": 180, "ft_per_s": base * 180 / 120, "error_per_ft": 0.05,
+            "min_run_ft": 0.03, "max_corner_deg": 45},
+        3: {"pwm": 240, "ft_per_s": base * 240 / 120, "error_per_ft": 0.10,
+            "min_run_ft": 0.08, "max_corner_deg": 20},
+    }
+
+
+class CostModel:
+    """
+    Rough time cost of each plan step, in ms.
+
+    turn_ms_per_degree:  {"TURN_LEFT": ms, "TURN_RIGHT": ms}
+    forward_tiers:       speed-tier calibration table, see
+                         default_speed_tiers()
+    step_overhead_ms:    fixed cost of any step (handshake, settle, ramp)
+    max_error_per_ft:    least accurate tier we accept at all
+    """
+
+    def __init__(self, ms_per_degree, ms_per_foot, step_overhead_ms,
+                 turn_ms_per_degree=None, forward_tiers=None, max_error_per_ft=1.0):
+        self.step_overhead_ms = step_overhead_ms
+        self.max_error_per_ft = max_error_per_ft
+        self.turn_ms_per_degree = turn_ms_per_degree or {
+            "TURN_LEFT": ms_per_degree,
+            "TURN_RIGHT": ms_per_degree
+        }
+        self.forward_tiers = forward_tiers or default_speed_tiers(ms_per_foot)
+
+    @property
+    def base_tier(self):
+        return min(self.forward_tiers)
+
+    def turn_ms(self, action, deg):
+        return self.step_overhead_ms + abs(deg) * self.turn_ms_per_degree[action]
+
+    def forward_ms(self, opcode, dist_ft):
+        return self.step_overhead_ms + dist_ft * 1000.0 / self.forward_tiers[opcode]["ft_per_s"]
+
+    def extra_error(self, opcode, dist_ft):
+        """Worst-case distance error on top of what the base tier gives."""
+        base = self.forward_tiers[self.base_tier]["error_per_ft"]
+        return dist_ft * max(self.forward_tiers[opcode]["error_per_ft"] - base, 0.0)
+
+    def pick_tier(self, dist_ft, corner_deg):
+        """
+        Fastest tier for a forward of dist_ft whose sharper neighbouring
+        turn is corner_deg: long straight runs go fast, short moves and
+        moves into sharp corners stay slow.
+        """
+        best = self.base_tier
+        for opcode, tier in self.forward_tiers.items():
+            if dist_ft < tier.get("min_run_ft", 0.0):
+                continue
+            if corner_deg > tier.get("max_corner_deg", 180):
+                continue
+            if tier["error_per_ft"] > self.max_error_per_ft:
+                continue
+            if self.forward_ms(opcode, dist_ft) < self.forward_ms(best, dist_ft):
+                best = opcode
+        return best
+
+    def step_ms(self, step):
+        action = step["action"]
+        if action in ("TURN_LEFT", "TURN_RIGHT"):
+            return self.turn_ms(action, step.get("deg", 0))
+        if action == "FORWARD":
+            opcode = step.get("opcode", self.base_tier)
+            return self.forward_ms(opcode, float(step.get("distance_ft", 0.0)))
+        return self.step_overhead_ms
+
+    def plan_ms(self, motor_plan):
+        return sum(self.step_ms(step) for step in motor_plan)
+
+
+def _wrap(deg):
+    """Normalise to (-180, 180]."""
+    deg = math.fmod(deg, 360.0)
+    if deg > 180.0:
+        deg -= 360.0
+    elif deg <= -180.0:
+        deg += 360.0
+    return deg
+
+
+def _unit(heading_deg):
+    rad = math.radians(heading_deg)
+    return math.cos(rad), math.sin(rad)
+
+
+def _legs(motor_plan):
+    """
+    Collapse the plan into legs: (signed turn, forward distance), turning
+    left positive. Consecutive turns add up and consecutive forwards are
+    collinear, so both merges are exact. Any other action is kept as a
+    barrier: ("OTHER", step).
+    """
+    legs = []
+    turn, dist = 0.0, 0.0
+    for step in motor_plan:
+        action = step["action"]
+        if action in ("TURN_LEFT", "TURN_RIGHT"):
+            if dist > 0.0:
+                legs.append((turn, dist))
+                turn, dist = 0.0, 0.0
+            deg = float(step.get("deg", 0.0))
+            turn += deg if action == "TURN_LEFT" else -deg
+        elif action == "FORWARD":
+            dist += float(step.get("distance_ft", 0.0))
+        else:
+            if turn or dist:
+                legs.append((turn, dist))
+                turn, dist = 0.0, 0.0
+            legs.append(("OTHER", step))
+    if turn or dist:
+        legs.append((turn, dist))
+    return legs
+
+
+def _rounding_floor(legs):
+    """
+    Worst error whole-degree turns can force on these legs: each leg
+    aims within 0.5 deg at its end point from at most the previous error
+    away, so e <= (d + e) * sin(0.5 deg) for the longest leg d.
+    """
+    longest = max((leg[1] for leg in legs if leg[0] != "OTHER"), default=0.0)
+    s = math.sin(math.radians(0.5))
+    return longest * s / (1.0 - s)
+
+
+def optimize_motor_plan(motor_plan, cost, tolerance_ft=0.0):
+    """
+    Returns (optimized_plan, report).
+
+    report = {
+      "steps_before", "steps_after",
+      "predicted_ms_before", "predicted_ms_after",
+      "max_error_ft",           # deviation from the original at any vertex
+      "rounding_floor_ft",      # what whole-degree turns may force anyway;
+                                # max_error_ft <= max(tolerance_ft, this)
+      "speed_error_ft"          # worst-case extra distance error of the
+                                # faster tiers, summed over the plan
+    }
+
+    With tolerance_ft=0 the path itself only gets the changes whole
+    degrees need anyway (merges, folding turns that round to 0 deg,
+    aiming back at the original vertices, turn direction); speed tiers
+    are picked either way.
+    """
+    out = []
+
+    true_heading = 0.0      # where the original plan points
+    exec_heading = 0.0      # where the robot actually points
+    off_x = off_y = 0.0     # robot position minus original position
+    speed_err = 0.0         # extra distance error spent on faster tiers
+    max_error = 0.0
+    pending_dist = 0.0      # forward at exec_heading not emitted yet
+    prev_turn_deg = 0.0     # turn before pending_dist (none at the start)
+
+    def flush_forward(next_turn_deg):
+        nonlocal pending_dist, speed_err
+        if pending_dist <= 0.0:
+            return
+        corner = max(prev_turn_deg, next_turn_deg)
+        best = cost.pick_tier(pending_dist, corner)
+        speed_err += cost.extra_error(best, pending_dist)
+        out.append({"action": "FORWARD", "distance_ft": pending_dist, "opcode": best})
+        pending_dist = 0.0
+
+    def emit_turn(want):
+        """Turn by want deg (left positive), cheapest direction, whole degrees."""
+        nonlocal exec_heading, prev_turn_deg
+        left_deg = int(round(want % 360.0))
+        right_deg = (360 - left_deg) % 360
+        if left_deg == 0:
+            return
+        if cost.turn_ms("TURN_LEFT", left_deg) <= cost.turn_ms("TURN_RIGHT", right_deg):
+            out.append({"action": "TURN_LEFT", "deg": left_deg})
+            exec_heading = _wrap(exec_heading + left_deg)
+        else:
+            out.append({"action": "TURN_RIGHT", "deg": right_deg})
+            exec_heading = _wrap(exec_heading - right_deg)
+        prev_turn_deg = min(left_deg, right_deg)
+
+    legs = _legs(motor_plan)
+    for leg in legs:
+        if leg[0] == "OTHER":
+            flush_forward(0.0)
+            out.append(leg[1])
+            prev_turn_deg = 0.0
+            continue
+
+        turn, dist = leg
+        true_heading = _wrap(true_heading + turn)
+        if dist <= 0.0:
+            continue  # a turn with no forward after it; the next turn takes it
+
+        # where this leg ends, from where the robot is now
+        ux, uy = _unit(true_heading)
+        tx, ty = dist * ux - off_x, dist * uy - off_y
+        want = _wrap(math.degrees(math.atan2(ty, tx)) - exec_heading)
+
+        # option A: don't turn, drive on at exec_heading to the closest point
+        ex, ey = _unit(exec_heading)
+        along = tx * ex + ty * ey
+        fold_err = abs(tx * ey - ty * ex)
+        must_fold = int(round(abs(want))) == 0
+        if along >= 0.0 and (must_fold or fold_err <= tolerance_ft):
+            pending_dist += along
+        else:
+            # option B: turn (in whole degrees) and start a new forward
+            flush_forward(abs(want))
+            emit_turn(want)
+            ex, ey = _unit(exec_heading)
+            along = max(tx * ex + ty * ey, 0.0)
+            pending_dist = along
+
+        off_x, off_y = along * ex - tx, along * ey - ty
+        max_error = max(max_error, math.hypot(off_x, off_y))
+
+    flush_forward(0.0)
+
+    report = {
+        "steps_before": len(motor_plan),
+        "steps_after": len(out),
+        "predicted_ms_before": round(cost.plan_ms(motor_plan), 1),
+        "predicted_ms_after": round(cost.plan_ms(out), 1),
+        "max_error_ft": max_error,
+        "rounding_floor_ft": _rounding_floor(legs),
+        "speed_error_ft": speed_err
+    }
+    return out, report
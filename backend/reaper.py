@@ -0,0 +1,134 @@
+"""
+Liveness deadlines + the background thread that acts on them.
+
+DeadlineHeap is a min-heap of (deadline, client_id) with at most one
+live entry per client; an extended deadline is re-pushed when its old
+entry comes due early. Touch, reschedule and expiry are O(log n).
+
+ReaperThread sleeps until the earliest deadline and has the access
+control expire owners and queued clients who are due. With several
+workers on one SQLite store only the holder of lock_path (an flock next
+to the database) reaps, and another takes over within max_sleep if it
+dies.
+"""
+
+import fcntl
+import heapq
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class DeadlineHeap:
+    """client_id -> deadline, with cheap "who's overdue?". Not thread-safe."""
+
+    def __init__(self):
+        self._heap = []
+        self._deadline = {}    # client_id -> real current deadline
+        self._scheduled = {}   # client_id -> deadline of its live heap entry
+
+    def __len__(self):
+        return len(self._deadline)
+
+    def __contains__(self, client_id):
+        return client_id in self._deadline
+
+    def set(self, client_id, deadline):
+        self._deadline[client_id] = deadline
+        scheduled = self._scheduled.get(client_id)
+        if scheduled is None or deadline < scheduled:
+            # any older entry for this client is now a stale duplicate
+            self._scheduled[client_id] = deadline
+            heapq.heappush(self._heap, (deadline, client_id))
+
+    def discard(self, client_id):
+        self._deadline.pop(client_id, None)
+
+    def next_deadline(self):
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Remove + return every client whose real deadline is <= now."""
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, client_id = heapq.heappop(self._heap)
+            if self._scheduled.get(client_id) != deadline:
+                continue  # stale duplicate
+            del self._scheduled[client_id]
+
+            real = self._deadline.get(client_id)
+            if real is None:
+                continue
+            if real > now:
+                # seen since this entry was pushed, check again later
+                self._scheduled[client_id] = real
+                heapq.heappush(self._heap, (real, client_id))
+            else:
+                del self._deadline[client_id]
+                expired.append(client_id)
+        return expired
+
+
+class ReaperThread:
+    """
+    Calls access.expire_due() whenever the next deadline comes up.
+
+    max_sleep caps each nap, so deadlines that appear from elsewhere (a
+    promotion, another worker process) are still picked up quickly.
+
+    lock_path: only reap while holding an exclusive flock on this file
+    (None = always reap, for state that lives in this process).
+    """
+
+    def __init__(self, access, max_sleep=0.5, lock_path=None):
+        self.access = access
+        self.max_sleep = max_sleep
+        self.lock_path = lock_path
+        self._lock_fd = None
+        self._thread = None
+
+    @property
+    def reaping(self):
+        """Whether this process is the one expiring deadlines."""
+        return self.lock_path is None or self._lock_fd is not None
+
+    def _try_lock(self):
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return
+        # held until this process exits, which is what hands it on
+        self._lock_fd = fd
+        log.info("reaping for %s (pid %d)", self.lock_path, os.getpid())
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="liveness-reaper", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            if not self.reaping:
+                try:
+                    self._try_lock()
+                except OSError:
+                    log.exception("reaper lock %s", self.lock_path)
+                if not self.reaping:
+                    time.sleep(self.max_sleep)
+                    continue
+            sleep = self.max_sleep
+            try:
+                self.access.expire_due()
+                next_deadline = self.access.next_deadline()
+                if next_deadline is not None:
+                    sleep = min(max(next_deadline - time.time(), 0.01), self.max_sleep)
+            except Exception:
+                # e.g. sqlite busy for longer than busy_timeout; try again next lap
+                log.exception("reaper: expire_due failed")
+            time.sleep(sleep)
@@ -0,0 +1,121 @@
+"""
+Structured, bounded serial log for one run (a motor plan job or a manual
+command).
+
+RunLog has the append(str) interface the protocol code writes to, and:
+
+  - every line becomes a typed record (seq, monotonic t, kind, text),
+    kind one of tx / rx / imu / info / warn / error
+  - records below the configured verbosity are dropped on the way in;
+    the default ("info") drops the IMU lines
+  - at most `retention` records are kept; older ones fall off the front
+    but seq keeps counting, so pollers resuming with ?since= still line up
+  - wait() lets a streaming endpoint block until new records arrive
+"""
+
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+RUN_LOG_RETENTION = 2000  # newest records kept per run; seq keeps counting
+
+LEVELS = {"debug": 10, "info": 20, "warn": 30, "error": 40}
+KIND_LEVEL = {"imu": 10, "tx": 20, "rx": 20, "info": 20, "warn": 30, "error": 40}
+
+RX_PREFIX = "arduino -> "
+IMU_PREFIXES = ("Acceleration:", "Turn rate:")
+
+
+class RunLog:
+    def __init__(self, retention=RUN_LOG_RETENTION, verbosity="info"):
+        self.retention = retention
+        self.min_level = LEVELS[verbosity]
+        self.started = time.monotonic()
+        self._records = deque(maxlen=retention)
+        self._next_seq = 0
+        self._cond = threading.Condition()
+        self._imu_pending = False   # next rx line is the bare ay number
+        self.closed = False
+        self.dropped = 0            # filtered out by verbosity
+
+    # ---------- writing ----------
+
+    def _classify(self, line):
+        """Legacy log string -> (kind, text)."""
+        if line.startswith(RX_PREFIX):
+            text = line[len(RX_PREFIX):]
+            if text.startswith(IMU_PREFIXES):
+                self._imu_pending = text.startswith(IMU_PREFIXES[0])
+                return "imu", text
+            if self._imu_pending:
+                self._imu_pending = False
+                return "imu", text
+            return "rx", text
+        if line.startswith("sent "):
+            return "tx", line[len("sent "):]
+        for kind in ("warn", "error", "info"):
+            tag = f"[{kind}] "
+            if line.startswith(tag):
+                return kind, line[len(tag):]
+        return "info", line
+
+    def append(self, line):
+        with self._cond:
+            kind, text = self._classify(line)
+            if KIND_LEVEL[kind] < self.min_level:
+                self.dropped += 1
+                return
+            self._records.append((self._next_seq, time.monotonic(), kind, text))
+            self._next_seq += 1
+            self._cond.notify_all()
+
+    def close(self):
+        """No more records; wakes any streamers so they can finish."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    # ---------- reading ----------
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def next_seq(self):
+        return self._next_seq
+
+    def since(self, seq=0):
+        """
+        Records with seq >= seq that are still retained, as
+        (first_seq, [(seq, t, kind, text), ...]).
+        """
+        with self._cond:
+            first_kept = self._next_seq - len(self._records)
+            start = max(seq - first_kept, 0)
+            records = list(islice(self._records, start, None))
+        first = records[0][0] if records else self._next_seq
+        return first, records
+
+    def record_dict(self, record):
+        seq, t, kind, text = record
+        return {"seq": seq, "t": round(t - self.started, 4), "kind": kind, "text": text}
+
+    @staticmethod
+    def format(record):
+        """Back to the old one-line string form."""
+        _, _, kind, text = record
+        if kind in ("rx", "imu"):
+            return RX_PREFIX + text
+        if kind == "tx":
+            return "sent " + text
+        return f"[{kind}] {text}"
+
+    def texts(self, seq=0):
+        first, records = self.since(seq)
+        return first, [self.format(r) for r in records]
+
+    def wait(self, seq, timeout):
+        """Block until there's a record with seq >= seq or the log closes."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._next_seq > seq or self.closed, timeout)
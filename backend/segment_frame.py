@@ -0,0 +1,66 @@
+"""
+Compact binary segment upload for /api/runpath.
+
+A big drawing as JSON is a list of {distance_feet, heading_degrees}
+dicts, and parsing that costs more than planning it. With
+Content-Type: application/octet-stream the browser sends the segments
+packed instead (little endian), must match encodeSegments() in draw.js:
+
+    'S' 'G' | version: uint8 | reserved: uint8 | count: uint32
+    count x (distance_feet: float32, heading_degrees: float32)
+
+The 8-byte header keeps the float pairs aligned, so with NumPy the body
+is read in place with numpy.frombuffer over a memoryview (no per-segment
+objects at all) and only widened to float64 for planning.
+"""
+
+import math
+import struct
+
+from plan_compiler import available, np
+
+SEGMENT_MAGIC = b"SG"
+SEGMENT_VERSION = 1
+HEADER = struct.Struct("<2sBBI")
+PAIR = struct.Struct("<ff")
+
+
+def decode_segments(data):
+    """
+    Request body -> (distances, headings): float64 arrays with NumPy,
+    plain lists of floats without. Raises ValueError on a bad frame.
+    """
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise ValueError("segment frame too short")
+    magic, version, _, count = HEADER.unpack_from(view)
+    if magic != SEGMENT_MAGIC:
+        raise ValueError("not a segment frame")
+    if version != SEGMENT_VERSION:
+        raise ValueError(f"unsupported segment frame version {version}")
+    if len(view) != HEADER.size + count * PAIR.size:
+        raise ValueError(f"segment frame says {count} segments but has {len(view) - HEADER.size} bytes")
+
+    if available:
+        pairs = np.frombuffer(view, dtype="<f4", count=count * 2, offset=HEADER.size)
+        pairs = pairs.reshape(count, 2)
+        if not np.isfinite(pairs).all():
+            raise ValueError("segment frame has non-finite values")
+        return pairs[:, 0].astype(np.float64), pairs[:, 1].astype(np.float64)
+
+    distances, headings = [], []
+    for dist, heading in PAIR.iter_unpack(view[HEADER.size:]):
+        if not (math.isfinite(dist) and math.isfinite(heading)):
+            raise ValueError("segment frame has non-finite values")
+        distances.append(dist)
+        headings.append(heading)
+    return distances, headings
+
+
+def encode_segments(segments):
+    """JSON-style segment dicts -> frame bytes (what draw.js builds)."""
+    body = bytearray(HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, 0, len(segments)))
+    for seg in segments:
+        body += PAIR.pack(float(seg.get("distance_feet", 0.0)),
+                          float(seg.get("heading_degrees", 0.0)))
+    return bytes(body)
@@ -0,0 +1,112 @@
+"""
+Background line reader for the Arduino serial port.
+
+pyserial's readline() reads one byte per call and only gives up after
+the port timeout, and every protocol wait in the server wrapped it in a
+time.time() polling loop. LineReader instead owns the read side of the
+port: a thread pulls whatever is waiting (in_waiting) into a bytearray,
+splits complete lines off incrementally and hands them out through a
+Condition, so a waiter wakes the moment its line lands.
+
+Lines are kept in order until someone takes them; nothing is skipped or
+matched behind the caller's back, so the protocol code still sees (and
+logs) every line the sketch prints. on_line(line), if given, also sees
+every line as it arrives, on the reader thread (telemetry uses this).
+"""
+
+import threading
+import time
+from collections import deque
+
+MAX_PENDING_LINES = 1000   # the IMU spam between commands adds up
+
+
+class LineReader:
+    def __init__(self, ser, name="serial-reader", on_line=None):
+        self._ser = ser
+        self._on_line = on_line
+        self._buf = bytearray()
+        self._lines = deque(maxlen=MAX_PENDING_LINES)
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self.error = None          # exception that killed the reader, if any
+        self.last_line_at = None   # time.monotonic() of the newest line
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop reading (the port itself is closed by the owner)."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    @property
+    def alive(self):
+        return self.error is None and not self._stop.is_set()
+
+    # ---------- reader thread ----------
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # block for the first byte (up to the port timeout), then
+                # take everything else that's already there in one go
+                chunk = self._ser.read(self._ser.in_waiting or 1)
+            except Exception as e:
+                if not self._stop.is_set():
+                    with self._cond:
+                        self.error = e
+                        self._cond.notify_all()
+                return
+            if chunk:
+                self._feed(chunk)
+
+    def _feed(self, chunk):
+        scan_from = len(self._buf)
+        self._buf += chunk
+        lines = []
+        start = 0
+        while True:
+            end = self._buf.find(b"\n", max(scan_from, start))
+            if end < 0:
+                break
+            line = self._buf[start:end].decode("utf-8", errors="ignore").strip()
+            if line:
+                lines.append(line)
+            start = end + 1
+        if start:
+            del self._buf[:start]
+        if lines and self._on_line is not None:
+            for line in lines:
+                try:
+                    self._on_line(line)
+                except Exception:
+                    pass  # a broken hook mustn't kill the reader
+        if lines:
+            with self._cond:
+                self._lines.extend(lines)
+                self.last_line_at = time.monotonic()
+                self._cond.notify_all()
+
+    # ---------- consumers ----------
+
+    def get(self, timeout):
+        """
+        Next line, waiting up to timeout seconds for one. None on timeout
+        or once the reader has stopped/failed with nothing left queued.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._lines or not self.alive, timeout)
+            if self._lines:
+                return self._lines.popleft()
+            return None
+
+    def drain(self):
+        """Take every line received so far without waiting."""
+        with self._cond:
+            lines = list(self._lines)
+            self._lines.clear()
+            return lines
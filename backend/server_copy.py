@@ -1,15 +1,49 @@
+import math
+import re
+import threading
 import time
-import serial
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory
 import uuid 
 
+from access_control import make_access_control
+from arduino_link import ESTOP_MARKER, ArduinoLink
+from fleet import Fleet, Robot
+from jobs import JobRunner
+from manual_drive import DrivePipeline
+from metrics import CONTENT_TYPE, SERIAL_BUCKETS, AccessMetrics, Registry
+from path_simplify import simplify_arrays, simplify_segments
+import plan_compiler
+from plan_cache import PLAN_CACHE_SIZE, PlanCache, plan_key
+from plan_frame import encode_plan, step_to_opcode
+from plan_optimizer import CostModel, default_speed_tiers, optimize_motor_plan
+from reaper import ReaperThread
+from run_log import RUN_LOG_RETENTION, RunLog
+from segment_frame import decode_segments
+from state_feed import sse_event
+from state_journal import StateJournal
+from static_assets import AssetServer
+from telemetry import CHANNELS, TELEMETRY_CAPACITY, Telemetry
+
 # === CONFIG ===
 # UI_DIR = "/home/dylanfc/robot-ui"
 UI_DIR = "/home/dylanfc/robot-ui-original"
 
+# UI_DIR after `python static_assets.py <UI_DIR> <UI_BUILD_DIR>`:
+# fingerprinted + precompressed files and photo variants, served from
+# memory with strong ETags. Until it's built, UI_DIR is served as-is.
+UI_BUILD_DIR = "/home/dylanfc/robot-ui-build"
+
 # Calibration placeholders (tune these later)
 MS_PER_DEGREE = 10.0     # ms to rotate 1 degree
 MS_PER_FOOT   = 1000.0   # ms to drive 1 foot
+STEP_OVERHEAD_MS = 250.0 # handshake + settle per step, whatever the step
+
+# Forward speed tiers, firmware opcodes 1/2/3 (PWM 120/180/240): measured
+# ft_per_s and error_per_ft, plus the shortest run and sharpest neighbouring
+# turn each tier may be used for. Placeholder numbers scaled off MS_PER_FOOT
+# until they're measured; see plan_optimizer.default_speed_tiers.
+SPEED_TIERS = default_speed_tiers(MS_PER_FOOT)
+SPEED_MAX_ERROR_PER_FT = 0.10  # never pick a tier less accurate than this
 
 HEADING_OFFSET = 90.0 
 
@@ -17,14 +51,120 @@ HEADING_OFFSET = 90.0
 ARDUINO_PORT = "/dev/ttyACM0"
 BAUD = 115200
 
+# every robot this server drives, name -> serial port, in the order the
+# scheduler hands them out (first free one goes to the head of the line)
+ROBOT_PORTS = {
+    "robot": ARDUINO_PORT,
+    # "robot-2": "/dev/ttyACM1",
+}
+
+# ship whole plans to the firmware in one binary frame (opcode 7) instead
+# of one handshake per step; falls back to steps if the sketch can't
+PLAN_UPLOAD = True
+
+# run build_motor_plan's output through plan_optimizer before driving it.
+# PLAN_TOLERANCE_FT is how far (same units as the segments) the drawing may
+# drift from the unoptimized plan; 0 keeps only the lossless rewrites.
+# A runpath request can pass its own "tolerance_ft".
+OPTIMIZE_PLANS = True
+PLAN_TOLERANCE_FT = 0.0005
+
+# Ramer-Douglas-Peucker on the drawn path before any of that: drop points
+# that are within this many feet of the simplified line (0 = off).
+# draw.js uses 35000 px/ft, so 0.0002 ft is ~7 canvas px of finger jitter.
+# A runpath request can pass its own "simplify_tolerance_ft".
+SIMPLIFY_TOLERANCE_FT = 0.0002
+
+# segment lists at least this long compile with plan_compiler (NumPy)
+# instead of build_motor_plan, when NumPy is installed; same output
+VECTOR_PLAN_MIN_SEGMENTS = 256
+
+# per-run serial log (RUN_LOG_RETENTION records, see run_log): "debug"
+# also keeps the IMU lines (they're in /api/telemetry either way), "warn"
+# only problems
+RUN_LOG_VERBOSITY = "info"
+
 # Access control
-is_busy = False
-current_owner = None
-queue = []  # user_ids waiting
+OWNER_TIMEOUT = 5   # seconds without heartbeat before we consider owner gone
+QUEUE_TIMEOUT = 15  # seconds a waiting client can go quiet before losing their spot
+STREAM_PING = 2     # seconds between /api/stream keepalives (must stay under OWNER_TIMEOUT)
+
+# "memory" for a single process (Flask threaded server),
+# "sqlite" to share owner/queue across several WSGI worker processes
+# (serve wsgi.py, see init_app)
+ACCESS_BACKEND = "memory"
+ACCESS_DB = "/tmp/picasso_access.db"
+
+# "memory" only: journal owners + waiting line here so a restart picks up
+# the same line instead of everyone re-claiming at once (None = don't).
+# Writes are fsynced in batches every JOURNAL_FSYNC_EVERY seconds and
+# compacted into a snapshot every JOURNAL_SNAPSHOT_EVERY records.
+ACCESS_JOURNAL = "/tmp/picasso_journal"
+JOURNAL_FSYNC_EVERY = 0.05
+JOURNAL_SNAPSHOT_EVERY = 5000
+
+# owner + run slot per robot, the waiting line and last_seen, all behind
+# atomic transitions
+access = make_access_control(ACCESS_BACKEND, OWNER_TIMEOUT, QUEUE_TIMEOUT, ACCESS_DB,
+                             robots=list(ROBOT_PORTS))
+
+# background thread that expires owners + queued clients off their deadlines;
+# with the shared SQLite store every worker runs one but only the holder of
+# the lock file next to the database reaps
+reaper = ReaperThread(access, lock_path=ACCESS_DB + ".reaper" if ACCESS_BACKEND == "sqlite" else None)
+
+# everything /metrics exports: request latency per route, serial round
+# trips per robot and opcode, queue waits and owner sessions (via
+# access.listener)
+metrics = Registry()
+http_latency = metrics.histogram(
+    "robot_http_request_seconds",
+    "Flask handler time per route (time to first byte for streams).",
+    ("method", "route", "status")
+)
+serial_latency = metrics.histogram(
+    "robot_serial_seconds",
+    "Opcode sent -> echo (phase echo), param sent -> Done<n> (phase done), "
+    "plan step start -> Step <i> Done<op> (phase plan_step).",
+    ("robot", "opcode", "phase"), SERIAL_BUCKETS
+)
+serial_timeouts = metrics.counter(
+    "robot_serial_timeouts_total",
+    "Echo / Done lines that never came.",
+    ("robot", "opcode", "phase")
+)
+estop_ack_latency = metrics.histogram(
+    "robot_estop_ack_seconds",
+    "Emergency stop requested -> sketch answered EStop.",
+    ("robot",), SERIAL_BUCKETS
+)
+estop_count = metrics.counter(
+    "robot_estops_total",
+    "Emergency stops, by whether the sketch acknowledged.",
+    ("robot", "acked")
+)
+access.listener = AccessMetrics(metrics).on_event
+metrics.gauge("robot_queue_length", "Clients in the waiting line.",
+              lambda: len(access.queue_list()))
+metrics.gauge("robot_arduino_connected", "Robots whose serial link is open.",
+              lambda: sum(robot.link.connected for robot in fleet))
+metrics.gauge("robot_plan_running", "Robots running a motor plan job.",
+              lambda: sum(robot.jobs.active is not None for robot in fleet))
+
+# every robot by name, each with its own serial link (opened by init_app),
+# plan runner, drive pipeline and IMU samples; filled from ROBOT_PORTS by
+# add_robot() further down
+fleet = Fleet()
 
-OWNER_TIMEOUT = 5  # seconds without heartbeat before we consider owner gone
-last_seen = {}  
+# simplified + compiled + optimized plans of recent drawings
+plan_cache = PlanCache(PLAN_CACHE_SIZE)
 
+# time estimates the plan optimizer trades against drawing error
+cost_model = CostModel(MS_PER_DEGREE, MS_PER_FOOT, STEP_OVERHEAD_MS,
+                       forward_tiers=SPEED_TIERS, max_error_per_ft=SPEED_MAX_ERROR_PER_FT)
+
+# the built UI bundle, or None (see UI_BUILD_DIR)
+assets = AssetServer.load(UI_BUILD_DIR)
 
 app = Flask(
     __name__,
@@ -32,37 +172,38 @@ app = Flask(
     static_url_path=""
 )
 
-def enqueue_if_needed(client_id):
-    global queue
-    if client_id not in queue:
-        queue.append(client_id)
 
+@app.before_request
+def _start_timer():
+    g.started_at = time.perf_counter()
 
-def mark_alive(client_id):
-    """Record that this client_id is still active right now."""
-    last_seen[client_id] = time.time()
 
-def cleanup_owner_if_stale():
-    """
-    If the current owner hasn't heartbeated in OWNER_TIMEOUT seconds,
-    drop them and promote whoever's next in queue.
-    """
-    global current_owner, queue
+@app.before_request
+def _serve_asset():
+    """UI files come out of the built bundle when there is one."""
+    if assets is not None and request.method in ("GET", "HEAD"):
+        return assets.serve(request.path, request.headers)
 
-    if current_owner is None:
-        return
 
-    last = last_seen.get(current_owner, 0)
-    if (time.time() - last) > OWNER_TIMEOUT:
-        # current owner timed out -> promote next in queue or clear
-        if queue:
-            next_id = queue.pop(0)
-            current_owner = next_id
-            # make sure new owner has a timestamp so they don't get insta-dropped
-            if next_id not in last_seen:
-                last_seen[next_id] = time.time()
-        else:
-            current_owner = None
+@app.after_request
+def _observe_request(response):
+    started_at = g.get("started_at")
+    if started_at is not None:
+        # the route template, not the path, so /api/jobs/<job_id> is one series
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        http_latency.observe(time.perf_counter() - started_at,
+                             request.method, route, str(response.status_code))
+    return response
+
+
+def observe_serial(robot, opcode, phase, seen):
+    """Round trip since the last write to this robot's Arduino, or a timeout if not seen."""
+    if seen:
+        serial_latency.observe(time.perf_counter() - robot.link.last_sent_at,
+                               robot.name, str(opcode), phase)
+    else:
+        serial_timeouts.inc(robot.name, str(opcode), phase)
+
 
 @app.route("/api/claim", methods=["POST"])
 def claim():
@@ -70,50 +211,23 @@ def claim():
     Body: { "client_id": "some-id" }
 
     Behavior:
-    - If no one owns the robot (or owner is stale), this client becomes current_owner.
-    - If someone already owns it:
-        - If it's this same client_id, return granted=true.
-        - Otherwise, enqueue this client and return granted=false and their position.
+    - If this client already owns a robot, return granted=true.
+    - If some robot has no owner (or a stale one), this client becomes
+      its owner; the first free robot in ROBOT_PORTS order.
+    - Otherwise, enqueue this client and return granted=false and their position.
+    "robot" says which robot was granted (null while waiting).
     """
-    global current_owner, queue
-
     data = request.get_json(silent=True) or {}
     client_id = data.get("client_id", None)
     if not client_id:
         return jsonify({"ok": False, "error": "no client_id"}), 400
 
-    # this caller is alive
-    mark_alive(client_id)
-
-    # evict stale owner if needed
-    cleanup_owner_if_stale()
-
-    # Case 1: nobody owns it now
-    if current_owner is None:
-        current_owner = client_id
-        return jsonify({
-            "ok": True,
-            "granted": True,
-            "position": 0
-        }), 200
-
-    # Case 2: this client already is the owner
-    if current_owner == client_id:
-        return jsonify({
-            "ok": True,
-            "granted": True,
-            "position": 0
-        }), 200
-
-    # Case 3: someone else owns it -> enqueue this client
-    if client_id not in queue:
-        queue.append(client_id)
-    position = queue.index(client_id) + 1  # 1-based
-
+    result = access.claim(client_id)
     return jsonify({
         "ok": True,
-        "granted": False,
-        "position": position
+        "granted": result["granted"],
+        "position": result["position"],
+        "robot": result["robot"]
     }), 200
 
 
@@ -122,36 +236,20 @@ def release():
     """
     Body: { "client_id": "some-id" }
 
-    Only the current owner can release.
+    Only an owner can release. A queued client calling this
+    just leaves the line.
     On release:
-      - current_owner becomes next in queue, or None if queue empty
+      - their robot goes to the next live client in queue, or None if queue empty
       - that next-in-line is popped from queue
     """
-    global current_owner, queue
-
     data = request.get_json(silent=True) or {}
     client_id = data.get("client_id", None)
     if not client_id:
         return jsonify({"ok": False, "error": "no client_id"}), 400
 
-    # only owner can release
-    if current_owner != client_id:
-        # not owner? nothing to do.
-        return jsonify({"ok": True, "released": False, "owner": current_owner}), 200
-
-    # owner is leaving, promote next queue entry (if any)
-    if queue:
-        next_id = queue.pop(0)
-        current_owner = next_id
-    else:
-        current_owner = None
-
-    return jsonify({
-        "ok": True,
-        "released": True,
-        "owner": current_owner,
-        "queue": queue
-    }), 200
+    result = access.release(client_id)
+    result["ok"] = True
+    return jsonify(result), 200
 
 @app.route("/api/status", methods=["POST"])
 def status():
@@ -162,46 +260,21 @@ def status():
       {
         "ok": true,
         "is_owner": bool,
-        "position": int or null
+        "position": int or null,
+        "robot": name of the robot you own, or null
       }
 
-    Also performs stale-owner cleanup so waiting clients
+    Also performs stale-client cleanup so waiting clients
     can auto-promote once the old owner disappears.
     """
-    global current_owner, queue
-
     data = request.get_json(silent=True) or {}
     client_id = data.get("client_id", None)
     if not client_id:
         return jsonify({"ok": False, "error": "no client_id"}), 400
 
-    # this caller is alive
-    mark_alive(client_id)
-
-    # maybe evict stale owner
-    cleanup_owner_if_stale()
-
-    if current_owner == client_id:
-        return jsonify({
-            "ok": True,
-            "is_owner": True,
-            "position": 0
-        }), 200
-
-    if client_id in queue:
-        position = queue.index(client_id) + 1
-        return jsonify({
-            "ok": True,
-            "is_owner": False,
-            "position": position
-        }), 200
-
-    return jsonify({
-        "ok": True,
-        "is_owner": False,
-        "position": None
-    }), 200
-
+    view = access.status(client_id)
+    view["ok"] = True
+    return jsonify(view), 200
 
 
 @app.route("/api/heartbeat", methods=["POST"])
@@ -210,114 +283,74 @@ def heartbeat():
     Body: { "client_id": "some-id" }
 
     We update that client's last_seen timestamp,
-    clean up any stale owner,
-    and report who the server currently thinks the owner is.
+    clean up any stale clients,
+    and report who the server currently thinks owns each robot
+    ("owners"; "current_owner" is the first robot's, as it was with one).
     """
-    global current_owner
-
     data = request.get_json(silent=True) or {}
     client_id = data.get("client_id", None)
     if not client_id:
         return jsonify({"ok": False, "error": "no client_id"}), 400
 
-    # mark this client as alive
-    mark_alive(client_id)
-
-    # see if we've got to evict a stale owner
-    cleanup_owner_if_stale()
-
+    owners = access.heartbeat(client_id)
     return jsonify({
         "ok": True,
-        "current_owner": current_owner
+        "current_owner": owners.get(fleet.first.name),
+        "owners": owners
     }), 200
 
-TURN_STEP_DEG = 10  # how much to rotate per nudge from LEFT/RIGHT
-
-def send_manual_command_to_arduino(cmd):
+@app.route("/api/stream", methods=["GET"])
+def stream():
     """
-    Send one immediate command to the Arduino, respecting the new protocol.
-
-    cmd can be:
-      "FORWARD"  -> send '3' (fast forward)
-      "STOP"     -> send '9'
-      "LEFT"     -> send '5' then TURN_STEP_DEG
-      "RIGHT"    -> send '4' then TURN_STEP_DEG
+    Server-Sent Events feed for one client: GET /api/stream?client_id=...
 
-    Behavior matches the final Arduino sketch:
-    - 3 sets both motors forward and leaves them running.
-    - 9 stops both motors.
-    - 4,<deg> turns right by <deg> using gyro, then stops and prints Done4.
-    - 5,<deg> turns left  by <deg> using gyro, then stops and prints Done5.
+    Replaces polling /api/status and POSTing /api/heartbeat. Pushes
+      event: status    { ok, is_owner, position, robot }   whenever that changes
+      event: promoted  { ok, is_owner, position, robot }   when you get a robot
+    and a ": ping" comment every STREAM_PING seconds otherwise.
 
-    We open the serial port, send the burst, and read lines until we either
-    see something that starts with "Done" or we time out.
+    While the connection is open the client counts as alive, so no
+    separate heartbeats are needed. Once the browser goes away the next
+    ping fails, the loop ends, and the normal OWNER_TIMEOUT takes over.
     """
+    client_id = request.args.get("client_id")
+    if not client_id:
+        return jsonify({"ok": False, "error": "no client_id"}), 400
 
-    serial_log = []
-
-    # Map high-level cmd to one or two serial writes
-    if cmd == "FORWARD":
-        sequence = [1]  # just send 3\n
-    elif cmd == "STOP":
-        sequence = [9]  # just send 9\n
-    elif cmd == "LEFT":
-        sequence = [5, TURN_STEP_DEG]  # send 5\n then "10"\n
-    elif cmd == "RIGHT":
-        sequence = [4, TURN_STEP_DEG]  # send 4\n then "10"\n
-    else:
-        # Safety default: STOP
-        sequence = [9]
-
-    # Try to open the Arduino
-    try:
-        ser = serial.Serial(ARDUINO_PORT, BAUD, timeout=0.2)
-        time.sleep(0.2)  # let Arduino settle
-        hw_available = True
-        serial_log.append(f"[info] opened {ARDUINO_PORT} @ {BAUD}")
-    except Exception as e:
-        hw_available = False
-        ser = None
-        serial_log.append(f"[warn] could not open {ARDUINO_PORT}: {e}")
-        serial_log.append("[warn] SIM MODE (no Arduino)")
-
-    # Helper: send one line
-    def send_line(val):
-        if hw_available:
-            ser.write((str(val) + "\n").encode("utf-8"))
-            ser.flush()
-        serial_log.append(f"sent {val}")
-
-    # Helper: read lines until "Done" or timeout
-    def read_until_done(timeout_sec=2.0):
-        if not hw_available:
-            serial_log.append("arduino -> SIM_DONE")
-            return
-        end_t = time.time() + timeout_sec
-        while time.time() < end_t:
-            raw = ser.readline().decode("utf-8", errors="ignore").strip()
-            if raw:
-                serial_log.append(f"arduino -> {raw}")
-                # Arduino ends turn with "Done4"/"Done5"
-                # forward/stop say "Done3"/"Done9"
-                if raw.startswith("Done"):
-                    return
-        serial_log.append("arduino -> (no final DONE)")
-
-    # Send the whole sequence for this command
-    for item in sequence:
-        send_line(item)
-
-    # Block/read for a short while so we can capture "Done#"
-    read_until_done(timeout_sec=2.0)
-
-    # Close serial if we actually opened it
-    if hw_available and ser is not None:
-        ser.close()
-        serial_log.append("[info] closed serial")
+    def generate():
+        last_view = None
+        last_touch = 0.0
+        # tell EventSource to reconnect quickly if we drop
+        yield "retry: 2000\n\n"
+        while True:
+            seen = access.version
+            now = time.time()
+            if now - last_touch >= STREAM_PING:
+                view = access.status(client_id)   # marks us alive too
+                last_touch = now
+            else:
+                view = access.view(client_id)
+            view["ok"] = True
+
+            if view != last_view:
+                if last_view is not None and view["is_owner"] and not last_view["is_owner"]:
+                    yield sse_event("promoted", view)
+                yield sse_event("status", view)
+                last_view = view
+            else:
+                yield ": ping\n\n"
 
-    return serial_log
+            access.wait_for_change(seen, STREAM_PING)
 
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
 
+TURN_STEP_DEG = 10      # how much to rotate per nudge from LEFT/RIGHT
+FORWARD_STEP_FT = 0.02  # how far to roll per FORWARD nudge (same units draw.js sends)
+BOOST_OPCODE = 3        # forward tier for manual drive with "boost" (PWM 240)
+MANUAL_DRIVE_WAIT = 5.0 # max seconds /api/manualdrive waits for its (merged) command
 
 
 def build_motor_plan(segments):
@@ -389,10 +422,62 @@ def build_motor_plan(segments):
 
     return motor_plan
 
-def run_motor_plan_on_arduino(motor_plan):
+def compile_segments(segments):
+    """
+    build_motor_plan, but big lists go through the vectorised compiler
+    (identical result) when NumPy is around.
+    """
+    if plan_compiler.available and len(segments) >= VECTOR_PLAN_MIN_SEGMENTS:
+        distances, headings = plan_compiler.segments_to_arrays(segments)
+        return plan_compiler.compile_motor_plan(distances, headings, HEADING_OFFSET)
+    return build_motor_plan(segments)
+
+def plan_config(tolerance, simplify_tolerance):
+    """Everything besides the segments that changes what runpath compiles."""
+    return {
+        "heading_offset": HEADING_OFFSET,
+        "min_turn_deg": plan_compiler.MIN_TURN_DEG,
+        "min_forward_ft": plan_compiler.MIN_FORWARD_FT,
+        "simplify_tolerance_ft": simplify_tolerance,
+        "optimize": OPTIMIZE_PLANS,
+        "tolerance_ft": tolerance,
+        "turn_ms_per_degree": cost_model.turn_ms_per_degree,
+        "step_overhead_ms": cost_model.step_overhead_ms,
+        "speed_tiers": cost_model.forward_tiers,
+        "max_error_per_ft": cost_model.max_error_per_ft
+    }
+
+def compile_runpath(segments, distances, headings, tolerance, simplify_tolerance):
+    """
+    simplify -> compile -> optimize for one drawing; the plan_cache entry.
+
+    segments is the JSON list, or None for a binary upload, which stays
+    in (distances, headings) arrays the whole way when NumPy is around.
+    """
+    if segments is None and plan_compiler.available:
+        distances, headings, path_report = simplify_arrays(distances, headings, simplify_tolerance)
+        motor_plan = plan_compiler.compile_motor_plan(distances, headings, HEADING_OFFSET)
+    else:
+        if segments is None:
+            segments = [{"distance_feet": d, "heading_degrees": h} for d, h in zip(distances, headings)]
+        segments, path_report = simplify_segments(segments, simplify_tolerance)
+        motor_plan = compile_segments(segments)
+    plan_report = None
+    if OPTIMIZE_PLANS:
+        motor_plan, plan_report = optimize_motor_plan(motor_plan, cost_model, tolerance)
+    return {
+        "motor_plan": motor_plan,
+        "plan_report": plan_report,
+        "path_report": path_report
+    }
+
+def new_run_log():
+    return RunLog(RUN_LOG_RETENTION, RUN_LOG_VERBOSITY)
+
+def run_motor_plan_on_arduino(motor_plan, job=None, robot=None):
     """
     Execute the multi-step drawing plan on the Arduino with:
-      - full boot sync
+      - exclusive use of the shared link (already boot-synced at startup)
       - per-step resync
       - opcode/echo/param/Done handshake
 
@@ -409,47 +494,149 @@ def run_motor_plan_on_arduino(motor_plan):
         wait "Done5"
 
     FORWARD:
-        send 3
-        wait echo "3"
+        send 1 (or the step's "opcode", 2/3 for the faster tiers)
+        wait echo "1"
         send <distance_ft>
-        wait "Done3"
+        wait "Done1"
+
+    With PLAN_UPLOAD on and a sketch that supports it, the same steps go
+    over as one binary frame instead (see _run_plan_uploaded).
+
+    Pass a PlanJob as job to get per-step progress in job.steps_done,
+    the log written live into job.serial_log, and to stop early once
+    job.cancel_requested is set (checked between steps).
+
+    robot is the fleet Robot to drive, the first one by default.
     """
 
-    serial_log = []
+    if robot is None:
+        robot = fleet.first
+    serial_log = job.serial_log if job is not None else new_run_log()
+    with robot.link.session(serial_log) as hw_available:
+        if hw_available and PLAN_UPLOAD and robot.link.plan_mode_ok is not False:
+            _run_plan_uploaded(motor_plan, robot, serial_log, job)
+        else:
+            _run_plan_steps(motor_plan, robot, hw_available, serial_log, job)
+    return serial_log
 
-    # ---------- open serial (reboots Arduino) ----------
-    try:
-        ser = serial.Serial(ARDUINO_PORT, BAUD, timeout=0.2)
-        hw_available = True
-        serial_log.append(f"[info] opened {ARDUINO_PORT} @ {BAUD}")
-    except Exception as e:
-        hw_available = False
-        ser = None
-        serial_log.append(f"[warn] could not open {ARDUINO_PORT}: {e}")
-        serial_log.append("[warn] SIM MODE (no Arduino)")
 
-    # ---------- helpers ----------
+# per-step progress while the firmware runs an uploaded frame
+STEP_DONE = re.compile(r"^Step (\d+) Done(\d)$")
 
-    def read_line_now():
-        if not hw_available:
-            return None
-        raw = ser.readline().decode("utf-8", errors="ignore").strip()
-        return raw if raw else None
+def _run_plan_uploaded(motor_plan, robot, serial_log, job=None):
+    """
+    Plan mode: ship the plan as binary frames (opcode 7) and let the
+    firmware run the steps back to back. Caller holds the link.
 
-    def drain_and_log(seconds):
-        """Read/log everything Arduino prints for N seconds."""
-        if not hw_available:
+    Per frame:
+        wait Ready, send 7, wait echo "7", wait "Frame"
+        write the frame bytes
+        "PlanOk <n>", then "Step <i> Done<op>" per step, then "PlanDone"
+
+    A frame the firmware refuses (old sketch without opcode 7, bad
+    checksum) is run step by step instead. Cancelling sends '9', which
+    the sketch checks between steps ("PlanAbort").
+    """
+    arduino = robot.link
+
+    def wait_for_line(prefix, timeout_sec):
+        return arduino.wait_for_line(lambda raw: raw.startswith(prefix), timeout_sec, serial_log)
+
+    def upload_frame(frame, indexes):
+        arduino.wait_ready(serial_log)
+        arduino.send_line(7)
+        serial_log.append("sent 7")
+        # exact match: an IMU line like "7.12,..." isn't the echo
+        echoed = arduino.wait_for_line(lambda raw: raw == "7", 2.0, serial_log) is not None
+        observe_serial(robot, 7, "echo", echoed)
+        if not echoed or wait_for_line("Frame", 1.0) is None:
+            return "rejected"
+
+        arduino.write_bytes(frame)
+        serial_log.append(f"sent plan frame ({len(indexes)} steps, {len(frame)} bytes)")
+
+        abort_sent = False
+        step_started_at = time.perf_counter()
+        deadline = time.monotonic() + 2.0   # PlanOk comes right after the frame
+        while time.monotonic() < deadline and arduino.connected:
+            if job is not None and job.cancel_requested and not abort_sent:
+                # not sent (link down, or an estop is already going out):
+                # try again next time round
+                if arduino.send_line(9):
+                    serial_log.append("sent 9 (cancel)")
+                    abort_sent = True
+
+            # wakes as soon as a line is in, else every read_timeout to
+            # look at the cancel flag again
+            raw = arduino.read_line(min(deadline - time.monotonic(), arduino.read_timeout))
+            if not raw:
+                continue
+            serial_log.append(f"arduino -> {raw}")
+
+            if raw.startswith("PlanErr"):
+                return "rejected"
+            if raw.startswith("PlanOk"):
+                if job is not None:
+                    job.step_started(indexes[0])
+                step_started_at = time.perf_counter()
+                deadline = time.monotonic() + 15.0
+            elif raw.startswith("Step "):
+                step = STEP_DONE.match(raw)
+                i = int(step.group(1)) if step else -1
+                if not 0 <= i < len(indexes):
+                    # garbled / partial line; PlanDone or the stall timeout still ends the frame
+                    serial_log.append(f"[warn] ignoring step line {raw!r}")
+                    continue
+                now = time.perf_counter()
+                serial_latency.observe(now - step_started_at, robot.name, step.group(2), "plan_step")
+                step_started_at = now
+                if job is not None:
+                    job.step_finished(indexes[i])
+                    if i + 1 < len(indexes):
+                        job.step_started(indexes[i + 1])
+                deadline = time.monotonic() + 15.0
+            elif raw == "PlanAbort":
+                return "aborted"
+            elif raw == "PlanDone":
+                return "done"
+        serial_log.append("arduino -> (plan stalled)")
+        serial_timeouts.inc(robot.name, "7", "done")
+        return "timeout"
+
+    for frame, indexes in encode_plan(motor_plan):
+        if job is not None and job.cancel_requested:
+            serial_log.append("[info] cancelled, skipping remaining steps")
+            return
+
+        result = upload_frame(frame, indexes)
+        if result == "rejected":
+            if arduino.plan_mode_ok is None:
+                arduino.plan_mode_ok = False
+                serial_log.append("[warn] firmware has no plan mode, sending steps one by one")
+            _run_plan_steps(motor_plan, robot, True, serial_log, job, indexes=indexes)
+            continue
+
+        arduino.plan_mode_ok = True
+        if result == "aborted":
+            serial_log.append("[info] cancelled, skipping remaining steps")
+            return
+        if result == "timeout":
+            serial_log.append("[warn] plan stalled, skipping remaining steps")
             return
-        end_t = time.time() + seconds
-        while time.time() < end_t:
-            raw = read_line_now()
-            if raw:
-                serial_log.append(f"arduino -> {raw}")
+
+
+def _run_plan_steps(motor_plan, robot, hw_available, serial_log, job=None, indexes=None):
+    """
+    Step-by-step loop for run_motor_plan_on_arduino. Caller holds the link.
+    indexes limits it to those motor_plan entries (default: all of them).
+    """
+    arduino = robot.link
+
+    # ---------- helpers ----------
 
     def send_line(val):
         if hw_available:
-            ser.write((str(val) + "\n").encode("utf-8"))
-            ser.flush()
+            arduino.send_line(val)
         serial_log.append(f"sent {val}")
 
     def wait_for_echo(expected_str, timeout_sec=2.0):
@@ -462,184 +649,282 @@ def run_motor_plan_on_arduino(motor_plan):
         if not hw_available:
             serial_log.append("arduino -> (SIM echo ok)")
             return True
-        deadline = time.time() + timeout_sec
-        while time.time() < deadline:
-            raw = read_line_now()
-            if raw:
-                serial_log.append(f"arduino -> {raw}")
-                if raw.strip() == str(expected_str):
-                    return True
+        expected = str(expected_str)
+        seen = arduino.wait_for_line(lambda raw: raw == expected, timeout_sec, serial_log) is not None
+        observe_serial(robot, expected, "echo", seen)
+        if seen:
+            return True
         serial_log.append("arduino -> (no echo)")
         return False
 
-    def wait_for_done(timeout_sec=15.0):
+    def wait_for_done(opcode, timeout_sec=15.0):
         """
         After sending full command (opcode + param),
         Arduino eventually prints Done3 / Done4 / Done5.
         We block until we see a line starting with "Done".
+        False if the sketch answered EStop instead (emergency stop).
         """
         if not hw_available:
             serial_log.append("arduino -> SIM_DONE")
-            return
-        deadline = time.time() + timeout_sec
-        while time.time() < deadline:
-            raw = read_line_now()
-            if raw:
-                serial_log.append(f"arduino -> {raw}")
-                if raw.startswith("Done"):
-                    return
-        serial_log.append("arduino -> (no final DONE)")
+            return True
+        raw = arduino.wait_for_line(
+            lambda raw: raw.startswith("Done") or raw == ESTOP_MARKER, timeout_sec, serial_log
+        )
+        if raw == ESTOP_MARKER:
+            return False  # cut short by emergency_stop()
+        observe_serial(robot, opcode, "done", raw is not None)
+        if raw is None:
+            serial_log.append("arduino -> (no final DONE)")
+        return True
 
     def sync_ready():
         """
         IMPORTANT:
         After Arduino finishes a command (like a turn),
         it loops, dumps IMU lines, delay(200), clearInputBuffer(),
-        THEN waits for the next command.
+        prints "Ready", THEN waits for the next command.
 
         If we blast the next opcode too early, it gets cleared.
 
-        So before sending the NEXT command, we let that cycle finish,
-        then drain any IMU spam so the RX buffer is clean.
+        So before sending the NEXT command, we read (and log) whatever it
+        prints until that Ready line shows up, and go the moment it does.
         """
         if not hw_available:
             return
-        time.sleep(0.5)   # give it time to print accel/gyro and clearInputBuffer
-        drain_and_log(0.5)
-
-    # ---------- 1. BOOT SYNC ----------
-    if hw_available:
-        # let Arduino boot + print "MPU6050 Found!" + first IMU spam
-        time.sleep(3.5)
-        drain_and_log(1.0)
-
-    # ---------- 2. RUN EACH STEP ----------
-    first_step = True
-    for step in motor_plan:
-        action = step["action"]
-
-        # before sending ANYTHING after the first command,
-        # resync so Arduino is waiting at "while(Serial.available()==0){}"
-        if not first_step:
-            sync_ready()
-        first_step = False
-
-        if action == "TURN_LEFT":
-            deg_val = int(round(step.get("deg", 0)))
-            if deg_val < 1:
-                continue
-
-            # handshake for left turn (opcode 5)
-            send_line(5)
-            wait_for_echo(5, timeout_sec=2.0)
-
-            send_line(deg_val)
-            wait_for_done(timeout_sec=15.0)
-
-        elif action == "TURN_RIGHT":
-            deg_val = int(round(step.get("deg", 0)))
-            if deg_val < 1:
-                continue
-
-            # handshake for right turn (opcode 4)
-            send_line(4)
-            wait_for_echo(4, timeout_sec=2.0)
+        if not arduino.wait_ready(serial_log):
+            serial_log.append("arduino -> (no Ready, sending anyway)")
 
-            send_line(deg_val)
-            wait_for_done(timeout_sec=15.0)
+    def run_step(step):
+        """False if an emergency stop cut the step short."""
+        op = step_to_opcode(step)
+        if op is None:
+            return True  # too small to bother the robot with
+        opcode, param = op
 
-        elif action == "FORWARD":
-            dist_ft = float(step.get("distance_ft", 0.0))
-            if dist_ft <= 0.0:
-                continue
-
-            # handshake for forward distance mode (opcode 1)
-            send_line(1)
-            wait_for_echo(1, timeout_sec=2.0)
-
-            send_line(dist_ft)
-            wait_for_done(timeout_sec=15.0)
-
-        else:
+        if opcode == 9:
             # fallback / emergency stop
             send_line(9)
             wait_for_echo(9, timeout_sec=2.0)
-            wait_for_done(timeout_sec=3.0)
-
-    # ---------- 3. CLOSE SERIAL ----------
-    if hw_available and ser is not None:
-        ser.close()
-        serial_log.append("[info] closed serial")
+            return wait_for_done(9, timeout_sec=3.0)
+
+        # handshake: opcode, echo, param, Done<opcode>
+        send_line(opcode)
+        wait_for_echo(opcode, timeout_sec=2.0)
+
+        send_line(param)
+        return wait_for_done(opcode, timeout_sec=15.0)
+
+    # ---------- RUN EACH STEP ----------
+    if indexes is None:
+        indexes = range(len(motor_plan))
+    for index in indexes:
+        step = motor_plan[index]
+        if job is not None and job.cancel_requested:
+            serial_log.append("[info] cancelled, skipping remaining steps")
+            break
+
+        if hw_available and not arduino.connected:
+            serial_log.append("[warn] lost Arduino mid-plan, skipping remaining steps")
+            break
+
+        # before sending ANYTHING, make sure Arduino is back at
+        # "while(Serial.available()==0){}"
+        sync_ready()
+
+        if job is not None:
+            job.step_started(index)
+        if not run_step(step):
+            serial_log.append("[warn] emergency stop, skipping remaining steps")
+            break
+        if job is not None:
+            job.step_finished(index)
 
     return serial_log
 
 
-
-
-def send_manual_command_to_arduino(cmd):
+def send_manual_command_to_arduino(cmd, boost=False, degrees=None, robot=None):
     """
-    Fire a single immediate command to the Arduino, or simulate if not plugged in.
+    Fire a single immediate command over a robot's Arduino link (the
+    first robot's by default), or simulate if not plugged in.
 
     cmd is one of: "FORWARD", "LEFT", "RIGHT", "STOP"
-
-    Arduino opcodes from your sketch:
-      3 -> forward fast
-      4 -> turn right
-      5 -> turn left
-      9 -> stop
+    degrees overrides TURN_STEP_DEG for LEFT / RIGHT (merged nudges)
+
+    Every opcode except 9 makes the sketch block for a parameter, so we
+    always send the full opcode + param pair:
+      FORWARD -> 1, FORWARD_STEP_FT   (short forward nudge;
+                                       BOOST_OPCODE instead of 1 with boost)
+      RIGHT   -> 4, TURN_STEP_DEG
+      LEFT    -> 5, TURN_STEP_DEG
+      STOP    -> 9
+
+    Then read lines until we see "Done#" or time out. The port stays
+    open between calls, so this is one serial round trip, not a reboot.
+    Returns the RunLog.
     """
 
-    serial_log = []
+    if robot is None:
+        robot = fleet.first
+    arduino = robot.link
+    serial_log = new_run_log()
+    if degrees is None:
+        degrees = TURN_STEP_DEG
 
-    # translate high-level cmd to opcode
+    # translate high-level cmd to opcode (+ param)
     if cmd == "FORWARD":
-        opcode = 1
+        sequence = [BOOST_OPCODE if boost else 1, FORWARD_STEP_FT]
     elif cmd == "LEFT":
-        opcode = 5
+        sequence = [5, degrees]
     elif cmd == "RIGHT":
-        opcode = 4
+        sequence = [4, degrees]
     elif cmd == "STOP":
-        opcode = 9
+        sequence = [9]
     else:
-        opcode = 9  # default = STOP for safety
-
-    # try to open hardware
-    try:
-        ser = serial.Serial(ARDUINO_PORT, BAUD, timeout=1)
-        time.sleep(0.2)  # tiny delay so the Arduino is ready
-        hw_available = True
-        serial_log.append(f"[info] opened {ARDUINO_PORT} @ {BAUD}")
-    except Exception as e:
-        # no Arduino plugged in? that's fine; simulate.
-        hw_available = False
-        ser = None
-        serial_log.append(f"[warn] could not open {ARDUINO_PORT}: {e}")
-        serial_log.append("[warn] SIM MODE (no Arduino)")
-
-    # send the opcode
-    def send_line(line):
+        sequence = [9]  # default = STOP for safety
+
+    with arduino.session(serial_log) as hw_available:
+
+        def send_line(val):
+            if hw_available:
+                arduino.send_line(val)
+            serial_log.append(f"sent {val}")
+
+        def wait_for_echo(expected, timeout_sec=1.0):
+            if not hw_available:
+                return
+            seen = arduino.wait_for_line(lambda raw: raw == str(expected), timeout_sec, serial_log) is not None
+            observe_serial(robot, expected, "echo", seen)
+            if not seen:
+                serial_log.append("arduino -> (no echo)")
+
+        # read lines until "Done" or timeout
+        def read_until_done(timeout_sec=2.0):
+            if not hw_available:
+                serial_log.append("arduino -> SIM_DONE")
+                return
+            raw = arduino.wait_for_line(
+                lambda raw: raw.startswith("Done") or raw == ESTOP_MARKER, timeout_sec, serial_log
+            )
+            if raw == ESTOP_MARKER:
+                return
+            observe_serial(robot, sequence[0], "done", raw is not None)
+            if raw is None:
+                serial_log.append("arduino -> (no final DONE)")
+
+        # previous nudge may have just finished; don't get eaten by
+        # the sketch's clearInputBuffer()
         if hw_available:
-            ser.write((str(line) + "\n").encode("utf-8"))
-            ser.flush()
-        serial_log.append(f"sent {line}")
+            arduino.wait_ready(serial_log)
 
-    # read one reply line (non-blocking-ish)
-    def read_reply():
-        if not hw_available:
-            serial_log.append("arduino -> SIM_DONE")
-            return
-        raw = ser.readline().decode("utf-8", errors="ignore").strip()
-        if raw:
-            serial_log.append(f"arduino -> {raw}")
+        # opcode, wait for the echo (sketch clears RX right after it),
+        # then the param
+        send_line(sequence[0])
+        if len(sequence) > 1:
+            wait_for_echo(sequence[0])
+            send_line(sequence[1])
+        read_until_done(timeout_sec=2.0)
 
-    send_line(opcode)
-    read_reply()
+    return serial_log
 
-    if hw_available and ser is not None:
-        ser.close()
-        serial_log.append("[info] closed serial")
 
-    return serial_log
+def add_robot(name, port):
+    """
+    Register a robot on this serial port with the fleet and the access
+    control; whoever is first in line gets it straight away. Its link is
+    opened by fleet.start() (or robot.link.start()).
+    """
+    telemetry = Telemetry(TELEMETRY_CAPACITY)
+    robot = Robot(name, ArduinoLink(port, BAUD, on_line=telemetry.feed), telemetry)
+    # background executor for /api/runpath; one plan at a time per robot.
+    # The robot's run slot in access control is the real "mid-run" state.
+    robot.jobs = JobRunner(
+        lambda job: run_motor_plan_on_arduino(job.motor_plan, job, robot),
+        on_finish=lambda job: access.finish_run(name),
+        make_log=lambda: new_run_log()
+    )
+    # one worker feeds manual presses to the Arduino; mashed nudges merge
+    # and STOP jumps the line (see manual_drive)
+    robot.drive = DrivePipeline(
+        lambda command, boost, degrees: send_manual_command_to_arduino(command, boost, degrees, robot),
+        TURN_STEP_DEG
+    )
+    fleet.add(robot)
+    access.add_robot(name)
+    return robot
+
+
+for _name, _port in ROBOT_PORTS.items():
+    add_robot(_name, _port)
+
+
+def emergency_stop(robot, requested_by):
+    """
+    Stop this robot now, mid-step: drop pending manual presses, put the
+    stop byte on the wire without waiting for the link
+    (ArduinoLink.emergency_stop), then cancel the running plan. The plan
+    executor sees the sketch's EStop instead of Done and gives up the
+    remaining steps. The '!' goes first so the executor's cancel '9'
+    can't end up ahead of it.
+    """
+    job = robot.jobs.active
+    robot.drive.halt()
+    ack = robot.link.emergency_stop()
+    if job is not None:
+        job.request_cancel()
+        job.serial_log.append(f"[warn] emergency stop by {requested_by}")
+    estop_count.inc(robot.name, str(ack is not None).lower())
+    if ack is not None:
+        estop_ack_latency.observe(ack, robot.name)
+    return {
+        "job_id": job.id if job is not None else None,
+        "acked": ack is not None,
+        "ack_ms": round(ack * 1e3, 2) if ack is not None else None
+    }
+
+
+def board_elsewhere(robot):
+    """
+    503 if another worker process holds this robot's serial port (see
+    init_app); the drive and job routes have to be served by that one.
+    """
+    if not robot.link.held_elsewhere:
+        return None
+    return jsonify({"ok": False, "error": "robot is on another worker", "robot": robot.name}), 503
+
+
+def job_elsewhere():
+    """A job we don't know may live in the worker that holds a board."""
+    if any(robot.link.held_elsewhere for robot in fleet):
+        return jsonify({"ok": False, "error": "job is on another worker"}), 503
+    return jsonify({"ok": False, "error": "no such job"}), 404
+
+
+@app.route("/api/estop", methods=["POST"])
+def estop():
+    """
+    Body: { "client_id": "some-id" }
+
+    Emergency stop for the robot this client owns (or is running a plan on).
+    Returns right after the sketch acknowledged:
+      { ok, robot, job_id (the cancelled plan or null), acked, ack_ms }
+    """
+    data = request.get_json(silent=True) or {}
+    client_id = data.get("client_id", None)
+    if not client_id:
+        return jsonify({"ok": False, "error": "no client_id"}), 400
+
+    name = access.view(client_id)["robot"]
+    robot = fleet.get(name) if name is not None else fleet.running_job_of(client_id)[0]
+    if robot is None:
+        return jsonify({"ok": False, "error": "not the owner"}), 403
+    elsewhere = board_elsewhere(robot)
+    if elsewhere is not None:
+        return elsewhere
+
+    result = emergency_stop(robot, client_id)
+    result["ok"] = True
+    result["robot"] = robot.name
+    return jsonify(result), 200
 
 
 @app.route("/api/manualdrive", methods=["POST"])
@@ -649,20 +934,30 @@ def manualdrive():
     Body:
     {
       "user_id": "<clientId from access.js>",
-      "command": "FORWARD" | "LEFT" | "RIGHT" | "STOP"
+      "command": "FORWARD" | "LEFT" | "RIGHT" | "STOP",
+      "boost": true              (optional, FORWARD at full speed)
     }
 
     Behavior:
-    - Only the current_owner can actually drive.
-    - If you're not the current_owner, we respond with status:"queued"
+    - Only a robot's owner can actually drive it ("robot" in the
+      response says which one; a robot nobody owns is fair game).
+    - If you own no robot and none is free, we respond with status:"queued"
       so the frontend can throw you to waiting.html.
+    - Presses go through the drive pipeline: LEFT/RIGHT arriving while
+      the robot is busy merge into one turn, FORWARD keeps the latest,
+      STOP goes first. A STOP while a plan or a nudge is moving is also
+      an emergency stop (see emergency_stop; result in "estop").
+      The response says what was actually sent
+      ("sent", "degrees") and how many presses it covered
+      ("coalesced"); status is "executed", or "stopped" /
+      "cancelled_out" / "dropped" if the press never went out itself,
+      or "pending" if it hasn't gone out within MANUAL_DRIVE_WAIT.
     """
 
-    global current_owner, queue
-
     data = request.get_json(silent=True) or {}
     user_id = data.get("user_id")
     command = data.get("command")
+    boost = bool(data.get("boost", False))
 
     if not user_id or not command:
         return jsonify({
@@ -670,23 +965,49 @@ def manualdrive():
             "error": "bad request"
         }), 400
 
-    # If someone else is owner, you're not allowed to drive. You get queued.
-    if current_owner is not None and current_owner != user_id:
-        if user_id not in queue:
-            queue.append(user_id)
+    # If someone else owns every robot, you're not allowed to drive. You get queued.
+    name = access.check_driver(user_id)
+    if name is None:
         return jsonify({
             "ok": True,
             "status": "queued",
             "serial_log": []
         }), 200
+    robot = fleet[name]
+    elsewhere = board_elsewhere(robot)
+    if elsewhere is not None:
+        return elsewhere
+
+    # STOP while something is moving doesn't wait its turn: cut the plan
+    # or the nudge in flight short first, then the 9 goes out as usual
+    estop_result = None
+    if command not in ("FORWARD", "LEFT", "RIGHT") and robot.busy:
+        estop_result = emergency_stop(robot, user_id)
+
+    # You ARE the owner -> into your robot's pipeline, and wait for it to go out
+    press = robot.drive.submit(user_id, command, boost)
+    if not press.wait(MANUAL_DRIVE_WAIT):
+        return jsonify({
+            "ok": True,
+            "status": "pending",
+            "robot": name,
+            "command": command,
+            "boost": boost,
+            "serial_log": []
+        }), 200
 
-    # You ARE the owner -> send the immediate command
-    serial_log = send_manual_command_to_arduino(command)
-
+    result = press.result
+    serial_log = result["serial_log"].texts()[1] if result["serial_log"] is not None else []
     return jsonify({
         "ok": True,
-        "status": "executed",
+        "status": result["status"],
+        "robot": name,
         "command": command,
+        "boost": boost,
+        "sent": result["sent"],
+        "degrees": result["degrees"],
+        "coalesced": result["coalesced"],
+        "estop": estop_result,
         "serial_log": serial_log
     }), 200
 
@@ -695,6 +1016,11 @@ def manualdrive():
 def index():
     return send_from_directory(UI_DIR, "index.html")
 
+def _tolerance_ok(value):
+    """A finite number >= 0 (JSON true/false are ints to Python, not tolerances)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) \
+        and math.isfinite(value) and value >= 0
+
 @app.route("/api/runpath", methods=["POST"])
 def runpath():
     """
@@ -705,90 +1031,361 @@ def runpath():
       "segments": [
         { "distance_feet": <num>, "heading_degrees": <num> },
         ...
-      ]
+      ],
+      "tolerance_ft": <num>,     (optional, default PLAN_TOLERANCE_FT)
+      "simplify_tolerance_ft": <num>  (optional, default SIMPLIFY_TOLERANCE_FT)
     }
 
+    Big drawings can instead POST the segments packed as
+    Content-Type: application/octet-stream (see segment_frame), with
+    user_id / tolerance_ft / simplify_tolerance_ft in the query string.
+
     Flow:
-    1. Check if caller is allowed to drive (must match current_owner).
-    2. If someone else owns it, return status:"queued".
-    3. If we're already executing a plan (is_busy True), also return queued/busy.
-    4. Otherwise:
-         - build motor plan
-         - run it on the Arduino
-         - return motor_plan + serial_log
+    1. Check if caller is allowed to drive (must own a robot, or one is free).
+    2. If every robot is someone else's, return status:"queued".
+    3. If a plan is already running on theirs, also return queued/busy.
+    4. Otherwise (holding that robot's run slot):
+         - simplify the path (see path_simplify)
+         - build motor plan (optimized, see plan_optimizer)
+         - hand it to that robot's background job runner
+         - return status:"started" + job_id + robot + motor_plan + plan_report
+           (steps and predicted ms before/after, max_error_ft) +
+           path_report (segments before/after, max_deviation_ft) right away
+
+    Poll /api/jobs/<job_id> for progress and the serial_log.
     """
 
-    global current_owner, queue, is_busy
-
-    data = request.get_json(silent=True) or {}
-    user_id = data.get("user_id", None)
-    segments = data.get("segments", [])
-
-    if not user_id or not isinstance(segments, list):
+    if request.mimetype == "application/octet-stream":
+        # packed float32 pairs, read in place; no per-segment dicts
+        user_id = request.args.get("user_id")
+        tolerance = request.args.get("tolerance_ft", PLAN_TOLERANCE_FT, type=float)
+        simplify_tolerance = request.args.get("simplify_tolerance_ft", SIMPLIFY_TOLERANCE_FT, type=float)
+        segments = None
+        try:
+            distances, headings = decode_segments(request.get_data(cache=False))
+        except ValueError:
+            user_id = None  # -> bad request below
+    else:
+        data = request.get_json(silent=True) or {}
+        user_id = data.get("user_id", None)
+        segments = data.get("segments", [])
+        tolerance = data.get("tolerance_ft", PLAN_TOLERANCE_FT)
+        simplify_tolerance = data.get("simplify_tolerance_ft", SIMPLIFY_TOLERANCE_FT)
+        try:
+            # only the binary upload comes without a segments list
+            if not isinstance(segments, list):
+                raise TypeError("segments must be a list")
+            if plan_compiler.available:
+                distances, headings = plan_compiler.segments_to_arrays(segments)
+            else:
+                distances = [float(seg.get("distance_feet", 0.0)) for seg in segments]
+                headings = [float(seg.get("heading_degrees", 0.0)) for seg in segments]
+            if not (all(map(math.isfinite, distances)) and all(map(math.isfinite, headings))):
+                raise ValueError("non-finite segment")
+        except (AttributeError, TypeError, ValueError):
+            user_id = None  # not a list of segments with finite numbers -> bad request below
+
+    if not user_id or not _tolerance_ok(tolerance) or not _tolerance_ok(simplify_tolerance):
         return jsonify({
             "ok": False,
             "error": "bad request"
         }), 400
-
-    # 1. Only the current owner is allowed to actually drive the robot.
-    # If you're not the owner, you get 'queued' so your browser should sit
-    # on waiting.html.
-    if current_owner is not None and current_owner != user_id:
-        # make sure you're on the queue so you'll get promoted later
-        if user_id not in queue:
-            queue.append(user_id)
-
+    tolerance, simplify_tolerance = float(tolerance), float(simplify_tolerance)
+
+    # 1. Only a robot's owner is allowed to actually drive it, and only if
+    # no plan is running on it yet. Both checks + grabbing its run slot
+    # happen in one transition, so two requests can't both start a run.
+    # If you own no robot you're put in line and get 'queued' so your
+    # browser should sit on waiting.html; busy gets the same shape.
+    # This comes before compiling so nobody else's drawing costs CPU or
+    # pushes a plan out of plan_cache.
+    verdict, name = access.start_run(user_id)
+    if verdict != "ok":
         return jsonify({
             "ok": True,
             "status": "queued",
-            "queue": queue,
+            "queue": access.queue_list(),
             "motor_plan": [],
             "serial_log": []
         }), 200
-
-    # 2. If the robot is currently mid-run (already executing a previous plan),
-    # don't start a second plan on top. Tell them it's still busy.
-    if is_busy:
-        # same response shape so the frontend treats this as "wait"
+    elsewhere = board_elsewhere(fleet[name])
+    if elsewhere is not None:
+        access.finish_run(name)
+        return elsewhere
+
+    # 2. Simplify the drawn path, build the low-level motor plan, then let
+    # the optimizer merge / fold steps and pick speeds within tolerance.
+    # A drawing we've compiled before with the same settings comes
+    # straight out of plan_cache.
+    try:
+        key = plan_key(distances, headings, plan_config(tolerance, simplify_tolerance))
+        compiled, plan_cached = plan_cache.get_or_compute(
+            key, lambda: compile_runpath(segments, distances, headings, tolerance, simplify_tolerance)
+        )
+    except Exception:
+        access.finish_run(name)
+        raise
+    motor_plan = compiled["motor_plan"]
+
+    # 3. Start it in the background. The run slot is released by the
+    # robot's job runner when the plan finishes.
+    job = fleet[name].jobs.submit(user_id, motor_plan)
+    if job is None:
+        access.finish_run(name)
         return jsonify({
             "ok": True,
             "status": "queued",
-            "queue": queue,
+            "queue": access.queue_list(),
             "motor_plan": [],
             "serial_log": []
         }), 200
 
-    # 3. We're allowed to run! Build the low-level motor plan.
-    motor_plan = build_motor_plan(segments)
+    return jsonify({
+        "ok": True,
+        "status": "started",
+        "job_id": job.id,
+        "robot": name,
+        "motor_plan": motor_plan,
+        "plan_report": compiled["plan_report"],
+        "path_report": compiled["path_report"],
+        "plan_cached": plan_cached,
+        "queue": access.queue_list()
+    }), 200
 
-    # Mark busy so nobody else can interleave a run
-    is_busy = True
 
-    try:
-        # Actually send the plan to the Arduino and capture the log
-        serial_log = run_motor_plan_on_arduino(motor_plan)
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """
+    Progress of a run-path job.
+
+    Query: ?since=<n> to only get serial_log lines from index n on
+    (pass back the previous log_offset + len(serial_log)). Only the last
+    RUN_LOG_RETENTION lines are kept, so log_offset may jump ahead.
+    """
+    robot, job = fleet.find_job(job_id)
+    if job is None:
+        return job_elsewhere()
+
+    since = max(request.args.get("since", 0, type=int), 0)
+    result = job.to_dict(log_since=since)
+    result["ok"] = True
+    result["robot"] = robot.name
+    return jsonify(result), 200
+
+
+@app.route("/api/jobs/<job_id>/log", methods=["GET"])
+def job_log_stream(job_id):
+    """
+    Server-Sent Events feed of a job's serial log as it's written.
+
+    Query: ?since=<seq> to resume (also honours Last-Event-ID).
+    Events:
+      log  {"seq", "t", "kind", "text"}, t in seconds since the run
+           started, kind one of tx / rx / imu / info / warn / error
+      end  {"status"} once the job is over and everything was sent
+    """
+    _, job = fleet.find_job(job_id)
+    if job is None:
+        return job_elsewhere()
+
+    since = request.args.get("since", type=int)
+    if since is None:
+        since = request.headers.get("Last-Event-ID", 0, type=int)
+    run_log = job.serial_log
+
+    def generate():
+        seq = max(since, 0)
+        while True:
+            _, records = run_log.since(seq)
+            for record in records:
+                yield f"id: {record[0]}\n" + sse_event("log", run_log.record_dict(record))
+                seq = record[0] + 1
+            if run_log.closed and seq >= run_log.next_seq:
+                yield sse_event("end", {"status": job.status})
+                return
+            if not run_log.wait(seq, STREAM_PING):
+                yield ": ping\n\n"
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+@app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def job_cancel(job_id):
+    """
+    Body: { "user_id": "<clientId>" }
+
+    Only whoever started the job can cancel it. The runner stops
+    before the next step; the step in flight finishes first.
+    """
+    data = request.get_json(silent=True) or {}
+    user_id = data.get("user_id")
 
-    finally:
-        # Always clear busy, even if something exploded talking to Arduino
-        is_busy = False
+    robot, job = fleet.find_job(job_id)
+    if job is None:
+        return job_elsewhere()
+    if user_id != job.owner:
+        return jsonify({"ok": False, "error": "not your job"}), 403
 
-    # 4. Return what happened back to the browser for debug display
+    robot.jobs.cancel(job_id)
     return jsonify({
         "ok": True,
-        "status": "executed",
-        "motor_plan": motor_plan,
-        "serial_log": serial_log,
-        "queue": queue
+        "job_id": job.id,
+        "status": job.status,
+        "cancel_requested": job.cancel_requested
     }), 200
 
 
+@app.route("/api/telemetry", methods=["GET"])
+def telemetry_query():
+    """
+    IMU samples for dashboards, downsampled.
+
+    Query (all optional):
+      robot=<name>          whose IMU (default the first robot)
+      window=<seconds>      last N seconds (default 60)
+      since=<ts>, until=<ts>  explicit wall-clock range instead
+      buckets=<n>           max buckets to split the range into (default 100)
+      channels=ax,ay,gz     which channels to include
+
+    Each bucket has t_start / t_end / n and {min, max, mean} per channel.
+    """
+    since = request.args.get("since", type=float)
+    until = request.args.get("until", type=float)
+    window = request.args.get("window", 60.0, type=float)
+    buckets = request.args.get("buckets", 100, type=int)
+    channels = request.args.get("channels", ",".join(CHANNELS)).split(",")
+    robot = fleet.get(request.args.get("robot", fleet.first.name))
+
+    if robot is None:
+        return jsonify({"ok": False, "error": "no such robot"}), 404
+    elsewhere = board_elsewhere(robot)
+    if elsewhere is not None:
+        return elsewhere
+    if buckets < 1 or window <= 0 or any(c not in CHANNELS for c in channels):
+        return jsonify({"ok": False, "error": "bad request"}), 400
+    if since is None:
+        since = (until if until is not None else time.time()) - window
+
+    ring = robot.telemetry.ring
+    result = ring.query(since, until, min(buckets, 2000), channels)
+    result.update({
+        "ok": True,
+        "robot": robot.name,
+        "channels": channels,
+        "latest": ring.latest()
+    })
+    return jsonify(result), 200
+
+
 @app.route("/api/admin/state", methods=["GET"])
 def admin_state():
+    """
+    Shared waiting line plus, per robot: owner, run slot, link state,
+    pending manual presses and utilisation (seconds its link spent
+    running plans / commands over seconds since it was registered).
+    """
+    state = access.snapshot()
+    robots = {}
+    for robot in fleet:
+        slots = state["robots"].get(robot.name, {})
+        entry = {
+            "owner": slots.get("owner"),
+            "is_busy": slots.get("run_holder") is not None,
+            "active_job": robot.jobs.active.id if robot.jobs.active else None,
+            "arduino_connected": robot.link.connected,
+            "arduino_log": list(robot.link.connect_log),
+            "manual_drive": robot.drive.pending()
+        }
+        entry.update(robot.utilisation())
+        robots[robot.name] = entry
     return jsonify({
-        "is_busy": is_busy,
-        "queue": queue
+        "queue": state["queue"],
+        "tracked_clients": state["tracked_clients"],
+        "plan_cache": plan_cache.stats(),
+        "robots": robots
     })
 
 
+@app.route("/api/admin/estop", methods=["POST"])
+def admin_estop():
+    """
+    Emergency stop from the admin side, whoever is driving.
+    Body (optional): { "robot": "<name>" }; every robot if left out.
+    Robots another worker holds are listed under "elsewhere", not stopped.
+    """
+    data = request.get_json(silent=True) or {}
+    name = data.get("robot")
+    if name is not None and fleet.get(name) is None:
+        return jsonify({"ok": False, "error": "no such robot"}), 404
+    if name is not None:
+        elsewhere = board_elsewhere(fleet[name])
+        if elsewhere is not None:
+            return elsewhere
+    targets = [fleet[name]] if name is not None else list(fleet)
+    return jsonify({
+        "ok": True,
+        "robots": {
+            robot.name: emergency_stop(robot, "admin")
+            for robot in targets if not robot.link.held_elsewhere
+        },
+        "elsewhere": [robot.name for robot in targets if robot.link.held_elsewhere]
+    }), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_export():
+    """Prometheus text format; see the metrics = Registry() block up top."""
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+
+_init_lock = threading.Lock()
+_initialized = False
+
+def init_app(drive=True):
+    """
+    Start what the routes rely on: journal replay, serial links, reaper.
+
+    Call once per serving process before it takes requests; later calls
+    do nothing. `python server_copy.py` does it below. Jobs and manual
+    drive live in the process that holds the board, so under a WSGI
+    server run one worker for them and as many as you like for the rest
+    (ACCESS_BACKEND = "sqlite" so they share the line), e.g.
+
+        gunicorn -w 1 -k gthread --threads 32 -b 127.0.0.1:8001 wsgi:app
+        gunicorn -w 4 -k gthread --threads 32 -b 127.0.0.1:8000 \
+            'server_copy:init_app(drive=False)'
+
+    and have the reverse proxy send /api/runpath, /api/manualdrive,
+    /api/estop, /api/admin/estop, /api/jobs/ and /api/telemetry to 8001
+    (the IMU ring fills from the port too), everything else
+    to 8000. With drive=False the serial ports aren't opened at all and
+    those routes answer 503; so do they on a worker whose port another
+    process holds (see ArduinoLink.held_elsewhere). Not with --preload:
+    the threads started here don't survive the fork. Only one process
+    reaps the shared SQLite store.
+    """
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return app
+        # put the waiting line back the way the last run left it
+        if ACCESS_BACKEND == "memory" and ACCESS_JOURNAL:
+            access.open_journal(StateJournal(ACCESS_JOURNAL, JOURNAL_FSYNC_EVERY, JOURNAL_SNAPSHOT_EVERY))
+        # open + boot-sync every Arduino once, before we take any requests
+        if drive:
+            fleet.start()
+        else:
+            for robot in fleet:
+                robot.link.held_elsewhere = True
+        reaper.start()
+        _initialized = True
+    return app
+
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=80)
+    init_app()
+    # threaded: every open /api/stream holds a worker thread
+    app.run(host="0.0.0.0", port=80, threaded=True)
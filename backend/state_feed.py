@@ -0,0 +1,37 @@
+"""
+Change notifications for the access-control state.
+
+Anything that changes current_owner or the queue calls publish(); every
+open /api/stream connection sits in wait() and only wakes up (and only
+pushes anything to its browser) when the version number moves.
+"""
+
+import json
+import threading
+
+
+class StateFeed:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.version = 0
+
+    def publish(self):
+        """Something about owner/queue changed; wake every listener."""
+        with self._cond:
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait(self, seen_version, timeout):
+        """
+        Block until the version moves past seen_version or timeout runs out.
+        Returns the current version either way.
+        """
+        with self._cond:
+            if self.version == seen_version:
+                self._cond.wait(timeout)
+            return self.version
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
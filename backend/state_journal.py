@@ -0,0 +1,174 @@
+"""
+Append-only journal + snapshots for the in-process access state.
+
+With a journal open (see InProcessAccessControl.open_journal) every
+change to who owns which robot and who is in line is appended here, and
+at startup the state is rebuilt from the last snapshot plus the records
+after it, so a restart keeps the waiting line.
+
+append() only puts a tuple on a list (the caller holds the access
+lock); a flusher thread writes and fsyncs the batch every fsync_every
+seconds, so a crash loses at most that batch. Every snapshot_every
+records it writes a snapshot (temp file, fsync, rename) and truncates
+the journal.
+
+Only structure is journaled: owners per robot and the line. Restored
+clients get a fresh liveness deadline, and run slots aren't kept since
+a plan doesn't survive its process.
+
+Records are [seq, op, *args], one JSON line per batch. Replay skips
+anything the snapshot already covers, and a torn last line is cut off
+before appending again.
+"""
+
+import atexit
+import json
+import os
+import threading
+
+SNAPSHOT_FILE = "snapshot.json"
+JOURNAL_FILE = "journal.log"
+
+
+class StateJournal:
+    def __init__(self, directory, fsync_every=0.05, snapshot_every=5000):
+        self.directory = directory
+        self.fsync_every = fsync_every
+        self.snapshot_every = snapshot_every
+        self.seq = 0
+        self.records_written = 0
+        self.snapshots_written = 0
+        self._since_snapshot = 0
+        self._pending = []    # record tuples and snapshot dicts, in order
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()   # flusher thread vs close()
+        self._file = None
+        self._valid_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    # ---------- startup ----------
+
+    def load(self):
+        """
+        (state, records): the last snapshot (None if there isn't one) and
+        the journal records after it, oldest first. seq continues from
+        the newest of them.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        state, covered = None, 0
+        try:
+            with open(self._path(SNAPSHOT_FILE)) as f:
+                state = json.load(f)
+            covered = state["seq"]
+        except FileNotFoundError:
+            pass
+
+        records = []
+        self._valid_bytes = 0
+        try:
+            with open(self._path(JOURNAL_FILE), "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        batch = json.loads(line)
+                    except ValueError:
+                        break
+                    self._valid_bytes += len(line)
+                    records.extend(record for record in batch if record[0] > covered)
+        except FileNotFoundError:
+            pass
+
+        self.seq = records[-1][0] if records else covered
+        self._since_snapshot = len(records)
+        return state, records
+
+    def start(self):
+        """Open the journal for appending (after load()) and start the flusher."""
+        if self._thread is not None:
+            return
+        self._file = open(self._path(JOURNAL_FILE), "ab")
+        self._file.truncate(self._valid_bytes)
+        self._thread = threading.Thread(target=self._loop, name="state-journal", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+        with self._flush_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ---------- called under the access lock ----------
+
+    def append(self, op, *args):
+        with self._lock:
+            self.seq += 1
+            self._since_snapshot += 1
+            self._pending.append((self.seq, op) + args)
+
+    @property
+    def snapshot_due(self):
+        return self._since_snapshot >= self.snapshot_every
+
+    def snapshot(self, state):
+        """state: a JSON-able copy as of the last append(); written by the flusher."""
+        with self._lock:
+            state["seq"] = self.seq
+            self._since_snapshot = 0
+            self._pending.append(state)
+
+    # ---------- flusher ----------
+
+    def _loop(self):
+        while not self._stop.wait(self.fsync_every):
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch or self._file is None:
+                return
+            records = []
+            for item in batch:
+                if isinstance(item, dict):
+                    # everything before it is in the snapshot; don't bother writing it
+                    records = []
+                    self._write_snapshot(item)
+                else:
+                    records.append(item)
+            if records:
+                self._file.write(json.dumps(records, separators=(",", ":")).encode() + b"\n")
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self.records_written += len(records)
+
+    def _write_snapshot(self, state):
+        tmp = self._path(SNAPSHOT_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(SNAPSHOT_FILE))
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self._file.truncate(0)
+        self.snapshots_written += 1
+
+    def stats(self):
+        return {
+            "seq": self.seq,
+            "records_written": self.records_written,
+            "snapshots_written": self.snapshots_written,
+            "since_snapshot": self._since_snapshot
+        }
@@ -0,0 +1,348 @@
+"""
+Build + serve the UI bundle for phones on event Wi-Fi.
+
+Flask's static_folder sends every file as-is with "Cache-Control:
+no-cache", so each page load re-downloads (or at best revalidates, one
+round trip each) every script, stylesheet and photo uncompressed. The
+build step does the work once instead:
+
+    python static_assets.py ../frontEnd /home/dylanfc/robot-ui-build
+
+  - CSS, JS and images get a content hash in the name (style.1a2b3c4d5e.css)
+    and the references in HTML / CSS are rewritten to it, so they can be
+    cached as immutable for a year; a changed file is a new URL.
+    HTML keeps its name (it's the entry point and what the JS redirects
+    to) and is revalidated every time, which is a 304 when unchanged.
+  - text files get .gz (and .br with the brotli package) siblings,
+    compressed at the highest level once instead of per request.
+  - photos get resized JPEG + WebP variants (with Pillow), picked per
+    request from the Accept header and the Sec-CH-Width / Viewport-Width
+    / DPR client hints the HTML responses ask for (Accept-CH).
+
+manifest.json maps URL paths to those files. AssetServer loads the
+whole bundle into memory (it's a couple of MB), so serving is a dict
+lookup, picking a representation and either a 304 or the bytes: no
+filesystem access, no compression and no hashing per request. Every
+representation has its own strong ETag.
+
+Both brotli and Pillow are optional, like NumPy for plan_compiler; the
+bundle just has no .br files / photo variants without them.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import sys
+from io import BytesIO
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+MANIFEST = "manifest.json"
+
+TEXT_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+VARIANT_WIDTHS = (160, 320, 480, 640, 960, 1280)
+JPEG_QUALITY = 82
+WEBP_QUALITY = 78
+MIN_SAVING = 0.9   # keep a compressed copy only if it's under 90% of the original
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+CLIENT_HINTS = "Sec-CH-Width, Sec-CH-Viewport-Width, Sec-CH-DPR"
+IMAGE_VARY = "Accept, Sec-CH-Width, Sec-CH-Viewport-Width, Sec-CH-DPR, Width, Viewport-Width, DPR"
+
+REF_ATTR = re.compile(r'''(\b(?:src|href)\s*=\s*["'])([^"'#?]+)(["'])''')
+REF_CSS = re.compile(r'''(url\(\s*["']?)([^"')#?]+)(["']?\s*\))''')
+
+
+def _digest(data, n):
+    return hashlib.sha256(data).hexdigest()[:n]
+
+
+def _mimetype(path):
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def _is_text(mimetype):
+    return mimetype.startswith(TEXT_TYPES)
+
+
+def _fingerprinted(rel, data):
+    root, ext = posixpath.splitext(rel)
+    return f"{root}.{_digest(data, 10)}{ext}"
+
+
+# ---------- build ----------
+
+class _Builder:
+    def __init__(self, src, out):
+        self.src = src
+        self.out = out
+        self.renamed = {}   # source rel path -> fingerprinted rel path
+        self.assets = {}    # URL path -> manifest entry
+
+    def write(self, rel, data):
+        path = os.path.join(self.out, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return {"file": rel, "etag": _digest(data, 16), "size": len(data)}
+
+    def rewrite(self, rel, text, pattern):
+        """Point references at the fingerprinted names (made absolute)."""
+        base = posixpath.dirname(rel)
+
+        def swap(match):
+            url = match.group(2)
+            if url.startswith(("http:", "https:", "//", "data:", "mailto:")):
+                return match.group(0)
+            target = url.lstrip("/") if url.startswith("/") else posixpath.join(base, url)
+            target = posixpath.normpath(target)
+            if target not in self.renamed:
+                return match.group(0)
+            return match.group(1) + "/" + self.renamed[target] + match.group(3)
+
+        return pattern.sub(swap, text)
+
+    def add(self, rel, data, fingerprint):
+        """One source file: itself, its compressed copies, and its URL paths."""
+        mimetype = _mimetype(rel)
+        name = _fingerprinted(rel, data) if fingerprint else rel
+        entry = dict(self.write(name, data), type=mimetype)
+        if _is_text(mimetype):
+            entry["encoded"] = self.compress(name, data)
+        if rel.lower().endswith(IMAGE_EXTS):
+            entry.update(self.image_variants(rel, data))
+        if fingerprint:
+            self.renamed[rel] = name
+            self.assets["/" + name] = dict(entry, immutable=True)
+        self.assets["/" + rel] = dict(entry, immutable=False)
+
+    def compress(self, name, data):
+        encoded = {}
+        candidates = [("gzip", ".gz", lambda: gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            candidates.insert(0, ("br", ".br", lambda: brotli.compress(data, quality=11)))
+        for coding, suffix, compress in candidates:
+            packed = compress()
+            if len(packed) < len(data) * MIN_SAVING:
+                encoded[coding] = self.write(name + suffix, packed)
+        return encoded
+
+    def image_variants(self, rel, data):
+        """Smaller JPEGs and WebPs of a photo; nothing without Pillow."""
+        if Image is None:
+            return {}
+        img = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        width, height = img.size
+        root = posixpath.splitext(rel)[0]
+        variants = []
+        for w in [w for w in VARIANT_WIDTHS if w < width] + [width]:
+            scaled = img if w == width else img.resize((w, max(round(height * w / width), 1)), Image.LANCZOS)
+            for fmt, mimetype, ext, options in (
+                ("JPEG", "image/jpeg", ".jpg", {"quality": JPEG_QUALITY, "optimize": True, "progressive": True}),
+                ("WEBP", "image/webp", ".webp", {"quality": WEBP_QUALITY, "method": 6}),
+            ):
+                if fmt == "JPEG" and w == width:
+                    continue  # that's the original
+                buf = BytesIO()
+                scaled.save(buf, fmt, **options)
+                packed = buf.getvalue()
+                if len(packed) >= len(data):
+                    continue  # bigger than the full-size original; pointless
+                name = f"{root}.{w}w.{_digest(packed, 10)}{ext}"
+                variants.append(dict(self.write(name, packed), type=mimetype, width=w))
+        return {"width": width, "variants": variants}
+
+    def run(self):
+        files = []
+        for dirpath, _, names in os.walk(self.src):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                files.append(os.path.relpath(path, self.src).replace(os.sep, "/"))
+
+        def kind(rel):
+            # images, then CSS (references images), then JS, then HTML (references all)
+            ext = posixpath.splitext(rel)[1].lower()
+            return {".css": 1, ".js": 2, ".html": 3}.get(ext, 0)
+
+        for rel in sorted(files, key=lambda r: (kind(r), r)):
+            with open(os.path.join(self.src, rel), "rb") as f:
+                data = f.read()
+            k = kind(rel)
+            if k == 1:
+                data = self.rewrite(rel, data.decode(), REF_CSS).encode()
+            elif k == 3:
+                data = self.rewrite(rel, data.decode(), REF_ATTR).encode()
+            self.add(rel, data, fingerprint=k != 3)
+
+        with open(os.path.join(self.out, MANIFEST), "w") as f:
+            json.dump({"assets": self.assets}, f, indent=1, sort_keys=True)
+        return self.assets
+
+
+def build(src, out):
+    """
+    Build src (the frontEnd folder) into out. Builds next to it and swaps
+    the directories at the end, so a half-finished build never replaces a
+    good one. Returns the manifest's assets.
+    """
+    out = os.path.abspath(out)
+    staging, old = out + ".new", out + ".old"
+    for path in (staging, old):
+        shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(staging)
+    assets = _Builder(src, staging).run()
+    if os.path.exists(out):
+        os.rename(out, old)
+    os.rename(staging, out)
+    shutil.rmtree(old, ignore_errors=True)
+    return assets
+
+
+# ---------- serve ----------
+
+def _accepted_codings(header):
+    """Accept-Encoding -> set of codings with q > 0."""
+    codings = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        codings.add(token.strip().lower())
+    return codings
+
+
+def _float_header(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    return None
+
+
+def _etag_matches(header, etag):
+    if header.strip() == "*":
+        return True
+    # If-None-Match compares weakly
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+class AssetServer:
+    """The built bundle, in memory. serve() answers GET / HEAD for it."""
+
+    def __init__(self, build_dir, assets):
+        self.build_dir = build_dir
+        self.assets = assets
+        self._bodies = {}
+        for entry in assets.values():
+            reps = [entry] + list(entry.get("encoded", {}).values()) + entry.get("variants", [])
+            for rep in reps:
+                if rep["file"] not in self._bodies:
+                    with open(os.path.join(build_dir, rep["file"]), "rb") as f:
+                        self._bodies[rep["file"]] = f.read()
+
+    @classmethod
+    def load(cls, build_dir):
+        """None if nothing's been built there yet."""
+        try:
+            with open(os.path.join(build_dir, MANIFEST)) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, TypeError):
+            return None
+        return cls(build_dir, manifest["assets"])
+
+    @property
+    def total_bytes(self):
+        return sum(len(body) for body in self._bodies.values())
+
+    def pick_image(self, entry, headers):
+        """
+        Smallest variant at least as wide as the client needs (WebP when
+        accepted), or the widest one if none is. Need = Sec-CH-Width, else
+        viewport width x DPR; without hints, full size.
+        """
+        webp = "image/webp" in headers.get("Accept", "")
+        candidates = [v for v in entry["variants"] if webp or v["type"] != "image/webp"]
+        candidates.append(dict(entry, width=entry["width"]))
+        need = _float_header(headers, "Sec-CH-Width", "Width")
+        if need is None:
+            viewport = _float_header(headers, "Sec-CH-Viewport-Width", "Viewport-Width")
+            if viewport is not None:
+                need = viewport * (_float_header(headers, "Sec-CH-DPR", "DPR") or 1.0)
+        if need is None:
+            need = entry["width"]
+        wide_enough = [c for c in candidates if c["width"] >= need]
+        if wide_enough:
+            return min(wide_enough, key=lambda c: (c["width"], c["size"]))
+        return max(candidates, key=lambda c: (c["width"], -c["size"]))
+
+    def serve(self, path, headers):
+        """A Response for this path, or None if it isn't in the bundle."""
+        from flask import Response
+
+        entry = self.assets.get("/index.html" if path == "/" else path)
+        if entry is None:
+            return None
+
+        rep, coding, vary = entry, None, None
+        if entry.get("variants"):
+            rep, vary = self.pick_image(entry, headers), IMAGE_VARY
+        elif "encoded" in entry:
+            vary = "Accept-Encoding"
+            accepted = _accepted_codings(headers.get("Accept-Encoding", ""))
+            for name in ("br", "gzip"):
+                if name in accepted and name in entry["encoded"]:
+                    rep, coding = entry["encoded"][name], name
+                    break
+
+        etag = f'"{rep["etag"]}"'
+        response = Response(status=200)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = IMMUTABLE if entry["immutable"] else REVALIDATE
+        if vary:
+            response.headers["Vary"] = vary
+        if entry["type"] == "text/html":
+            response.headers["Accept-CH"] = CLIENT_HINTS
+
+        if _etag_matches(headers.get("If-None-Match", ""), etag):
+            response.status_code = 304
+            return response
+
+        body = self._bodies[rep["file"]]
+        response.set_data(body)
+        response.content_type = rep.get("type", entry["type"])
+        if entry["type"].startswith("text/"):
+            response.content_type += "; charset=utf-8"
+        if coding:
+            response.headers["Content-Encoding"] = coding
+        return response
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python static_assets.py <frontEnd dir> <build dir>")
+    built = build(sys.argv[1], sys.argv[2])
+    extras = [] if brotli is not None else ["no brotli: gzip only"]
+    if Image is None:
+        extras.append("no Pillow: no photo variants")
+    print(f"{len(built)} URL paths -> {sys.argv[2]}" + (f" ({'; '.join(extras)})" if extras else ""))
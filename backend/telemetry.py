@@ -0,0 +1,159 @@
+"""
+IMU telemetry from the sketch's idle prints.
+
+While ROBO.ino waits for an opcode it prints a sample every TELEMETRY_MS
+(100 ms), each followed by "Ready", and one more at the top of every
+loop():
+
+    Acceleration: <ax>
+    <ay>
+    Turn rate: <gz>
+
+TelemetryParser turns those three lines into one sample and TelemetryRing
+keeps the last `capacity` samples in fixed, preallocated arrays (one
+array('d') per channel), so memory doesn't grow with uptime and nothing
+is kept as strings. query() answers a time window downsampled into
+min/max/mean buckets, which is what /api/telemetry serves.
+"""
+
+import threading
+import time
+from array import array
+
+CHANNELS = ("ax", "ay", "gz")
+TELEMETRY_CAPACITY = 8192  # samples kept; ~10/s while idle, so about 13 minutes
+
+
+class TelemetryParser:
+    """Line-by-line state machine for the three-line IMU print."""
+
+    def __init__(self):
+        self._ax = None
+        self._ay = None
+        self._want_ay = False
+
+    def feed(self, line):
+        """Returns (ax, ay, gz) when a sample completes, else None."""
+        if line.startswith("Acceleration:"):
+            self._ax = _to_float(line[len("Acceleration:"):])
+            self._ay = None
+            self._want_ay = self._ax is not None
+            return None
+        if line.startswith("Turn rate:"):
+            gz = _to_float(line[len("Turn rate:"):])
+            sample = None
+            if gz is not None and self._ax is not None and self._ay is not None:
+                sample = (self._ax, self._ay, gz)
+            self._ax = self._ay = None
+            self._want_ay = False
+            return sample
+        if self._want_ay:
+            # the bare number right after "Acceleration:" is y
+            self._want_ay = False
+            self._ay = _to_float(line)
+            if self._ay is None:
+                self._ax = None
+        return None
+
+
+def _to_float(text):
+    try:
+        return float(text.strip())
+    except ValueError:
+        return None
+
+
+class TelemetryRing:
+    """Fixed-size ring of (t, ax, ay, gz) samples; t is wall-clock seconds."""
+
+    def __init__(self, capacity=TELEMETRY_CAPACITY):
+        self.capacity = capacity
+        self._t = array("d", bytes(8 * capacity))
+        self._cols = {name: array("d", bytes(8 * capacity)) for name in CHANNELS}
+        self._next = 0      # slot the next sample goes into
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, t, values):
+        with self._lock:
+            i = self._next
+            self._t[i] = t
+            for name, value in zip(CHANNELS, values):
+                self._cols[name][i] = value
+            self._next = (i + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def _indexes(self):
+        """Slot numbers oldest -> newest. Caller holds the lock."""
+        start = (self._next - self._count) % self.capacity
+        return [(start + k) % self.capacity for k in range(self._count)]
+
+    def latest(self):
+        with self._lock:
+            if not self._count:
+                return None
+            i = (self._next - 1) % self.capacity
+            sample = {"t": self._t[i]}
+            sample.update((name, self._cols[name][i]) for name in CHANNELS)
+            return sample
+
+    def query(self, since=None, until=None, buckets=100, channels=CHANNELS):
+        """
+        Samples with since <= t <= until, downsampled into at most
+        `buckets` equal-width time buckets. Empty buckets are left out.
+
+        Returns {"since", "until", "samples", "buckets": [
+            {"t_start", "t_end", "n", "<channel>": {"min", "max", "mean"}}, ...]}
+        """
+        with self._lock:
+            rows = []
+            for i in self._indexes():
+                t = self._t[i]
+                if (since is None or t >= since) and (until is None or t <= until):
+                    rows.append((t, [self._cols[name][i] for name in channels]))
+
+        if not rows:
+            return {"since": since, "until": until, "samples": 0, "buckets": []}
+
+        lo = rows[0][0] if since is None else since
+        hi = rows[-1][0] if until is None else until
+        width = (hi - lo) / buckets if hi > lo else 1.0
+
+        acc = {}
+        for t, values in rows:
+            b = min(int((t - lo) / width), buckets - 1)
+            slot = acc.get(b)
+            if slot is None:
+                slot = acc[b] = [0, [[v, v, 0.0] for v in values]]
+            slot[0] += 1
+            for stat, v in zip(slot[1], values):
+                if v < stat[0]:
+                    stat[0] = v
+                if v > stat[1]:
+                    stat[1] = v
+                stat[2] += v
+
+        out = []
+        for b in sorted(acc):
+            n, stats = acc[b]
+            bucket = {"t_start": lo + b * width, "t_end": lo + (b + 1) * width, "n": n}
+            for name, (mn, mx, total) in zip(channels, stats):
+                bucket[name] = {"min": mn, "max": mx, "mean": total / n}
+            out.append(bucket)
+        return {"since": lo, "until": hi, "samples": len(rows), "buckets": out}
+
+
+class Telemetry:
+    """Parser + ring; feed() is the serial line hook."""
+
+    def __init__(self, capacity=TELEMETRY_CAPACITY):
+        self.ring = TelemetryRing(capacity)
+        self._parser = TelemetryParser()
+
+    def feed(self, line):
+        sample = self._parser.feed(line)
+        if sample is not None:
+            self.ring.append(time.time(), sample)
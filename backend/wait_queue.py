@@ -0,0 +1,135 @@
+"""
+FIFO waiting line for the robot with fast position lookups.
+
+The plain list we used before made `in`, `.index()` and `.pop(0)` all O(n),
+and every /api/claim, /api/status, /api/manualdrive and /api/runpath hit
+at least one of them. WaitQueue keeps:
+
+  - a dict client_id -> slot number      O(1) membership
+  - a deque of (slot, client_id)          O(1) amortised popleft
+  - a Fenwick tree of live slots          O(log n) position + middle removal
+
+Slots only ever grow. Whatever got popped from the front is always older
+than everything still waiting, so instead of touching the tree on popleft
+we just count pops and subtract that from the prefix sum. When the slot
+range fills up we renumber the live entries from 0 (amortised O(1)).
+"""
+
+from collections import deque
+
+
+class WaitQueue:
+    def __init__(self, capacity=1024):
+        self._slot_of = {}        # client_id -> absolute slot
+        self._order = deque()     # (slot, client_id), may hold removed entries
+        self._tree = [0] * (capacity + 1)   # 1-based Fenwick tree over slots
+        self._next_slot = 0
+        self._popped = 0          # front pops since last rebuild, still counted in tree
+
+    # ---------- list-ish API ----------
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def __contains__(self, client_id):
+        return client_id in self._slot_of
+
+    def __iter__(self):
+        for slot, client_id in self._order:
+            if self._slot_of.get(client_id) == slot:
+                yield client_id
+
+    def to_list(self):
+        return list(self)
+
+    def append(self, client_id):
+        """Add to the back of the line. No-op if already waiting."""
+        if client_id in self._slot_of:
+            return False
+        if self._next_slot >= len(self._tree) - 1:
+            self._rebuild()
+        slot = self._next_slot
+        self._next_slot += 1
+        self._slot_of[client_id] = slot
+        self._order.append((slot, client_id))
+        self._add(slot, 1)
+        return True
+
+    def popleft(self):
+        """Remove and return whoever is first in line (IndexError if empty)."""
+        while self._order:
+            slot, client_id = self._order.popleft()
+            if self._slot_of.get(client_id) != slot:
+                continue  # removed from the middle earlier, already out of the tree
+            del self._slot_of[client_id]
+            self._popped += 1
+            return client_id
+        raise IndexError("pop from empty WaitQueue")
+
+    def peek(self):
+        """Whoever is first in line, or None."""
+        while self._order:
+            slot, client_id = self._order[0]
+            if self._slot_of.get(client_id) == slot:
+                return client_id
+            self._order.popleft()
+        return None
+
+    def remove(self, client_id):
+        """Drop a client from anywhere in the line. Returns False if absent."""
+        slot = self._slot_of.pop(client_id, None)
+        if slot is None:
+            return False
+        self._add(slot, -1)
+        # the deque entry stays until popleft/rebuild skips it; don't let
+        # a lot of leavers pile up dead entries forever
+        if len(self._order) > 2 * len(self._slot_of) + 64:
+            self._rebuild()
+        return True
+
+    def position(self, client_id):
+        """1-based place in line, or None if not waiting."""
+        slot = self._slot_of.get(client_id)
+        if slot is None:
+            return None
+        return self._prefix(slot) - self._popped
+
+    # ---------- Fenwick tree ----------
+
+    def _add(self, slot, delta):
+        i = slot + 1
+        tree = self._tree
+        n = len(tree)
+        while i < n:
+            tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, slot):
+        """Live entries with slot <= this one (plus self._popped)."""
+        i = slot + 1
+        total = 0
+        tree = self._tree
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _rebuild(self):
+        """Renumber live entries 0..n-1 and size the tree for ~2x growth."""
+        live = list(self)
+        capacity = max(1024, 2 * len(live))
+        self._slot_of = {}
+        self._order = deque()
+        self._popped = 0
+        # every live slot holds exactly 1, so build the tree in O(n)
+        tree = [0] * (capacity + 1)
+        for slot, client_id in enumerate(live):
+            self._slot_of[client_id] = slot
+            self._order.append((slot, client_id))
+            tree[slot + 1] += 1
+        for i in range(1, capacity + 1):
+            parent = i + (i & -i)
+            if parent <= capacity:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._next_slot = len(live)
@@ -0,0 +1,14 @@
+"""
+WSGI entry point: the app with everything init_app() starts.
+
+    gunicorn -w 1 -k gthread --threads 32 -b 127.0.0.1:8001 wsgi:app
+
+This is the worker that holds the boards and runs jobs and manual drive;
+put the access-only pool (init_app(drive=False)) next to it and route
+between them as init_app describes. Set ACCESS_BACKEND = "sqlite" in
+server_copy first so both share one set of owners and one waiting line.
+"""
+
+from server_copy import init_app
+
+app = init_app()
@@ -54,10 +54,31 @@ async function heartbeat() {
     }
 }
 
-// 1. claim immediately on load
-claimControl();
+// Keep an open /api/stream instead of heartbeating. The open connection
+// is what tells the server we're still here, and it pushes a "status"
+// event if we ever lose ownership.
+function watchOwnership() {
+    const source = new EventSource("/api/stream?client_id=" + encodeURIComponent(window.clientId));
 
-// 2. send a heartbeat every 5 seconds to prove we're still here
-setInterval(heartbeat, 5000);
+    source.addEventListener("status", (e) => {
+        const data = JSON.parse(e.data);
+        console.log("[stream]", data);
+        if (data.ok && data.is_owner === false) {
+            console.log("We lost control, redirecting to waiting room.");
+            source.close();
+            window.location.href = "/waiting.html";
+        }
+    });
+}
+
+// 1. claim immediately on load, then stay connected
+claimControl().then(() => {
+    if (window.EventSource) {
+        watchOwnership();
+    } else {
+        // 2. old browsers: send a heartbeat every 5 seconds to prove we're still here
+        setInterval(heartbeat, 5000);
+    }
+});
 
 // (still no beforeunload auto-release; timeout handles stale owners)
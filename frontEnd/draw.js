@@ -16,6 +16,10 @@ const scaleFactor    = 35000;
 const LOGICAL_WIDTH  = 600;
 const LOGICAL_HEIGHT = 400;
 
+// drawings with at least this many segments go up as packed binary
+// instead of JSON (see encodeSegments / backend/segment_frame.py)
+const BINARY_UPLOAD_MIN_SEGMENTS = 200;
+
 // Hi-DPI canvas setup
 function setupCanvas() {
     const dpr = window.devicePixelRatio || 1;
@@ -134,6 +138,25 @@ function calculateDistances(pathArr) {
     return segments;
 }
 
+// Pack segments for the binary /api/runpath upload (little endian):
+//   'S' 'G' | version u8 = 1 | reserved u8 | count u32
+//   count x (distance_feet f32, heading_degrees f32)
+// must match backend/segment_frame.py
+function encodeSegments(segments) {
+    const buf  = new ArrayBuffer(8 + segments.length * 8);
+    const view = new DataView(buf);
+    view.setUint8(0, 0x53);   // 'S'
+    view.setUint8(1, 0x47);   // 'G'
+    view.setUint8(2, 1);
+    view.setUint8(3, 0);
+    view.setUint32(4, segments.length, true);
+    segments.forEach((seg, i) => {
+        view.setFloat32(8 + i * 8,     parseFloat(seg.distance_feet), true);
+        view.setFloat32(8 + i * 8 + 4, seg.heading_degrees, true);
+    });
+    return buf;
+}
+
 // Send path to Pi
 async function sendToPi() {
     if (path.length < 2) {
@@ -156,11 +179,21 @@ async function sendToPi() {
     console.log(payload);
 
     try {
-        const res = await fetch("/api/runpath", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify(payload)
-        });
+        let res;
+        if (segments.length >= BINARY_UPLOAD_MIN_SEGMENTS) {
+            const query = new URLSearchParams({ user_id: window.clientId });
+            res = await fetch(`/api/runpath?${query}`, {
+                method: "POST",
+                headers: { "Content-Type": "application/octet-stream" },
+                body: encodeSegments(segments)
+            });
+        } else {
+            res = await fetch("/api/runpath", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify(payload)
+            });
+        }
 
         const data = await res.json();
 
@@ -172,19 +205,72 @@ async function sendToPi() {
             return;
         }
 
-        // Otherwise you'll see the motor_plan and serial_log
+        // Otherwise the plan is running in the background; follow the job
         console.log("<<< Pi response:");
         console.log(data);
+        if (data.job_id) {
+            watchJob(data.job_id);
+        }
 
     } catch (err) {
         console.error("!!! Error talking to Pi:", err);
     }
 }
 
+// Follow a run-path job until it finishes, printing new serial_log lines
+let activeJobId = null;
+
+async function watchJob(jobId) {
+    activeJobId = jobId;
+    let since = 0;
+
+    while (activeJobId === jobId) {
+        try {
+            const res = await fetch(`/api/jobs/${jobId}?since=${since}`);
+            const job = await res.json();
+            if (!job.ok) {
+                console.warn("job lookup failed:", job);
+                break;
+            }
+
+            job.serial_log.forEach(line => console.log("[job]", line));
+            since = job.log_offset + job.serial_log.length;
+            console.log(`[job] ${job.status} ${job.steps_done}/${job.steps_total}`);
+
+            if (job.status === "done" || job.status === "cancelled" || job.status === "failed") {
+                break;
+            }
+        } catch (err) {
+            console.warn("job poll failed:", err);
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+
+    if (activeJobId === jobId) {
+        activeJobId = null;
+    }
+}
+
+// Stop the running drawing after its current step
+async function cancelRun() {
+    if (!activeJobId) return;
+    try {
+        const res = await fetch(`/api/jobs/${activeJobId}/cancel`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ user_id: window.clientId })
+        });
+        console.log("[cancel]", await res.json());
+    } catch (err) {
+        console.warn("cancel failed:", err);
+    }
+}
+
 // Hook up buttons
 sendBtn.addEventListener('click', sendToPi);
 
 resetBtn.addEventListener('click', () => {
+    cancelRun();
     path = [];
     redrawPath();
     console.log("Path cleared.");
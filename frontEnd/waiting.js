@@ -28,15 +28,44 @@ async function pollStatus() {
         }
 
         // Otherwise just keep waiting.
-        // (Optional) you can show queue position:
         // data.position might be 1,2,3,... or null
-        // console.log("Queue position:", data.position);
+        showPosition(data.position);
 
     } catch (err) {
         console.warn("pollStatus error:", err);
     }
 }
 
-// check immediately and also every 2s
-pollStatus();
-setInterval(pollStatus, 2000);
+function showPosition(position) {
+    const el = document.getElementById("queuePos");
+    if (el && position) {
+        el.textContent = "You are #" + position + " in line.";
+    }
+}
+
+// Let the server push queue position + promotion instead of polling.
+// The open connection also keeps us marked alive in the queue.
+function watchQueue() {
+    const source = new EventSource("/api/stream?client_id=" + encodeURIComponent(clientId));
+
+    source.addEventListener("status", (e) => {
+        const data = JSON.parse(e.data);
+        console.log("[stream]", data);
+
+        if (data.ok && data.is_owner === true) {
+            console.log("It's our turn now, redirecting to index.html");
+            source.close();
+            window.location.href = "/index.html";
+            return;
+        }
+        showPosition(data.position);
+    });
+}
+
+if (window.EventSource) {
+    watchQueue();
+} else {
+    // check immediately and also every 2s
+    pollStatus();
+    setInterval(pollStatus, 2000);
+}